@@ -5,15 +5,40 @@ A Flask-based microservice for analyzing light curve data and predicting exoplan
 """
 
 import os
+import io
+import threading
+import zipfile
+import hashlib
 import numpy as np
 import pandas as pd
-import joblib
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 import logging
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Tuple, Any, Callable, Mapping
 import requests
 import warnings
+from functools import lru_cache, partial
+from concurrent.futures import ThreadPoolExecutor
+from light_curve import (TIME_DTYPE, MAX_UPLOAD_BYTES, InputTooLargeError, check_input_size, resolve_dtype, to_array,
+                         parse_light_curve_file, calculate_moments)
+from visualization import parse_visualization_options, build_visualization_payload
+import serialization
+from preprocessing import (DEFAULT_CLIP, DEFAULT_CLIP_SIGMA, detrend as detrend_flux,
+                           parse_detrend_options, clean_light_curve, parse_clip_options, reduce_to_budget,
+                           parse_reduction_options, MIN_CLEAN_POINTS)
+from transit_search import DEFAULT_MAX_PLANETS, DEFAULT_MIN_SNR, search_planets, parse_search_options
+from streaming import SessionStore, SessionLimitError, SessionFinalizedError
+from folding import estimate_transit_shape
+from periodogram import estimate_period
+from feature_store import FeatureStore, feature_key, open_feature_store
+from jobs import JobQueue, parse_job_options
+from offload import AnalysisPool
+from model_backends import feature_importances, load_model_data
+from warmup import Warmup
+from tracing import tracer
+from archive import ARCHIVE_PROCESSES, ArchiveError, spool_upload, open_archive, score_archive
+from windowed import (DEFAULT_WINDOW_DAYS, DEFAULT_OVERLAP, windowed_search, parse_windowed_options,
+                      check_window_count, PARALLEL_MIN_POINTS, pool_workers, start_pool as start_window_pool)
 warnings.filterwarnings('ignore')
 
 # Configure logging
@@ -21,7 +46,17 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
 CORS(app)
+serialization.init_app(app)
+
+# Mock light curves: 30 days at ~29 minute cadence, cached per star
+MOCK_BASELINE_DAYS = 30
+MOCK_POINTS = 1500
+MOCK_CACHE_SIZE = int(os.environ.get('MOCK_CACHE_SIZE', 256))
+
+# Features computed together from one pass over the flux
+MOMENT_FEATURES = ('flux_mean', 'flux_std', 'flux_skew', 'flux_kurtosis')
 
 # Global model variable
 model = None
@@ -32,23 +67,39 @@ class ExoplanetAnalyzer:
     Exoplanet transit detection and analysis class
     """
     
-    def __init__(self):
+    def __init__(self, precision: str = None, feature_store: FeatureStore = None):
         self.model = None
         self.scaler = None
+        self.model_version = None
+        self.backend = None
+        self.feature_store = feature_store
+        self.dtype = resolve_dtype(precision)
         self.feature_names = [
             'flux_mean', 'flux_std', 'flux_min', 'flux_max', 'flux_range',
             'flux_skew', 'flux_kurtosis', 'transit_depth_estimate',
             'period_estimate', 'snr_estimate'
         ]
+        # Columns the model was trained on, in its input order (a reduced model has fewer)
+        self.model_features = list(self.feature_names)
+        # Features the model uses, most important first, and stand-ins for the rest
+        self.feature_order = list(self.feature_names)
+        self.feature_fill = np.zeros(len(self.feature_names))
     
     def load_model(self, model_path: str = 'model.pkl'):
         """Load the pre-trained model"""
         try:
             if os.path.exists(model_path):
-                model_data = joblib.load(model_path)
+                model_data = load_model_data(model_path)
                 self.model = model_data['model']
                 self.scaler = model_data.get('scaler', None)
-                logger.info(f"Model loaded successfully from {model_path}")
+                self.model_version = str(model_data.get('version', 'unknown'))
+                self.backend = model_data['backend']
+                self.model_features = list(model_data.get('feature_names', self.feature_names))
+                unknown = [name for name in self.model_features if name not in self.feature_names]
+                if unknown:
+                    raise ValueError(f"Model expects unknown features: {', '.join(unknown)}")
+                self._plan_features()
+                logger.info(f"Model loaded successfully from {model_path} ({self.backend} backend)")
                 return True
             else:
                 logger.warning(f"Model file {model_path} not found. Using mock model.")
@@ -76,133 +127,310 @@ class ExoplanetAnalyzer:
         
         X_scaled = self.scaler.fit_transform(X_mock)
         self.model.fit(X_scaled, y_mock)
+        self.model_version = 'mock'
+        self.backend = 'random_forest'
+        self.model_features = list(self.feature_names)
+        self._plan_features()
         
         logger.info("Mock model created and trained")
     
-    def extract_features(self, time_data: List[float], flux_data: List[float]) -> np.ndarray:
+    def extract_features(self, time_data: List[float], flux_data: List[float],
+                         precision: str = None) -> np.ndarray:
         """Extract features from light curve data"""
-        flux_array = np.array(flux_data)
-        time_array = np.array(time_data)
-        
-        # Basic statistical features
-        flux_mean = np.mean(flux_array)
-        flux_std = np.std(flux_array)
-        flux_min = np.min(flux_array)
-        flux_max = np.max(flux_array)
-        flux_range = flux_max - flux_min
-        
-        # Higher order moments
-        flux_skew = self._calculate_skewness(flux_array)
-        flux_kurtosis = self._calculate_kurtosis(flux_array)
-        
-        # Transit-specific features
-        transit_depth_estimate = self._estimate_transit_depth(flux_array)
-        period_estimate = self._estimate_period(time_array, flux_array)
-        snr_estimate = self._estimate_snr(flux_array)
-        
-        features = np.array([
-            flux_mean, flux_std, flux_min, flux_max, flux_range,
-            flux_skew, flux_kurtosis, transit_depth_estimate,
-            period_estimate, snr_estimate
-        ])
-        
-        return features.reshape(1, -1)
-    
-    def _calculate_skewness(self, data: np.ndarray) -> float:
-        """Calculate skewness of the data"""
-        mean = np.mean(data)
-        std = np.std(data)
-        if std == 0:
-            return 0
-        return np.mean(((data - mean) / std) ** 3)
+        dtype = resolve_dtype(precision) if precision else self.dtype
+        flux_array = to_array(flux_data, dtype)
+        time_array = to_array(time_data, TIME_DTYPE)
+        return self._extract_features(time_array, flux_array, self.feature_names)[0]
     
-    def _calculate_kurtosis(self, data: np.ndarray) -> float:
-        """Calculate kurtosis of the data"""
-        mean = np.mean(data)
-        std = np.std(data)
-        if std == 0:
-            return 0
-        return np.mean(((data - mean) / std) ** 4) - 3
+    def _plan_features(self):
+        """
+        Order the model's input features by its importances and skip those it
+        never splits on, as well as features a reduced model was trained
+        without. A tree ignores the value of an unused input, so the scaler
+        mean stands in for it; models without importances get every input.
+        """
+        importances = feature_importances(self.model)
+        if self.scaler is not None and hasattr(self.scaler, 'mean_'):
+            self.feature_fill = np.asarray(self.scaler.mean_, dtype=np.float64)
+        else:
+            self.feature_fill = np.zeros(len(self.model_features))
+        if importances is None or len(importances) != len(self.model_features):
+            self.feature_order = list(self.model_features)
+        else:
+            ranked = np.argsort(-np.asarray(importances), kind='stable')
+            self.feature_order = [self.model_features[i] for i in ranked if importances[i] > 0]
+        skipped = [name for name in self.feature_names if name not in self.feature_order]
+        if skipped:
+            logger.info(f"Model does not use {', '.join(skipped)}; these features are not computed")
+    
+    def _compute_feature(self, name: str, time_array: np.ndarray, flux_array: np.ndarray,
+                         cache: Dict[str, Any]) -> float:
+        """One named feature; statistics shared by several features are kept in `cache`"""
+        if name in MOMENT_FEATURES or name == 'snr_estimate':
+            if 'moments' not in cache:
+                cache['moments'] = calculate_moments(flux_array)
+            if name != 'snr_estimate':
+                return cache['moments'][MOMENT_FEATURES.index(name)]
+        if name in ('flux_min', 'flux_range') and 'min' not in cache:
+            cache['min'] = float(np.min(flux_array))
+        if name in ('flux_max', 'flux_range') and 'max' not in cache:
+            cache['max'] = float(np.max(flux_array))
+        
+        if name == 'flux_min':
+            return cache['min']
+        if name == 'flux_max':
+            return cache['max']
+        if name == 'flux_range':
+            return cache['max'] - cache['min']
+        if name == 'snr_estimate':
+            return self._estimate_snr(flux_array, *cache['moments'][:2])
+        if name == 'transit_depth_estimate':
+            return self._estimate_transit_depth(flux_array)
+        if name == 'period_estimate':
+            return self._estimate_period(time_array, flux_array)
+        raise ValueError(f'Unknown feature: {name}')
+    
+    def _extract_features(self, time_array: np.ndarray, flux_array: np.ndarray,
+                          names: List[str] = None) -> Tuple[np.ndarray, float, float]:
+        """
+        Compute the feature vector plus the period and depth estimates it contains.
+        Only `names` (default: the features the model uses, most important
+        first) are evaluated; the others are NaN, and the period is None when
+        it was not needed. The depth estimate is always reported.
+        """
+        names = self.feature_order if names is None else names
+        cache: Dict[str, Any] = {}
+        values = {name: self._compute_feature(name, time_array, flux_array, cache) for name in names}
+        if 'transit_depth_estimate' not in values:
+            values['transit_depth_estimate'] = self._estimate_transit_depth(flux_array)
+        
+        # The model and scaler are fitted in float64 regardless of input precision
+        features = np.array([values.get(name, np.nan) for name in self.feature_names], dtype=np.float64)
+        return features.reshape(1, -1), values.get('period_estimate'), values['transit_depth_estimate']
+    
+    def summary_features(self, summary, period: float = None) -> Tuple[np.ndarray, float, float]:
+        """
+        `_extract_features` for a `sketches.CurveSummary` instead of the points:
+        the same features from running moments, with the depth's 90th
+        percentile taken from the quantile sketch. The period is estimated by
+        the caller (the summary's periodogram, or a full fold when available).
+        """
+        moments = summary.moments
+        if moments.count < MIN_CLEAN_POINTS:
+            raise ValueError('Too few valid data points to classify')
+        baseline = summary.sketch.percentile(90)
+        values = {
+            'flux_mean': moments.mean,
+            'flux_std': moments.std,
+            'flux_min': moments.min,
+            'flux_max': moments.max,
+            'flux_range': moments.max - moments.min,
+            'flux_skew': moments.skewness,
+            'flux_kurtosis': moments.kurtosis,
+            'transit_depth_estimate': max(0, (baseline - moments.min) / baseline),
+            'period_estimate': period,
+            'snr_estimate': abs(moments.mean - moments.min) / moments.std if moments.std else 0
+        }
+        if 'period_estimate' not in self.feature_order:
+            period = None
+        features = np.array([values[name] if name in self.feature_order and values[name] is not None else np.nan
+                             for name in self.feature_names], dtype=np.float64)
+        return features.reshape(1, -1), period, values['transit_depth_estimate']
     
     def _estimate_transit_depth(self, flux_data: np.ndarray) -> float:
         """Estimate the depth of potential transits"""
-        baseline = np.percentile(flux_data, 90)  # Assume 90th percentile is baseline
-        minimum = np.min(flux_data)
+        baseline = float(np.percentile(flux_data, 90))  # Assume 90th percentile is baseline
+        minimum = float(np.min(flux_data))
         depth = (baseline - minimum) / baseline
         return max(0, depth)
     
     def _estimate_period(self, time_data: np.ndarray, flux_data: np.ndarray) -> float:
-        """Estimate orbital period using simple autocorrelation"""
+        """Estimate orbital period from the Lomb-Scargle periodogram, which handles gaps and uneven cadence"""
         try:
-            # Detrend the data
-            detrended = flux_data - np.mean(flux_data)
-            
-            # Simple autocorrelation
-            autocorr = np.correlate(detrended, detrended, mode='full')
-            autocorr = autocorr[autocorr.size // 2:]
-            
-            # Find peaks in autocorrelation
-            if len(autocorr) > 10:
-                # Look for the first significant peak after lag 0
-                peak_idx = np.argmax(autocorr[5:]) + 5
-                if peak_idx < len(time_data) - 1:
-                    period = time_data[peak_idx] - time_data[0]
-                    return max(0.5, min(50, period))  # Reasonable period range
-            
+            return estimate_period(time_data, flux_data)
+        except Exception as e:
+            logger.warning(f"Period estimation failed: {e}")
             return 3.0  # Default period
-        except:
-            return 3.0
     
-    def _estimate_snr(self, flux_data: np.ndarray) -> float:
+    def _estimate_snr(self, flux_data: np.ndarray, mean: float = None, std: float = None) -> float:
         """Estimate signal-to-noise ratio"""
-        signal = np.abs(np.mean(flux_data) - np.min(flux_data))
-        noise = np.std(flux_data)
+        if mean is None or std is None:
+            mean, std, _, _ = calculate_moments(flux_data)
+        signal = abs(mean - float(np.min(flux_data)))
+        noise = std
         if noise == 0:
             return 0
         return signal / noise
     
-    def predict(self, time_data: List[float], flux_data: List[float]) -> Dict[str, Any]:
-        """Make prediction on light curve data"""
+    @tracer.traced('analyzer.predict')
+    def predict(self, time_data: List[float], flux_data: List[float],
+                precision: str = None, detrend: str = 'none',
+                detrend_window: float = None, multi_planet: bool = False,
+                max_planets: int = DEFAULT_MAX_PLANETS, min_snr: float = DEFAULT_MIN_SNR,
+                windowed: bool = False, window_days: float = DEFAULT_WINDOW_DAYS,
+                window_overlap: float = DEFAULT_OVERLAP, latency_budget_ms: float = None,
+                quality: List[int] = None, clip: str = DEFAULT_CLIP, clip_sigma: float = DEFAULT_CLIP_SIGMA,
+                use_feature_store: bool = True, index_time: bool = False,
+                progress: Callable[[float, str], None] = None) -> Dict[str, Any]:
+        """
+        Make prediction on light curve data.
+        Quality-flagged cadences and sigma-clipped outliers are removed first.
+        Curves whose estimated analysis time exceeds `latency_budget_ms`
+        (default ANALYSIS_BUDGET_MS) are block-averaged to fewer points first;
+        `index_time` marks timestamps that are cadence indices, not days,
+        which also sizes the default detrending window to the curve.
+        Finalized streaming sessions call it too, with `use_feature_store`
+        off; provisional session results and out-of-core analysis compute the
+        same features from mergeable summaries (`summary_features`).
+        `progress(fraction, message)`, when given, is called between stages.
+        """
+        report = progress or (lambda fraction, message: None)
         try:
-            # Extract features
-            features = self.extract_features(time_data, flux_data)
+            # Convert once, in the requested precision
+            dtype = resolve_dtype(precision) if precision else self.dtype
+            time_array = to_array(time_data, TIME_DTYPE)
+            flux_array = to_array(flux_data, dtype)
+            
+            span = tracer.current_span()
+            span.set_attributes(points=len(flux_array), precision=dtype.name, detrend=detrend)
             
-            # Scale features if scaler is available
-            if self.scaler is not None:
-                features_scaled = self.scaler.transform(features)
+            # Drop flagged cadences and outliers before they skew the flux statistics
+            with tracer.span('clean'):
+                time_array, flux_array, cleaning = clean_light_curve(time_array, flux_array, quality, clip, clip_sigma)
+            
+            # Bin oversized inputs down to what the latency budget allows
+            stages = [detrend] + (['multi_planet'] if multi_planet else []) + (['windowed'] if windowed else [])
+            time_array, flux_array, reduction = reduce_to_budget(time_array, flux_array, stages, latency_budget_ms,
+                                                                 index_time)
+            span.set_attribute('analyzed_points', len(flux_array))
+            
+            # Repeat curves reuse the stored features and skip detrending and extraction
+            options = {'precision': dtype.name, 'detrend': detrend, 'detrend_window': detrend_window}
+            keys = stored = None
+            if self.feature_store is not None and use_feature_store:
+                with tracer.span('feature_store.get') as lookup:
+                    keys = feature_key(time_array, flux_array, **options)
+                    stored = self.feature_store.get(keys['curve_key'])
+                    # Entries stored for a model that skipped a feature this one needs are recomputed
+                    if stored is not None and np.isnan(stored['features'][0, self._feature_indices()]).any():
+                        stored = None
+                    lookup.set_attribute('cache_hit', stored is not None)
+            
+            raw_flux = flux_array
+            if stored is None:
+                # Remove stellar variability and drift before feature extraction
+                report(0.0, 'Detrending')
+                with tracer.span('detrend', method=detrend):
+                    flux_array, detrending = detrend_flux(time_array, flux_array, detrend, detrend_window, index_time)
+                
+                # Extract features
+                report(0.2, 'Extracting features')
+                with tracer.span('extract_features', features=len(self.feature_order)):
+                    features, transit_period, transit_depth = self._extract_features(time_array, flux_array)
+                
+                # Measure depth, duration and epoch on the curve folded at the estimated period
+                shape = None
+                if transit_period is not None:
+                    with tracer.span('transit_shape'):
+                        shape = estimate_transit_shape(time_array, flux_array, transit_period)
+                if keys is not None:
+                    with tracer.span('feature_store.put'):
+                        self.feature_store.put(keys, len(flux_array), options, features, transit_period,
+                                               transit_depth, detrending, shape)
             else:
-                features_scaled = features
+                flux_array = None
+                features, detrending, shape = stored['features'], stored['detrending'], stored['transit_shape']
+                transit_period, transit_depth = stored['transit_period'], stored['transit_depth']
             
-            # Make prediction
-            prediction = self.model.predict(features_scaled)[0]
-            probabilities = self.model.predict_proba(features_scaled)[0]
+            with tracer.span('classify', backend=self.backend):
+                result = self.classify_features(features, transit_period, transit_depth)
+            span.set_attributes(prediction=result['prediction'], cache_hit=stored is not None)
+            result.update({
+                'precision': dtype.name,
+                'detrending': detrending,
+                'cleaning': cleaning,
+                'reduction': reduction
+            })
+            if shape is not None:
+                result.update({
+                    'transit_depth': shape['depth'],
+                    'transit_duration': shape['duration_hours'],
+                    'transit_epoch': shape['epoch']
+                })
+            if keys is not None:
+                self.feature_store.record_outcome(keys['curve_key'], self.model_version, result['prediction'],
+                                                  result['confidence'], hit=stored is not None)
+                result['feature_cache'] = 'hit' if stored is not None else 'miss'
+                result['curve_hash'] = keys['curve_hash']
             
-            # Get confidence (max probability)
-            confidence = float(np.max(probabilities))
+            if (multi_planet or windowed) and flux_array is None:
+                flux_array, _ = detrend_flux(time_array, raw_flux, detrend, detrend_window, index_time)
             
-            # Calculate additional parameters
-            transit_period = self._estimate_period(np.array(time_data), np.array(flux_data))
-            transit_depth = self._estimate_transit_depth(np.array(flux_data))
-            transit_duration = self._estimate_transit_duration(transit_period, transit_depth)
+            # Iterative search for every transit signal in the curve
+            if multi_planet:
+                report(0.4, 'Searching for planets')
+                try:
+                    with tracer.span('planet_search', max_planets=max_planets):
+                        result['planet_search'] = search_planets(time_array, flux_array, max_planets, min_snr)
+                except ValueError as e:
+                    result['planet_search'] = {'planets': [], 'error': str(e)}
             
-            result = {
-                'prediction': prediction,
-                'confidence': confidence,
-                'transit_period': transit_period,
-                'transit_depth': transit_depth,
-                'transit_duration': transit_duration,
-                'class_probabilities': {
-                    class_name: float(prob) 
-                    for class_name, prob in zip(self.model.classes_, probabilities)
-                }
-            }
+            # Per-window detection of single transits on long baselines
+            if windowed:
+                report(0.7, 'Scanning windows for single transits')
+                with tracer.span('windowed_search', window_days=window_days):
+                    result['windowed_search'] = windowed_search(time_array, flux_array, window_days,
+                                                                window_overlap, min_snr)
             
+            report(1.0, 'Classified')
             return result
             
         except Exception as e:
             logger.error(f"Prediction error: {e}")
             raise
     
+    def _feature_indices(self) -> List[int]:
+        return [self.feature_names.index(name) for name in self.feature_order]
+    
+    def model_input(self, features: np.ndarray) -> np.ndarray:
+        """
+        Model input for rows of features in `feature_names` order: the model's
+        columns, with NaN (features it does not use) filled in, then scaled
+        """
+        columns = [self.feature_names.index(name) for name in self.model_features]
+        features = np.asarray(features, dtype=np.float64)[:, columns]
+        features = np.where(np.isnan(features), self.feature_fill, features)
+        return self.scaler.transform(features) if self.scaler is not None else features
+    
+    def classify_features(self, features: np.ndarray, transit_period: float,
+                          transit_depth: float) -> Dict[str, Any]:
+        """Classify an already extracted feature vector; NaN marks features the model does not use"""
+        features_scaled = self.model_input(features)
+        
+        # Make prediction
+        prediction = self.model.predict(features_scaled)[0]
+        probabilities = self.model.predict_proba(features_scaled)[0]
+        
+        # Get confidence (max probability)
+        confidence = float(np.max(probabilities))
+        
+        # Calculate additional parameters
+        transit_duration = None
+        if transit_period is not None:
+            transit_duration = self._estimate_transit_duration(transit_period, transit_depth)
+        
+        return {
+            'prediction': str(prediction),
+            'confidence': confidence,
+            'transit_period': transit_period,
+            'transit_depth': transit_depth,
+            'transit_duration': transit_duration,
+            'class_probabilities': {
+                str(class_name): float(prob) 
+                for class_name, prob in zip(self.model.classes_, probabilities)
+            }
+        }
+    
     def _estimate_transit_duration(self, period: float, depth: float) -> float:
         """Estimate transit duration in hours"""
         # Simple empirical relationship
@@ -211,18 +439,43 @@ class ExoplanetAnalyzer:
         depth_factor = 1.0 + (depth * 10)  # Deeper transits tend to be longer
         return min(12.0, base_duration * depth_factor)  # Cap at 12 hours
 
-# Initialize the analyzer
+# Initialize the analyzer; create_app() loads its model and opens the feature store
 analyzer = ExoplanetAnalyzer()
 
+# Worker processes for CPU-bound analyses (ANALYSIS_PROCESSES), forked with the model loaded
+analysis_pool = AnalysisPool(analyzer)
+# Archive members are parsed and scored in processes too; these serve them when the pool above is off
+archive_pool = AnalysisPool(analyzer, ARCHIVE_PROCESSES, min_points=0)
+
+_started_pid = None
+_start_lock = threading.Lock()
+
 def create_app():
-    """Application factory pattern"""
-    # Load the model when the app is created
-    analyzer.load_model()
+    """
+    Application factory: start the service in this process and return the app.
+    Loads the model, opens the feature store, then starts the analysis and
+    window pools, job workers and warm-up. Importing this module starts none of them, so
+    tools that only need ExoplanetAnalyzer get no server threads or files.
+    Idempotent per process; a process forked from a started one restarts
+    its threads and keeps the loaded model.
+    """
+    global _started_pid
+    with _start_lock:
+        if _started_pid == os.getpid():
+            return app
+        _started_pid = os.getpid()
+        if analyzer.model is None:
+            analyzer.feature_store = open_feature_store(analyzer.feature_names)
+            analyzer.load_model()
+        # Start the pools before any service thread exists
+        analysis_pool.start()
+        if not analysis_pool.enabled:
+            archive_pool.start()
+        start_window_pool()
+        job_queue.start()
+        warmup.start()
     return app
 
-# Load model on module import
-analyzer.load_model()
-
 class NASADataFetcher:
     """Fetch light curve data from NASA APIs"""
     
@@ -230,11 +483,14 @@ class NASADataFetcher:
         self.base_url = "https://exoplanetarchive.ipac.caltech.edu/TAP/sync"
         self.mast_url = "https://mast.stsci.edu/api/v0.1/Download/file"
     
+    @tracer.traced('fetch_star_data')
     def fetch_star_data(self, star_id: str) -> Dict[str, Any]:
         """
         Fetch star data from NASA Exoplanet Archive
         Returns mock light curve data for demonstration
         """
+        span = tracer.current_span()
+        span.set_attribute('star_id', star_id)
         try:
             # Clean the star ID
             clean_id = star_id.replace('-', ' ').strip()
@@ -255,25 +511,31 @@ class NASADataFetcher:
             
             url = f"{self.base_url}?query={requests.utils.quote(query)}&format=json"
             
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                if data and 'data' in data and len(data['data']) > 0:
-                    # Found the star, generate mock light curve data
-                    star_info = self._parse_star_data(data)
-                    light_curve = self._generate_mock_light_curve(star_info)
-                    
-                    return {
-                        'star_info': star_info,
-                        'light_curve': light_curve,
-                        'source': 'NASA Exoplanet Archive'
-                    }
+            with tracer.span('archive_query') as query_span:
+                response = requests.get(url, timeout=10)
+                query_span.set_attribute('status_code', response.status_code)
+                data = response.json() if response.status_code == 200 else None
+                found = bool(data and 'data' in data and len(data['data']) > 0)
+                query_span.set_attribute('found', found)
+            if found:
+                # Found the star, generate mock light curve data
+                star_info = self._parse_star_data(data)
+                light_curve = self._generate_mock_light_curve(star_info)
+                span.set_attribute('source', 'NASA Exoplanet Archive')
+                
+                return {
+                    'star_info': star_info,
+                    'light_curve': light_curve,
+                    'source': 'NASA Exoplanet Archive'
+                }
             
             # If not found in NASA archive, generate generic mock data
+            span.set_attribute('source', 'Generated Mock Data')
             return self._generate_generic_mock_data(star_id)
             
         except Exception as e:
             logger.error(f"Error fetching NASA data for {star_id}: {e}")
+            span.set_attribute('source', 'Generated Mock Data')
             return self._generate_generic_mock_data(star_id)
     
     def _parse_star_data(self, nasa_data: Dict) -> Dict[str, Any]:
@@ -292,43 +554,29 @@ class NASADataFetcher:
             logger.error(f"Error parsing NASA data: {e}")
             return {}
     
-    def _generate_mock_light_curve(self, star_info: Dict) -> Dict[str, List]:
+    @tracer.traced('mock_curve')
+    def _generate_mock_light_curve(self, star_info: Dict) -> Dict[str, Any]:
         """Generate realistic mock light curve data based on star info"""
         try:
-            # Generate time series (in days)
-            time_points = np.linspace(0, 30, 1500)  # 30 days of observations
-            
-            # Base flux (normalized to 1.0)
-            base_flux = np.ones_like(time_points)
-            
-            # Add realistic noise
-            noise = np.random.normal(0, 0.001, len(time_points))
-            
             # Add transit signal if planet exists
-            if star_info.get('pl_tranflag') == 1:
-                period = star_info.get('pl_orbper', 10.0)  # Orbital period in days
-                if period and period > 0:
-                    # Add transit dips
-                    transit_depth = 0.01 * np.random.uniform(0.5, 2.0)  # 0.5-2% depth
-                    transit_duration = 0.1  # Transit duration in days
-                    
-                    for phase in np.arange(0, 30, period):
-                        # Create transit dip
-                        transit_mask = np.abs(time_points - phase) < transit_duration/2
-                        base_flux[transit_mask] -= transit_depth * np.exp(-((time_points[transit_mask] - phase)/(transit_duration/4))**2)
-            
-            flux_data = base_flux + noise
+            period = star_info.get('pl_orbper', 10.0) if star_info.get('pl_tranflag') == 1 else None
+            seed = star_seed(str(star_info.get('pl_name') or star_info.get('hostname') or ''))
+            hits = transiting_mock_curve.cache_info().hits if tracer.enabled else 0
+            time_points, flux_data = transiting_mock_curve(seed, float(period) if period and period > 0 else None)
+            if tracer.enabled:
+                tracer.current_span().set_attributes(kind='transiting', points=len(flux_data),
+                                                     cache_hit=transiting_mock_curve.cache_info().hits > hits)
             
             return {
-                'time': time_points.tolist(),
-                'flux': flux_data.tolist(),
+                'time': time_points,
+                'flux': flux_data,
                 'period': star_info.get('pl_orbper'),
                 'transit_depth': star_info.get('pl_rade', 1.0) * 0.01 if star_info.get('pl_rade') else None
             }
             
         except Exception as e:
             logger.error(f"Error generating mock light curve: {e}")
-            return self._generate_basic_light_curve()
+            return self._generate_basic_light_curve(str(star_info.get('pl_name', '')))
     
     def _generate_generic_mock_data(self, star_id: str) -> Dict[str, Any]:
         """Generate generic mock data when NASA data is not available"""
@@ -338,35 +586,80 @@ class NASADataFetcher:
                 'hostname': star_id.split('-')[0] if '-' in star_id else star_id,
                 'source': 'Mock Data'
             },
-            'light_curve': self._generate_basic_light_curve(),
+            'light_curve': self._generate_basic_light_curve(star_id),
             'source': 'Generated Mock Data'
         }
     
-    def _generate_basic_light_curve(self) -> Dict[str, List]:
+    @tracer.traced('mock_curve')
+    def _generate_basic_light_curve(self, star_id: str = '') -> Dict[str, Any]:
         """Generate basic light curve with potential transit"""
-        time_points = np.linspace(0, 30, 1500)
-        base_flux = np.ones_like(time_points)
-        noise = np.random.normal(0, 0.001, len(time_points))
-        
-        # Add a potential transit signal
-        if np.random.random() > 0.5:  # 50% chance of transit
-            period = np.random.uniform(5, 20)  # Random period
-            transit_depth = np.random.uniform(0.005, 0.02)  # 0.5-2% depth
-            
-            for phase in np.arange(0, 30, period):
-                transit_mask = np.abs(time_points - phase) < 0.1
-                base_flux[transit_mask] -= transit_depth * np.exp(-((time_points[transit_mask] - phase)/0.04)**2)
-        
-        flux_data = base_flux + noise
-        
+        hits = basic_mock_curve.cache_info().hits if tracer.enabled else 0
+        time_points, flux_data = basic_mock_curve(star_seed(star_id))
+        if tracer.enabled:
+            tracer.current_span().set_attributes(kind='basic', points=len(flux_data),
+                                                 cache_hit=basic_mock_curve.cache_info().hits > hits)
         return {
-            'time': time_points.tolist(),
-            'flux': flux_data.tolist()
+            'time': time_points,
+            'flux': flux_data
         }
 
+def star_seed(star_id: str) -> int:
+    """Stable random seed for a star identifier, so its mock curve never changes"""
+    digest = hashlib.blake2b(star_id.strip().upper().encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+def inject_transits(time_points: np.ndarray, flux: np.ndarray, period: float, depth: float,
+                    half_width: float, scale: float):
+    """Subtract a Gaussian dip at every multiple of `period` inside the baseline, in place"""
+    n_transits = len(np.arange(0, MOCK_BASELINE_DAYS, period))
+    # Each point only sees the nearest transit centre
+    centre = np.clip(np.rint(time_points / period), 0, n_transits - 1) * period
+    offset = time_points - centre
+    in_transit = np.abs(offset) < half_width
+    flux[in_transit] -= depth * np.exp(-(offset[in_transit] / scale) ** 2)
+
+def _read_only(*arrays: np.ndarray) -> Tuple[np.ndarray, ...]:
+    for array in arrays:
+        array.setflags(write=False)
+    return arrays
+
+@lru_cache(maxsize=MOCK_CACHE_SIZE)
+def transiting_mock_curve(seed: int, period: float = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Mock curve of a known planet host; cached and returned read-only"""
+    rng = np.random.default_rng(seed)
+    time_points = np.linspace(0, MOCK_BASELINE_DAYS, MOCK_POINTS)
+    base_flux = np.ones_like(time_points)
+    noise = rng.normal(0, 0.001, len(time_points))
+    
+    if period is not None:
+        transit_depth = 0.01 * rng.uniform(0.5, 2.0)  # 0.5-2% depth
+        transit_duration = 0.1  # Transit duration in days
+        inject_transits(time_points, base_flux, period, transit_depth, transit_duration / 2, transit_duration / 4)
+    
+    return _read_only(time_points, base_flux + noise)
+
+@lru_cache(maxsize=MOCK_CACHE_SIZE)
+def basic_mock_curve(seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Mock curve with a 50% chance of a random transit; cached and returned read-only"""
+    rng = np.random.default_rng(seed)
+    time_points = np.linspace(0, MOCK_BASELINE_DAYS, MOCK_POINTS)
+    base_flux = np.ones_like(time_points)
+    noise = rng.normal(0, 0.001, len(time_points))
+    
+    # Add a potential transit signal
+    if rng.random() > 0.5:  # 50% chance of transit
+        period = rng.uniform(5, 20)  # Random period
+        transit_depth = rng.uniform(0.005, 0.02)  # 0.5-2% depth
+        inject_transits(time_points, base_flux, period, transit_depth, 0.1, 0.04)
+    
+    return _read_only(time_points, base_flux + noise)
+
 # Initialize NASA data fetcher
 nasa_fetcher = NASADataFetcher()
 
+# Open incremental analysis sessions
+session_store = SessionStore()
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -374,9 +667,60 @@ def health_check():
         'status': 'healthy',
         'service': 'Exoplanet AI Service',
         'model_loaded': analyzer.model is not None,
+        'ready': warmup.ready,
         'version': '1.0.0'
     })
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint: 200 once the model is loaded and warm-up has passed, 503 before"""
+    status = warmup.status()
+    status['model_loaded'] = analyzer.model is not None
+    return jsonify(status), 200 if warmup.ready and analyzer.model is not None else 503
+
+def parse_curve_json(data: Dict[str, Any], dtype: np.dtype, time_offset: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Validate the flux_data/time_data lists of a JSON body and convert them to arrays"""
+    flux_data = data['flux_data']
+    time_data = data.get('time_data', None)
+    
+    # Validate data
+    if not isinstance(flux_data, list) or len(flux_data) == 0:
+        raise ValueError('flux_data must be a non-empty list')
+    if time_data is not None and not isinstance(time_data, list):
+        raise ValueError('time_data must be a list')
+    # The parsed point counts, whatever the body looked like
+    check_input_size(max(len(flux_data), len(time_data or ())))
+    
+    if time_data is not None and len(time_data) != len(flux_data):
+        raise ValueError('time_data and flux_data must have the same length')
+    
+    # Convert to float arrays; cadence indices stand in for missing timestamps
+    try:
+        flux_data = to_array(flux_data, dtype)
+        if time_data is not None:
+            time_data = to_array(time_data, TIME_DTYPE)
+        else:
+            time_data = np.arange(time_offset, time_offset + len(flux_data), dtype=TIME_DTYPE)
+    except (ValueError, TypeError):
+        raise ValueError('All data points must be numeric')
+    
+    if not (np.all(np.isfinite(flux_data)) and np.all(np.isfinite(time_data))):
+        raise ValueError('All data points must be numeric')
+    
+    return time_data, flux_data
+
+def parse_quality_json(data: Dict[str, Any], n_points: int):
+    """Optional per-cadence quality flags of a JSON body, as an integer array"""
+    quality = data.get('quality')
+    if quality is None:
+        return None
+    if not isinstance(quality, list) or len(quality) != n_points:
+        raise ValueError('quality must be a list with one flag per data point')
+    try:
+        return np.asarray(quality, dtype=np.int64)
+    except (ValueError, TypeError):
+        raise ValueError('quality flags must be integers')
+
 @app.route('/predict', methods=['POST'])
 def predict():
     """Main prediction endpoint"""
@@ -391,29 +735,32 @@ def predict():
         if 'flux_data' not in data:
             return jsonify({'error': 'flux_data is required'}), 400
         
-        flux_data = data['flux_data']
-        time_data = data.get('time_data', list(range(len(flux_data))))
-        
-        # Validate data
-        if not isinstance(flux_data, list) or len(flux_data) == 0:
-            return jsonify({'error': 'flux_data must be a non-empty list'}), 400
-        
-        if len(time_data) != len(flux_data):
-            return jsonify({'error': 'time_data and flux_data must have the same length'}), 400
-        
-        # Convert to float arrays
         try:
-            time_data = [float(x) for x in time_data]
-            flux_data = [float(x) for x in flux_data]
-        except (ValueError, TypeError):
-            return jsonify({'error': 'All data points must be numeric'}), 400
+            dtype = resolve_dtype(data.get('precision'))
+            detrend_options = parse_detrend_options(data)
+            search_options = parse_search_options(data)
+            search_options.update(parse_windowed_options(data))
+            search_options.update(parse_reduction_options(data))
+            search_options.update(parse_clip_options(data))
+            time_data, flux_data = parse_curve_json(data, dtype)
+            search_options['index_time'] = data.get('time_data') is None
+            if search_options['windowed']:
+                check_window_count(time_data, search_options['window_days'], search_options['window_overlap'])
+            search_options['quality'] = parse_quality_json(data, len(flux_data))
+        except InputTooLargeError as e:
+            return jsonify({'error': str(e)}), 413
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Make prediction
-        result = analyzer.predict(time_data, flux_data)
+        result = analysis_pool.predict(time_data, flux_data, precision=dtype.name,
+                                       detrend=detrend_options['method'], detrend_window=detrend_options['window'],
+                                       **search_options)
         
         logger.info(f"Prediction made: {result['prediction']} with confidence {result['confidence']:.3f}")
         
-        return jsonify(result)
+        with tracer.span('serialize'):
+            return jsonify(result)
         
     except Exception as e:
         logger.error(f"Prediction endpoint error: {e}")
@@ -424,10 +771,154 @@ def model_info():
     """Get information about the loaded model"""
     return jsonify({
         'model_type': type(analyzer.model).__name__ if analyzer.model else None,
+        'backend': analyzer.backend,
         'feature_names': analyzer.feature_names,
+        'model_features': analyzer.model_features,
+        'evaluated_features': analyzer.feature_order,
         'classes': analyzer.model.classes_.tolist() if hasattr(analyzer.model, 'classes_') else None,
-        'scaler_available': analyzer.scaler is not None
+        'scaler_available': analyzer.scaler is not None,
+        'model_version': analyzer.model_version,
+        'feature_store': analyzer.feature_store.stats() if analyzer.feature_store is not None else None
+    })
+
+def _no_progress(fraction: float, message: str = None):
+    pass
+
+def _stage(progress: Callable, start: float, end: float) -> Callable:
+    """Map a sub-task's 0-1 progress onto [start, end] of the overall task"""
+    return lambda fraction, message=None: progress(start + (end - start) * fraction, message)
+
+def parse_analysis_options(params: Mapping[str, Any]) -> Tuple[np.dtype, Dict, Dict, Dict]:
+    """Precision, detrending, search and visualization options of an analysis request"""
+    dtype = resolve_dtype(params.get('precision'))
+    detrend_options = parse_detrend_options(params)
+    search_options = parse_search_options(params)
+    search_options.update(parse_windowed_options(params))
+    search_options.update(parse_reduction_options(params))
+    search_options.update(parse_clip_options(params))
+    plot_options = parse_visualization_options(params)
+    return dtype, detrend_options, search_options, plot_options
+
+@tracer.traced('analysis.identifier')
+def run_identifier_analysis(params: Mapping[str, Any], progress: Callable = _no_progress) -> Dict[str, Any]:
+    """
+    Fetch a star's light curve and analyze it.
+    Raises ValueError for invalid options and LookupError when no data exists.
+    """
+    star_id = params['star_id'].strip()
+    dtype, detrend_options, search_options, plot_options = parse_analysis_options(params)
+    tracer.current_span().set_attribute('star_id', star_id)
+    
+    logger.info(f"Analyzing star identifier: {star_id}")
+    
+    # Fetch star data from NASA
+    progress(0.0, 'Fetching light curve')
+    nasa_data = nasa_fetcher.fetch_star_data(star_id)
+    
+    if not nasa_data or 'light_curve' not in nasa_data:
+        raise LookupError('No data available for the specified star ID')
+    
+    light_curve = nasa_data['light_curve']
+    flux_data = to_array(light_curve['flux'], dtype)
+    time_data = to_array(light_curve['time'], TIME_DTYPE)
+    if search_options['windowed']:
+        check_window_count(time_data, search_options['window_days'], search_options['window_overlap'])
+    
+    # Analyze the light curve data
+    result = analysis_pool.predict(time_data, flux_data, precision=dtype.name,
+                                   detrend=detrend_options['method'], detrend_window=detrend_options['window'],
+                                   progress=_stage(progress, 0.2, 0.9), **search_options)
+    
+    # Add star information to the result
+    progress(0.9, 'Building visualization')
+    result.update({
+        'star_id': star_id,
+        'star_info': nasa_data.get('star_info', {}),
+        'data_source': nasa_data.get('source', 'Unknown'),
+        'total_data_points': len(flux_data)
+    })
+    with tracer.span('visualization', points=len(flux_data)):
+        result.update(build_visualization_payload(time_data, flux_data, plot_options,
+                                                  result['transit_period'], result.get('transit_epoch')))
+    
+    logger.info(f"Analysis complete for {star_id}: {result.get('prediction', 'Unknown')}")
+    return result
+
+@tracer.traced('analysis.file')
+def run_file_analysis(params: Mapping[str, Any], content: bytes, filename: str,
+                      progress: Callable = _no_progress) -> Dict[str, Any]:
+    """
+    Parse an uploaded light curve file and analyze it.
+    Raises ValueError for invalid options or content.
+    """
+    dtype, detrend_options, search_options, plot_options = parse_analysis_options(params)
+    
+    # Parse FITS, CSV or TXT format
+    progress(0.0, 'Parsing file')
+    with tracer.span('parse_file', filename=filename, bytes=len(content)) as span:
+        time_data, flux_data, quality = parse_light_curve_file(content, filename, dtype)
+        span.set_attribute('points', len(time_data))
+    
+    if len(time_data) < 10:
+        raise ValueError('File must contain at least 10 data points')
+    if search_options['windowed']:
+        check_window_count(time_data, search_options['window_days'], search_options['window_overlap'])
+    
+    # Analyze the data
+    result = analysis_pool.predict(time_data, flux_data, precision=dtype.name,
+                                   detrend=detrend_options['method'], detrend_window=detrend_options['window'],
+                                   quality=quality, progress=_stage(progress, 0.1, 0.9), **search_options)
+    
+    # Add file information
+    progress(0.9, 'Building visualization')
+    result.update({
+        'filename': filename,
+        'data_source': 'Uploaded File',
+        'total_data_points': len(flux_data)
     })
+    with tracer.span('visualization', points=len(flux_data)):
+        result.update(build_visualization_payload(time_data, flux_data, plot_options,
+                                                  result['transit_period'], result.get('transit_epoch')))
+    return result
+
+# Background jobs for analyses that may outlive a request timeout
+job_queue = JobQueue()
+job_queue.register('identifier', lambda job: run_identifier_analysis(job.params, job.progress))
+job_queue.register('file', lambda job: run_file_analysis(job.params, job.payload, job.params['filename'], job.progress))
+
+@app.before_request
+def open_request_span():
+    """Root span of a traced request, closed once the response is sent"""
+    if tracer.enabled:
+        route = request.url_rule.rule if request.url_rule is not None else request.path
+        g.request_span = tracer.span(f'{request.method} {route}', path=request.path).__enter__()
+
+@app.after_request
+def tag_request_span(response):
+    span = g.get('request_span')
+    if span is not None:
+        span.set_attribute('status_code', response.status_code)
+        response.headers['X-Trace-Id'] = span.trace_id
+    return response
+
+@app.teardown_request
+def close_request_span(error=None):
+    span = g.pop('request_span', None)
+    if span is not None:
+        span.__exit__(type(error) if error else None, error, None)
+
+@app.before_request
+def reject_oversized_payloads():
+    """Refuse bodies over MAX_UPLOAD_BYTES from their declared length, before reading them"""
+    if request.content_length is not None and request.content_length > MAX_UPLOAD_BYTES:
+        return jsonify({'error': f'Request body exceeds the {MAX_UPLOAD_BYTES} byte limit'}), 413
+
+def job_accepted(job_id: str):
+    """202 response pointing the client at a queued job"""
+    status_url = f'/api/jobs/{job_id}'
+    response = jsonify({'job_id': job_id, 'status': 'queued', 'status_url': status_url})
+    response.headers['Location'] = status_url
+    return response, 202
 
 @app.route('/api/analyze/identifier', methods=['POST'])
 def analyze_star_identifier():
@@ -443,38 +934,27 @@ def analyze_star_identifier():
         if 'star_id' not in data:
             return jsonify({'error': 'star_id is required'}), 400
         
-        star_id = data['star_id'].strip()
-        if not star_id:
+        if not data['star_id'].strip():
             return jsonify({'error': 'star_id cannot be empty'}), 400
         
-        logger.info(f"Analyzing star identifier: {star_id}")
-        
-        # Fetch star data from NASA
-        nasa_data = nasa_fetcher.fetch_star_data(star_id)
-        
-        if not nasa_data or 'light_curve' not in nasa_data:
-            return jsonify({'error': 'No data available for the specified star ID'}), 404
-        
-        light_curve = nasa_data['light_curve']
-        flux_data = light_curve['flux']
-        time_data = light_curve['time']
-        
-        # Analyze the light curve data
-        result = analyzer.predict(time_data, flux_data)
+        try:
+            job_options = parse_job_options(data)
+            parse_analysis_options(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Add star information to the result
-        result.update({
-            'star_id': star_id,
-            'star_info': nasa_data.get('star_info', {}),
-            'data_source': nasa_data.get('source', 'Unknown'),
-            'time_data': time_data[:100],  # First 100 points for visualization
-            'flux_data': flux_data[:100],  # First 100 points for visualization
-            'total_data_points': len(flux_data)
-        })
+        if job_options['async']:
+            return job_accepted(job_queue.submit('identifier', data, priority=job_options['priority']))
         
-        logger.info(f"Analysis complete for {star_id}: {result.get('prediction', 'Unknown')}")
+        try:
+            result = run_identifier_analysis(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except LookupError as e:
+            return jsonify({'error': str(e)}), 404
         
-        return jsonify(result)
+        with tracer.span('serialize'):
+            return jsonify(result)
         
     except Exception as e:
         logger.error(f"Error in star identifier analysis: {e}")
@@ -492,60 +972,303 @@ def analyze_file():
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
         
+        params = request.form.to_dict()
+        try:
+            job_options = parse_job_options(params)
+            parse_analysis_options(params)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if job_options['async']:
+            params['filename'] = file.filename
+            return job_accepted(job_queue.submit('file', params, payload=file.read(),
+                                                 priority=job_options['priority']))
+        
         # Read file content
         try:
-            content = file.read().decode('utf-8')
-            lines = content.strip().split('\n')
-            
-            time_data = []
-            flux_data = []
-            
-            # Parse CSV or TXT format
-            for line in lines[1:] if lines[0].lower().startswith(('time', 'flux')) else lines:
-                if line.strip():
-                    parts = line.replace(',', ' ').split()
-                    if len(parts) >= 2:
-                        try:
-                            time_data.append(float(parts[0]))
-                            flux_data.append(float(parts[1]))
-                        except ValueError:
-                            continue
-            
-            if len(time_data) < 10:
-                return jsonify({'error': 'File must contain at least 10 data points'}), 400
-            
-            # Analyze the data
-            result = analyzer.predict(time_data, flux_data)
-            
-            # Add file information
-            result.update({
-                'filename': file.filename,
-                'data_source': 'Uploaded File',
-                'time_data': time_data[:100],  # First 100 points for visualization
-                'flux_data': flux_data[:100],  # First 100 points for visualization
-                'total_data_points': len(flux_data)
-            })
-            
-            return jsonify(result)
-            
+            result = run_file_analysis(params, file.read(), file.filename)
+        except InputTooLargeError as e:
+            return jsonify({'error': str(e)}), 413
         except Exception as e:
             return jsonify({'error': f'Error reading file: {str(e)}'}), 400
         
+        with tracer.span('serialize'):
+            return jsonify(result)
+        
     except Exception as e:
         logger.error(f"Error in file analysis: {e}")
         return jsonify({'error': f'Analysis failed: {str(e)}'}), 500
 
+@app.route('/api/analyze/archive', methods=['POST'])
+def analyze_archive():
+    """
+    Analyze every light curve in an uploaded zip or tar archive.
+    Streams one NDJSON record per file as its analysis finishes, then a summary.
+    """
+    if 'archive' not in request.files:
+        return jsonify({'error': 'No archive uploaded'}), 400
+    
+    params = request.form.to_dict()
+    try:
+        parse_analysis_options(params)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    archive_file = spool_upload(request.files['archive'].stream)
+    try:
+        members = open_archive(archive_file)
+    except ArchiveError as e:
+        archive_file.close()
+        return jsonify({'error': str(e)}), 400
+    
+    def generate():
+        try:
+            pool = analysis_pool if analysis_pool.enabled else archive_pool
+            for record in score_archive(members, partial(run_file_analysis, params),
+                                        executor=pool if pool.enabled else None):
+                yield app.json.dumps(record) + '\n'
+        except ArchiveError as e:
+            yield app.json.dumps({'error': str(e)}) + '\n'
+        except Exception as e:
+            # The response has started; end it with an error record rather than a cut-off stream
+            logger.error(f"Archive analysis failed: {e}")
+            yield app.json.dumps({'error': f'Archive analysis failed: {str(e)}'}) + '\n'
+        finally:
+            archive_file.close()
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/jobs', methods=['GET'])
+def job_stats():
+    """Number of jobs in each state"""
+    return jsonify(job_queue.stats())
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id: str):
+    """Status and progress of a job, with its result once finished"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id: str):
+    """Cancel a queued or running job"""
+    status = job_queue.cancel(job_id)
+    if status is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({'job_id': job_id, 'status': status})
+
+@app.route('/api/sessions', methods=['POST'])
+def create_session():
+    """Open an incremental analysis session for a growing light curve"""
+    data = request.get_json(silent=True) or {}
+    try:
+        dtype = resolve_dtype(data.get('precision'))
+        detrend_options = parse_detrend_options(data)
+        session = session_store.create(dtype, detrend=detrend_options['method'],
+                                       detrend_window=detrend_options['window'], **parse_clip_options(data))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except SessionLimitError as e:
+        return jsonify({'error': str(e)}), 429
+    
+    return jsonify({
+        'session_id': session.session_id,
+        'precision': session.dtype.name,
+        'options': session.analysis_options,
+        'ttl_seconds': session_store.ttl
+    }), 201
+
+@app.route('/api/sessions/<session_id>/append', methods=['POST'])
+def append_to_session(session_id: str):
+    """Append cadences to a session and return a fresh classification"""
+    try:
+        session = session_store.get(session_id)
+        if session is None:
+            return jsonify({'error': 'Session not found'}), 404
+        
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No JSON data provided'}), 400
+        if 'flux_data' not in data:
+            return jsonify({'error': 'flux_data is required'}), 400
+        
+        try:
+            time_data, flux_data = parse_curve_json(data, session.dtype, time_offset=session.total_points)
+        except InputTooLargeError as e:
+            return jsonify({'error': str(e)}), 413
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        try:
+            session.append(time_data, flux_data, index_time=data.get('time_data') is None)
+        except SessionFinalizedError as e:
+            return jsonify({'error': str(e)}), 409
+        try:
+            return jsonify(session.classify(analyzer))
+        except ValueError as e:
+            # e.g. too few valid points so far; the appended cadences are kept
+            return jsonify({'error': str(e), 'total_data_points': session.total_points}), 400
+        
+    except Exception as e:
+        logger.error(f"Session append error: {e}")
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+
+@app.route('/api/sessions/<session_id>/finalize', methods=['POST'])
+def finalize_session(session_id: str):
+    """Run the full analysis on everything a session has received; no appends are accepted afterwards"""
+    session = session_store.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    if session.total_points == 0:
+        return jsonify({'error': 'Session has no data yet'}), 400
+    try:
+        return jsonify(session.finalize(analyzer))
+    except ValueError as e:
+        return jsonify({'error': str(e), 'total_data_points': session.total_points}), 400
+
+@app.route('/api/sessions/<session_id>', methods=['GET'])
+def get_session(session_id: str):
+    """Classify everything a session has received so far"""
+    session = session_store.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    if session.total_points == 0:
+        return jsonify({'error': 'Session has no data yet'}), 400
+    try:
+        return jsonify(session.classify(analyzer))
+    except ValueError as e:
+        return jsonify({'error': str(e), 'total_data_points': session.total_points}), 400
+
+@app.route('/api/sessions/<session_id>', methods=['DELETE'])
+def delete_session(session_id: str):
+    """Close a session and free its data"""
+    if not session_store.delete(session_id):
+        return jsonify({'error': 'Session not found'}), 404
+    return jsonify({'session_id': session_id, 'deleted': True})
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Endpoint not found'}), 404
 
+@app.errorhandler(413)
+def payload_too_large(error):
+    return jsonify({'error': f'Request body exceeds the {MAX_UPLOAD_BYTES} byte limit'}), 413
+
 @app.errorhandler(500)
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
+# Synthetic requests through every endpoint's code path, so the first real one is served warm
+warmup = Warmup()
+warmup_hashes = set()
+# Fixed, so every process warms on the same curves; their feature store rows are removed afterwards
+WARMUP_SEED = 20240601
+
+@lru_cache(maxsize=None)
+def _warmup_curve(n_points: int = MOCK_POINTS) -> Tuple[List[float], List[float]]:
+    rng = np.random.default_rng(WARMUP_SEED)
+    time_points = np.linspace(0, MOCK_BASELINE_DAYS, n_points)
+    flux = 1.0 + rng.normal(0, 0.001, n_points)
+    inject_transits(time_points, flux, rng.uniform(3, 8), 0.01, 0.05, 0.025)
+    return time_points.tolist(), flux.tolist()
+
+def _warmup_csv(n_points: int = MOCK_POINTS) -> bytes:
+    return '\n'.join(f'{t},{f}' for t, f in zip(*_warmup_curve(n_points))).encode()
+
+def _warmup_request(method: str, url: str, **kwargs):
+    response = app.test_client().open(url, method=method, **kwargs)
+    if response.status_code >= 400:
+        raise RuntimeError(f"{method} {url} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    if response.is_json and isinstance(response.json, dict) and 'curve_hash' in response.json:
+        warmup_hashes.add(response.json['curve_hash'])
+    return response
+
+@warmup.step('predict', required=True)
+def warm_predict():
+    warmup_time, warmup_flux = _warmup_curve()
+    _warmup_request('POST', '/predict', json={'time_data': warmup_time, 'flux_data': warmup_flux})
+    _warmup_request('POST', '/predict', json={'time_data': warmup_time, 'flux_data': warmup_flux,
+                                              'detrend': 'median', 'multi_planet': True, 'windowed': True})
+
+@warmup.step('pools', required=True)
+def warm_pools():
+    # The mock-sized curve is analysed inline; one long enough to reach the analysis and window
+    # pools goes to every analysis process, and its windows to every window process
+    n_points = max(analysis_pool.min_points if analysis_pool.enabled else 0,
+                   PARALLEL_MIN_POINTS if pool_workers() else 0)
+    if not n_points:
+        return
+    # With a margin for the points sigma clipping removes before the windowed search
+    warmup_time, warmup_flux = _warmup_curve(int(n_points * 1.1))
+    body = {'time_data': warmup_time, 'flux_data': warmup_flux, 'windowed': True}
+    n_requests = analysis_pool.processes if analysis_pool.enabled else 1
+    with ThreadPoolExecutor(n_requests) as executor:
+        responses = list(executor.map(lambda _: _warmup_request('POST', '/predict', json=body), range(n_requests)))
+    if not analysis_pool.enabled and pool_workers():
+        workers = responses[0].json['windowed_search']['workers']
+        if workers < 2:
+            raise RuntimeError(f'Windowed search ran on {workers} worker instead of the window pool')
+
+@warmup.step('analyze_file')
+def warm_analyze_file():
+    _warmup_request('POST', '/api/analyze/file', content_type='multipart/form-data',
+                    data={'file': (io.BytesIO(_warmup_csv()), 'warmup.csv'), 'phase_fold': 'true'})
+
+@warmup.step('analyze_archive')
+def warm_analyze_archive():
+    # One member per archive process, so each of them parses and scores a curve
+    pool = analysis_pool if analysis_pool.enabled else archive_pool
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as bundle:
+        for i in range(max(pool.processes, 1)):
+            bundle.writestr(f'warmup_{i}.csv', _warmup_csv())
+    archive.seek(0)
+    response = _warmup_request('POST', '/api/analyze/archive', content_type='multipart/form-data',
+                               data={'archive': (archive, 'warmup.zip')})
+    for line in response.get_data(as_text=True).splitlines():
+        record = app.json.loads(line)
+        if record.get('status') == 'error':
+            raise RuntimeError(f"Archive analysis failed: {record['error']}")
+        if 'curve_hash' in record.get('result', {}):
+            warmup_hashes.add(record['result']['curve_hash'])
+
+@warmup.step('mock_curves')
+def warm_mock_curves():
+    # The identifier endpoint's archive query needs the network; its mock data path does not
+    mock = nasa_fetcher._generate_generic_mock_data('WARMUP')
+    result = analyzer.predict(mock['light_curve']['time'], mock['light_curve']['flux'])
+    if 'curve_hash' in result:
+        warmup_hashes.add(result['curve_hash'])
+
+@warmup.step('sessions')
+def warm_sessions():
+    session_id = _warmup_request('POST', '/api/sessions', json={}).json['session_id']
+    try:
+        warmup_time, warmup_flux = _warmup_curve()
+        _warmup_request('POST', f'/api/sessions/{session_id}/append',
+                        json={'time_data': warmup_time, 'flux_data': warmup_flux})
+        _warmup_request('GET', f'/api/sessions/{session_id}')
+        _warmup_request('POST', f'/api/sessions/{session_id}/finalize')
+    finally:
+        _warmup_request('DELETE', f'/api/sessions/{session_id}')
+
+@warmup.step('model_info', required=True)
+def warm_model_info():
+    _warmup_request('GET', '/model/info')
+
+@warmup.on_finish
+def forget_warmup_curves():
+    if analyzer.feature_store is not None:
+        for curve_hash in warmup_hashes:
+            analyzer.feature_store.delete(curve_hash)
+    warmup_hashes.clear()
+    _warmup_curve.cache_clear()
+
 if __name__ == '__main__':
-    # Load model on startup
-    analyzer.load_model()
+    # Load the model and start the background services
+    create_app()
     
     # Run the app
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Batch analysis of light curve archives
+A zip or tar upload (optionally gzip/bz2/xz compressed) is read member by
+member from the uploaded file; no member is ever extracted to disk.
+Each CSV, TXT or FITS member is parsed and scored as one task on a
+process pool (worker threads only where no pool is available), and one
+record per file is yielded as soon as its analysis finishes.
+"""
+
+import os
+import time
+import zlib
+import shutil
+import tempfile
+import tarfile
+import zipfile
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, BinaryIO, Callable, Dict, Iterator, Optional, Tuple
+
+from light_curve import MAX_UPLOAD_BYTES
+
+try:
+    from lzma import LZMAError
+except ImportError:  # pragma: no cover - Python built without lzma
+    LZMAError = OSError
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_WORKERS = int(os.environ.get('ARCHIVE_WORKERS', 4))
+# Worker processes for archive members when the shared analysis pool is disabled
+ARCHIVE_PROCESSES = int(os.environ.get('ARCHIVE_PROCESSES', os.cpu_count() or 1))
+MAX_ARCHIVE_MEMBERS = int(os.environ.get('MAX_ARCHIVE_MEMBERS', 10_000))
+# Uncompressed bytes read from one archive, guarding against decompression bombs
+MAX_ARCHIVE_BYTES = int(os.environ.get('MAX_ARCHIVE_BYTES', 4 * 1024 ** 3))
+LIGHT_CURVE_EXTENSIONS = ('.csv', '.txt', '.dat', '.fits', '.fit')
+# What truncated or corrupt compressed data raises while a member is read
+CORRUPT_DATA_ERRORS = (zipfile.BadZipFile, tarfile.TarError, zlib.error, LZMAError, EOFError, OSError)
+
+# (member name, content, error) as read from an archive
+Member = Tuple[str, Optional[bytes], Optional[str]]
+
+
+class ArchiveError(ValueError):
+    """Raised when an upload is not a readable archive or exceeds the archive limits"""
+
+
+def _is_light_curve(name: str) -> bool:
+    base = os.path.basename(name)
+    return (not base.startswith('.') and '__MACOSX' not in name.split('/')
+            and base.lower().endswith(LIGHT_CURVE_EXTENSIONS))
+
+
+def _read_member(name: str, size: int, reader: Callable[[], BinaryIO], totals: Dict[str, int]) -> Member:
+    """Read one member within the per-file and per-archive limits"""
+    if totals['members'] >= MAX_ARCHIVE_MEMBERS:
+        raise ArchiveError(f'Archive has more than {MAX_ARCHIVE_MEMBERS} light curve files')
+    totals['members'] += 1
+    if size > MAX_UPLOAD_BYTES:
+        return name, None, f'File is larger than {MAX_UPLOAD_BYTES} bytes'
+    with reader() as handle:
+        # Declared sizes can lie; never read more than the limit allows
+        content = handle.read(MAX_UPLOAD_BYTES + 1)
+    if len(content) > MAX_UPLOAD_BYTES:
+        return name, None, f'File is larger than {MAX_UPLOAD_BYTES} bytes'
+    totals['bytes'] += len(content)
+    if totals['bytes'] > MAX_ARCHIVE_BYTES:
+        raise ArchiveError(f'Archive expands to more than {MAX_ARCHIVE_BYTES} bytes')
+    return name, content, None
+
+
+def _zip_members(archive: zipfile.ZipFile) -> Iterator[Member]:
+    totals = {'members': 0, 'bytes': 0}
+    with archive:
+        for info in archive.infolist():
+            if info.is_dir() or not _is_light_curve(info.filename):
+                continue
+            try:
+                member = _read_member(info.filename, info.file_size, lambda: archive.open(info), totals)
+            except CORRUPT_DATA_ERRORS as e:
+                # Zip members are stored independently; the others are still readable
+                member = info.filename, None, f'Corrupt archive member: {e}'
+            yield member
+
+
+def _tar_members(archive: tarfile.TarFile) -> Iterator[Member]:
+    totals = {'members': 0, 'bytes': 0}
+    with archive:
+        try:
+            for info in archive:
+                if not info.isfile() or not _is_light_curve(info.name):
+                    continue
+                yield _read_member(info.name, info.size, lambda: archive.extractfile(info), totals)
+        except CORRUPT_DATA_ERRORS as e:
+            # A tar stream cannot be read past a damaged block
+            raise ArchiveError(f'Corrupt tar archive: {e}')
+
+
+def spool_upload(stream: BinaryIO) -> BinaryIO:
+    """
+    Copy an uploaded archive into a file owned by the caller. Request files
+    are closed when the view returns, before a streamed response is read.
+    """
+    # A real file: SpooledTemporaryFile lacks seekable() before Python 3.11, which zipfile needs
+    spool = tempfile.TemporaryFile()
+    shutil.copyfileobj(stream, spool)
+    spool.seek(0)
+    return spool
+
+
+def _seekable(stream: BinaryIO) -> bool:
+    """Whether `stream` supports seeking, for file objects that may lack seekable()"""
+    try:
+        stream.seek(stream.tell())
+        return True
+    except (AttributeError, OSError, ValueError):
+        return False
+
+
+def open_archive(stream: BinaryIO) -> Iterator[Member]:
+    """
+    Open a zip or tar archive from a file object and return an iterator of
+    (name, content, error) for its light curve members. The format is
+    detected here, so an unreadable upload raises ArchiveError before any
+    response is started. Tar archives are read sequentially, so the stream
+    does not need to be seekable for them.
+    """
+    try:
+        seekable = _seekable(stream)
+        if seekable and zipfile.is_zipfile(stream):
+            stream.seek(0)
+            return _zip_members(zipfile.ZipFile(stream))
+        if seekable:
+            stream.seek(0)
+        return _tar_members(tarfile.open(fileobj=stream, mode='r|*'))
+    except CORRUPT_DATA_ERRORS as e:
+        raise ArchiveError(f'Upload is not a zip or tar archive: {e}')
+
+
+def score_archive(members: Iterator[Member], analyze: Callable[[bytes, str], Dict[str, Any]],
+                  workers: int = ARCHIVE_WORKERS, executor=None) -> Iterator[Dict[str, Any]]:
+    """
+    Run `analyze(content, name)` for every member and yield one record per
+    file in completion order, then a summary record. Tasks go to `executor`
+    (anything with a concurrent.futures `submit`, such as a process pool;
+    `analyze` must then be picklable), by default to `workers` threads.
+    At most twice `workers` members are held in memory at once.
+    """
+    started = time.perf_counter()
+    counts = {'files': 0, 'succeeded': 0, 'failed': 0}
+
+    def record(index: int, name: str, result: Dict[str, Any] = None, error: str = None) -> Dict[str, Any]:
+        counts['files'] += 1
+        if error is None:
+            counts['succeeded'] += 1
+            return {'index': index, 'filename': name, 'status': 'ok', 'result': result}
+        counts['failed'] += 1
+        return {'index': index, 'filename': name, 'status': 'error', 'error': error}
+
+    def collect(pending: Dict) -> Iterator[Dict[str, Any]]:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            index, name = pending.pop(future)
+            try:
+                yield record(index, name, result=future.result())
+            except Exception as e:
+                yield record(index, name, error=str(e))
+
+    pending = {}
+    threads = None
+    if executor is None:
+        executor = threads = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='archive')
+    try:
+        for index, (name, content, error) in enumerate(members):
+            if error is not None:
+                yield record(index, name, error=error)
+                continue
+            pending[executor.submit(analyze, content, name)] = (index, name)
+            del content
+            if len(pending) >= 2 * max(1, workers):
+                yield from collect(pending)
+        while pending:
+            yield from collect(pending)
+    finally:
+        # Client gone or archive unreadable: drop work that has not started
+        for future in pending:
+            future.cancel()
+        if threads is not None:
+            threads.shutdown(wait=True)
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Scored archive of {counts['files']} files in {elapsed:.1f}s")
+    yield {'summary': True, **counts, 'elapsed_ms': round(elapsed * 1000, 1)}
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Columnar batch scoring of many light curves
+Reads a Parquet or Arrow table with one row per cadence and a star id column,
+groups it by star with one sort, cleans, detrends and extracts the features of
+each star's curve exactly as /predict does, and classifies all stars in a
+single model call. Predictions and class probabilities are written back as a
+table with one row per star.
+
+Usage: python batch_scoring.py curves.parquet scores.parquet [--star-column star_id]
+"""
+
+import json
+import time
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Tuple
+
+from light_curve import TIME_DTYPE
+from preprocessing import (DETREND_METHODS, DEFAULT_DETREND_WINDOW, CLIP_MODES, DEFAULT_CLIP, DEFAULT_CLIP_SIGMA,
+                           clean_light_curve, detrend)
+from folding import estimate_transit_shape
+
+logger = logging.getLogger(__name__)
+
+ARROW_EXTENSIONS = ('.arrow', '.feather', '.ipc')
+DEFAULT_COLUMNS = {'star': 'star_id', 'time': 'time', 'flux': 'flux', 'quality': 'quality'}
+MIN_BATCH_POINTS = 10
+
+
+def read_table(path: str, columns: List[str] = None) -> pd.DataFrame:
+    """Read a Parquet or Arrow IPC file (pyarrow is required for both)"""
+    try:
+        if path.lower().endswith(ARROW_EXTENSIONS):
+            return pd.read_feather(path, columns=columns)
+        return pd.read_parquet(path, columns=columns)
+    except ImportError as e:
+        raise ValueError(f'Reading {path} requires pyarrow: {e}')
+
+
+def write_table(frame: pd.DataFrame, path: str):
+    """Write a Parquet or Arrow IPC file, chosen by extension"""
+    try:
+        if path.lower().endswith(ARROW_EXTENSIONS):
+            frame.to_feather(path)
+        else:
+            frame.to_parquet(path, index=False)
+    except ImportError as e:
+        raise ValueError(f'Writing {path} requires pyarrow: {e}')
+
+
+def group_rows(star_ids: np.ndarray, time_data: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Row order that sorts the table by star (in order of first appearance),
+    then time; the unique star ids; and the start row of each star's group.
+    """
+    codes, stars = pd.factorize(star_ids)
+    if np.any(codes < 0):
+        raise ValueError('Star id column contains missing values')
+    order = np.lexsort((time_data, codes))
+    sorted_codes = codes[order]
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(sorted_codes)) + 1)) if len(order) else np.array([], int)
+    return order, np.asarray(stars), starts
+
+
+def score_frame(analyzer, frame: pd.DataFrame, star_column: str = DEFAULT_COLUMNS['star'],
+                time_column: str = DEFAULT_COLUMNS['time'], flux_column: str = DEFAULT_COLUMNS['flux'],
+                quality_column: Optional[str] = None, detrend_method: str = 'none',
+                detrend_window: float = DEFAULT_DETREND_WINDOW, clip: str = DEFAULT_CLIP,
+                clip_sigma: float = DEFAULT_CLIP_SIGMA) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Classify every star of a cadence table. Returns one row per star, with
+    an `error` column for stars that could not be scored, and a throughput
+    report.
+    """
+    started = time.perf_counter()
+    missing = [name for name in (star_column, time_column, flux_column, quality_column)
+               if name is not None and name not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+
+    time_data = frame[time_column].to_numpy(dtype=TIME_DTYPE)
+    flux_data = frame[flux_column].to_numpy(dtype=np.float64)
+    quality = frame[quality_column].to_numpy(dtype=np.int64) if quality_column else None
+    order, stars, starts = group_rows(frame[star_column].to_numpy(), time_data)
+    time_data, flux_data = time_data[order], flux_data[order]
+    if quality is not None:
+        quality = quality[order]
+    ends = np.append(starts[1:], len(order))
+
+    # Cleaning, detrending and period search depend on each curve's own shape
+    errors: List[Optional[str]] = [None] * len(stars)
+    curves, scored = [], []
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        try:
+            if end - start < MIN_BATCH_POINTS:
+                raise ValueError(f'Light curve must contain at least {MIN_BATCH_POINTS} data points')
+            t, f, _ = clean_light_curve(time_data[start:end], flux_data[start:end],
+                                        None if quality is None else quality[start:end], clip, clip_sigma)
+            f, _ = detrend(t, f, detrend_method, detrend_window)
+            curves.append((t, f))
+            scored.append(i)
+        except ValueError as e:
+            errors[i] = str(e)
+
+    result = pd.DataFrame({star_column: stars, 'n_points': ends - starts})
+    predictions = np.full(len(stars), None, dtype=object)
+    confidence = np.full(len(stars), np.nan)
+    periods, depths, durations, epochs = (np.full(len(stars), np.nan) for _ in range(4))
+    class_names = [str(name) for name in analyzer.model.classes_]
+    probabilities = np.full((len(stars), len(class_names)), np.nan)
+
+    if scored:
+        # The same extraction as /predict, curve by curve; features the model does not use are skipped
+        extracted = [analyzer._extract_features(t, f) for t, f in curves]
+        features = np.vstack([row for row, _, _ in extracted])
+
+        # One scaler and model call for every star
+        features_scaled = analyzer.model_input(features)
+        scored_probabilities = analyzer.model.predict_proba(features_scaled)
+        best = np.argmax(scored_probabilities, axis=1)
+        predictions[scored] = np.asarray(class_names, dtype=object)[best]
+        confidence[scored] = scored_probabilities[np.arange(len(best)), best]
+        probabilities[scored] = scored_probabilities
+
+        periods[scored] = [np.nan if period is None else period for _, period, _ in extracted]
+        depths[scored] = [depth for _, _, depth in extracted]
+        for (t, f), i in zip(curves, scored):
+            if np.isnan(periods[i]):
+                continue
+            shape = estimate_transit_shape(t, f, periods[i])
+            if shape is not None:
+                depths[i], durations[i], epochs[i] = shape['depth'], shape['duration_hours'], shape['epoch']
+            else:
+                durations[i] = analyzer._estimate_transit_duration(periods[i], depths[i])
+
+    result['prediction'] = predictions
+    result['confidence'] = confidence
+    for k, name in enumerate(class_names):
+        result[f'probability_{name}'] = probabilities[:, k]
+    result['transit_period'] = periods
+    result['transit_depth'] = depths
+    result['transit_duration'] = durations
+    result['transit_epoch'] = epochs
+    result['model_version'] = analyzer.model_version
+    result['error'] = errors
+
+    elapsed = time.perf_counter() - started
+    report = {
+        'curves': len(stars),
+        'scored': len(scored),
+        'failed': len(stars) - len(scored),
+        'points': len(order),
+        'elapsed_s': round(elapsed, 3),
+        'curves_per_second': round(len(stars) / elapsed, 1) if elapsed > 0 else None
+    }
+    logger.info(f"Scored {report['curves']} curves at {report['curves_per_second']} curves/s")
+    return result, report
+
+
+def score_file(analyzer, input_path: str, output_path: str, star_column: str = DEFAULT_COLUMNS['star'],
+               time_column: str = DEFAULT_COLUMNS['time'], flux_column: str = DEFAULT_COLUMNS['flux'],
+               quality_column: Optional[str] = None, **options) -> Dict[str, Any]:
+    """Score a Parquet/Arrow cadence table and write the per-star results next to it"""
+    started = time.perf_counter()
+    columns = [name for name in (star_column, time_column, flux_column, quality_column) if name]
+    frame = read_table(input_path, columns)
+    result, report = score_frame(analyzer, frame, star_column, time_column, flux_column, quality_column, **options)
+    write_table(result, output_path)
+    elapsed = time.perf_counter() - started
+    report.update({
+        'output': output_path,
+        'total_elapsed_s': round(elapsed, 3),
+        'total_curves_per_second': round(report['curves'] / elapsed, 1) if elapsed > 0 else None
+    })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score a Parquet/Arrow table of light curves grouped by star')
+    parser.add_argument('input', help='Parquet or Arrow (.arrow/.feather) file, one row per cadence')
+    parser.add_argument('output', help='Parquet or Arrow file for the per-star predictions')
+    parser.add_argument('--star-column', default=DEFAULT_COLUMNS['star'], help='Star id column')
+    parser.add_argument('--time-column', default=DEFAULT_COLUMNS['time'], help='Time column (days)')
+    parser.add_argument('--flux-column', default=DEFAULT_COLUMNS['flux'], help='Flux column')
+    parser.add_argument('--quality-column', help='Quality flag column, if any')
+    parser.add_argument('--detrend', choices=DETREND_METHODS, default='none', help='Detrending method')
+    parser.add_argument('--detrend-window', type=float, default=DEFAULT_DETREND_WINDOW,
+                        help='Detrending window (days)')
+    parser.add_argument('--clip', choices=CLIP_MODES, default=DEFAULT_CLIP, help='Sigma clipping mode')
+    parser.add_argument('--clip-sigma', type=float, default=DEFAULT_CLIP_SIGMA, help='Sigma clipping threshold')
+    parser.add_argument('--model', default='model.pkl', help='Path to the trained model')
+    args = parser.parse_args()
+
+    from app import ExoplanetAnalyzer
+
+    analyzer = ExoplanetAnalyzer()
+    analyzer.load_model(args.model)
+    report = score_file(analyzer, args.input, args.output, args.star_column, args.time_column,
+                        args.flux_column, args.quality_column, detrend_method=args.detrend,
+                        detrend_window=args.detrend_window, clip=args.clip, clip_sigma=args.clip_sigma)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Performance benchmarks for the exoplanet AI service
+Run all suites with `python benchmarks.py`, or name the suites to run,
+e.g. `python benchmarks.py serialization`.
+"""
+
+import argparse
+import io
+import time
+import logging
+import numpy as np
+from typing import Callable, Dict, List
+
+# Keep benchmark output readable
+logging.basicConfig(level=logging.WARNING)
+
+
+def time_call(func: Callable, repeat: int = 20) -> Dict[str, float]:
+    """Run `func` `repeat` times and return timing statistics in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples = np.array(samples)
+    return {
+        'mean_ms': float(samples.mean()),
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p99_ms': float(np.percentile(samples, 99))
+    }
+
+
+def print_table(title: str, rows: List[Dict], columns: List[str]):
+    """Print benchmark rows as an aligned table"""
+    print(f"\n{title}")
+    widths = [max(len(col), *(len(_format(row[col])) for row in rows)) for col in columns]
+    print('  '.join(col.ljust(w) for col, w in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(_format(row[col]).ljust(w) for col, w in zip(columns, widths)))
+
+
+def _format(value) -> str:
+    return f"{value:.3f}" if isinstance(value, float) else str(value)
+
+
+def _sample_curve(n_points: int, seed: int = 0):
+    """Synthetic light curve with a periodic transit"""
+    rng = np.random.default_rng(seed)
+    time_data = np.linspace(0, 30, n_points)
+    flux_data = 1.0 + rng.normal(0, 0.001, n_points)
+    flux_data[np.mod(time_data, 3.2) < 0.1] -= 0.01
+    return time_data, flux_data
+
+
+def _service():
+    """The app module with its model loaded, without starting the server's background services"""
+    import app as service
+    if service.analyzer.model is None:
+        service.analyzer.load_model()
+    return service
+
+
+def _endpoint_payloads() -> Dict[str, Dict]:
+    """Representative response payloads for each analysis endpoint"""
+    service = _service()
+
+    client = service.app.test_client()
+    time_data, flux_data = _sample_curve(5000)
+    body = 'time,flux\n' + '\n'.join(f'{t:.6f},{f:.8f}' for t, f in zip(time_data, flux_data))
+
+    payloads = {}
+    payloads['/predict'] = service.analyzer.predict(time_data, flux_data)
+    payloads['/api/analyze/file'] = client.post('/api/analyze/file', data={
+        'file': (io.BytesIO(body.encode()), 'curve.csv'), 'max_points': '2000', 'phase_fold': 'true'
+    }).get_json()
+
+    # Rebuild the identifier response from the mock fetcher so the numbers stay offline
+    nasa_data = service.nasa_fetcher._generate_generic_mock_data('KIC-0000000')
+    curve = nasa_data['light_curve']
+    result = service.analyzer.predict(curve['time'], curve['flux'])
+    result.update(nasa_data)
+    payloads['/api/analyze/identifier (full mock curve)'] = result
+    return payloads
+
+
+def bench_serialization(repeat: int = 50):
+    """Serialization and compression time per endpoint payload and backend"""
+    import serialization
+
+    rows = []
+    for endpoint, payload in _endpoint_payloads().items():
+        for backend in serialization.SERIALIZERS:
+            dumps = serialization.SERIALIZERS[backend]
+            body = dumps(payload)
+            row = {'endpoint': endpoint, 'backend': backend, 'bytes': len(body)}
+            row.update({f'encode_{k}': v for k, v in time_call(lambda: dumps(payload), repeat).items()
+                        if k != 'p99_ms'})
+            for encoding in ('gzip', 'deflate'):
+                row[f'{encoding}_bytes'] = len(serialization.compress_body(body, encoding))
+            row['gzip_ms'] = time_call(lambda: serialization.compress_body(body, 'gzip'), repeat)['mean_ms']
+            rows.append(row)
+
+    print_table('Serialization', rows, [
+        'endpoint', 'backend', 'bytes', 'encode_mean_ms', 'encode_p50_ms',
+        'gzip_bytes', 'deflate_bytes', 'gzip_ms'
+    ])
+
+
+def bench_windowed(n_points: int = 2_000_000, repeat: int = 3):
+    """Sliding-window detection throughput versus process count"""
+    import os
+    from windowed import windowed_search
+
+    time_data = np.linspace(0, 1500, n_points)
+    flux_data = 1.0 + np.random.default_rng(0).normal(0, 0.001, n_points)
+
+    rows = []
+    baseline_ms = None
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        windowed_search(time_data, flux_data, workers=workers)  # warm the pool
+        stats = time_call(lambda: windowed_search(time_data, flux_data, workers=workers), repeat)
+        baseline_ms = baseline_ms or stats['mean_ms']
+        rows.append({
+            'workers': workers,
+            'mean_ms': stats['mean_ms'],
+            'points_per_s': n_points / stats['mean_ms'] * 1000,
+            'speedup': baseline_ms / stats['mean_ms']
+        })
+        workers *= 2
+
+    print_table(f'Windowed detection ({n_points} points)', rows, ['workers', 'mean_ms', 'points_per_s', 'speedup'])
+
+
+def bench_offload(n_points: int = 50_000, requests: int = 16):
+    """Concurrent analysis throughput, request threads only versus the process pool"""
+    import os
+    from concurrent.futures import ThreadPoolExecutor
+    from offload import AnalysisPool
+    service = _service()
+
+    time_data, flux_data = _sample_curve(n_points)
+    cpus = os.cpu_count() or 1
+    counts = [0] + [2 ** i for i in range(cpus.bit_length()) if 2 ** i <= cpus]
+
+    rows = []
+    baseline = None
+    for processes in counts:
+        pool = AnalysisPool(service.analyzer, processes, min_points=0)
+        pool.start()
+        pool.predict(time_data, flux_data)  # warm every cache on the dispatch path
+        threads = max(processes, cpus)
+        with ThreadPoolExecutor(threads) as executor:
+            start = time.perf_counter()
+            list(executor.map(lambda _: pool.predict(time_data, flux_data), range(requests)))
+            elapsed = time.perf_counter() - start
+        pool.shutdown()
+        baseline = baseline or requests / elapsed
+        rows.append({
+            'processes': processes or 'inline',
+            'threads': threads,
+            'curves_per_s': requests / elapsed,
+            'speedup': requests / elapsed / baseline
+        })
+
+    print_table(f'Analysis offload ({requests} requests of {n_points} points)', rows,
+                ['processes', 'threads', 'curves_per_s', 'speedup'])
+
+
+def _autocorrelation_period(time_data: np.ndarray, flux_data: np.ndarray) -> float:
+    """The service's former period estimate: an autocorrelation lag index read off the time axis"""
+    detrended = flux_data - flux_data.mean()
+    autocorr = np.correlate(detrended, detrended, mode='full')[len(flux_data) - 1:]
+    peak_idx = np.argmax(autocorr[5:]) + 5
+    return max(0.5, min(50, float(time_data[peak_idx] - time_data[0])))
+
+
+def bench_period(sizes=(1_500, 20_000, 100_000, 1_000_000), true_period: float = 4.37):
+    """Period estimation latency and accuracy, old autocorrelation versus Lomb-Scargle"""
+    from periodogram import LombScargle, estimate_period
+
+    methods = {
+        'autocorrelation': _autocorrelation_period,
+        'lomb-scargle exact': lambda t, f: estimate_period(t, f, method='exact'),
+        'lomb-scargle fast': lambda t, f: estimate_period(t, f, method='fast')
+    }
+    if LombScargle is not None:
+        methods['lomb-scargle astropy'] = lambda t, f: estimate_period(t, f, method='astropy')
+    # Quadratic methods are skipped where a single run would take minutes
+    limits = {'autocorrelation': 100_000, 'lomb-scargle exact': 100_000}
+
+    rng = np.random.default_rng(0)
+    rows = []
+    for n_points in sizes:
+        for sampling in ('uniform', 'gappy'):
+            time_data = np.linspace(0, 90, n_points)
+            if sampling == 'gappy':
+                time_data = np.sort(rng.uniform(0, 90, n_points))
+                time_data = time_data[np.mod(time_data, 13.7) > 4.0]  # periodic downlink gaps
+            flux_data = (1.0 + 0.002 * np.sin(2 * np.pi * time_data / true_period)
+                         + rng.normal(0, 0.001, len(time_data)))
+            for name, method in methods.items():
+                if len(time_data) > limits.get(name, np.inf):
+                    continue
+                repeat = 1 if len(time_data) > 20_000 else 5
+                stats = time_call(lambda: method(time_data, flux_data), repeat)
+                rows.append({
+                    'points': len(time_data),
+                    'sampling': sampling,
+                    'method': name,
+                    'mean_ms': stats['mean_ms'],
+                    'period': method(time_data, flux_data)
+                })
+
+    print_table(f'Period estimation (true period {true_period} d)', rows,
+                ['points', 'sampling', 'method', 'mean_ms', 'period'])
+
+
+def bench_reduction(n_points: int = 50_000, repeat: int = 3):
+    """Measured per-point cost of each analysis stage, to calibrate STAGE_COST_US"""
+    from preprocessing import STAGE_COST_US
+    service = _service()
+
+    time_data, flux_data = _sample_curve(n_points)
+    stage_options = {
+        'base': {},
+        'median': {'detrend': 'median'},
+        'biweight': {'detrend': 'biweight'},
+        'savgol': {'detrend': 'savgol'},
+        'multi_planet': {'multi_planet': True},
+        'windowed': {'windowed': True}
+    }
+
+    rows = []
+    base_us = None
+    for stage, options in stage_options.items():
+        # Budget is disabled so every stage runs at full resolution
+        stats = time_call(lambda: service.analyzer.predict(time_data, flux_data, latency_budget_ms=0, **options),
+                          1 if stage == 'multi_planet' else repeat)
+        per_point_us = stats['mean_ms'] * 1000 / n_points
+        base_us = base_us if base_us is not None else per_point_us
+        rows.append({
+            'stage': stage,
+            'mean_ms': stats['mean_ms'],
+            'measured_us_per_point': per_point_us if stage == 'base' else per_point_us - base_us,
+            'configured_us_per_point': STAGE_COST_US[stage]
+        })
+
+    print_table(f'Analysis stage cost ({n_points} points)', rows,
+                ['stage', 'mean_ms', 'measured_us_per_point', 'configured_us_per_point'])
+
+
+def bench_batch(n_curves: int = 200, n_points: int = 2_000):
+    """Curves per second of columnar batch scoring against one predict call per curve"""
+    import pandas as pd
+    service = _service()
+    from batch_scoring import score_frame
+
+    curves = [_sample_curve(n_points, seed) for seed in range(n_curves)]
+    frame = pd.DataFrame({
+        'star_id': np.repeat(np.arange(n_curves), n_points),
+        'time': np.concatenate([t for t, _ in curves]),
+        'flux': np.concatenate([f for _, f in curves])
+    })
+
+    per_curve = time_call(lambda: [service.analyzer.predict(t, f) for t, f in curves], 1)
+    batch = time_call(lambda: score_frame(service.analyzer, frame), 1)
+    rows = [
+        {'path': name, 'total_ms': stats['mean_ms'], 'curves_per_second': n_curves * 1000 / stats['mean_ms']}
+        for name, stats in (('predict per curve', per_curve), ('batch_scoring', batch))
+    ]
+    print_table(f'Batch scoring ({n_curves} curves x {n_points} points)', rows,
+                ['path', 'total_ms', 'curves_per_second'])
+
+
+def bench_features(model_paths=('model.pkl', 'model_reduced.pkl'), sizes=(1_500, 100_000), repeat: int = 5):
+    """
+    Feature extraction and classification time per model file, e.g. the full
+    model against the reduced-feature variant from
+    `create_model.py --reduced-features --output model_reduced.pkl`
+    """
+    import os
+    import app as service
+
+    rows = []
+    for path in model_paths:
+        if not os.path.exists(path):
+            print(f"\n{path} not found; skipped")
+            continue
+        analyzer = service.ExoplanetAnalyzer()
+        analyzer.load_model(path)
+        for n_points in sizes:
+            time_data, flux_data = _sample_curve(n_points)
+            extract = time_call(lambda: analyzer._extract_features(time_data, flux_data), repeat)
+            classify = time_call(lambda: analyzer.classify_features(
+                *analyzer._extract_features(time_data, flux_data)), repeat)
+            rows.append({
+                'model': path,
+                'points': n_points,
+                'features': len(analyzer.feature_order),
+                'extract_ms': extract['mean_ms'],
+                'extract_and_classify_ms': classify['mean_ms']
+            })
+    if rows:
+        print_table('Lazy feature extraction by model', rows,
+                    ['model', 'points', 'features', 'extract_ms', 'extract_and_classify_ms'])
+
+
+def bench_backends(repeat: int = 200):
+    """Training time, inference latency, model size, training memory and accuracy per model backend"""
+    import pickle
+    import tracemalloc
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+    from create_model import create_training_dataset, measure_latency
+    from model_backends import BACKENDS, build_model
+
+    X, y = create_training_dataset()
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    scaler = StandardScaler().fit(X_train)
+    X_train, X_test = scaler.transform(X_train), scaler.transform(X_test)
+
+    rows = []
+    for name in BACKENDS:
+        model = build_model(name)
+        tracemalloc.start()
+        start = time.perf_counter()
+        model.fit(X_train, y_train)
+        train_s = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        # Served one row per request, as the service does
+        if hasattr(model, 'n_jobs'):
+            model.n_jobs = 1
+        latency = measure_latency(model, X_test, repeat)
+        rows.append({
+            'backend': name,
+            'train_s': train_s,
+            'row_p50_ms': latency['row_p50_ms'],
+            'row_p99_ms': latency['row_p99_ms'],
+            'batch_1000_ms': latency['batch_ms'],
+            'model_kb': len(pickle.dumps(model)) / 1024,
+            'train_peak_mb': peak / 1024 ** 2,
+            'accuracy': float(model.score(X_test, y_test))
+        })
+
+    print_table(f'Model backends ({len(X_train)} training rows)', rows,
+                ['backend', 'train_s', 'row_p50_ms', 'row_p99_ms', 'batch_1000_ms', 'model_kb',
+                 'train_peak_mb', 'accuracy'])
+
+
+BENCHMARKS = {
+    'serialization': bench_serialization,
+    'windowed': bench_windowed,
+    'offload': bench_offload,
+    'period': bench_period,
+    'reduction': bench_reduction,
+    'batch': bench_batch,
+    'features': bench_features,
+    'backends': bench_backends
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('suites', nargs='*',
+                        help=f"Benchmark suites to run: {', '.join(BENCHMARKS)} (default: all)")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.suites if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(unknown)}")
+
+    for name in args.suites or BENCHMARKS:
+        BENCHMARKS[name]()
+
+
+if __name__ == '__main__':
+    main()
@@ -6,17 +6,55 @@ This script generates a Random Forest model trained on synthetic data
 
 import numpy as np
 import pandas as pd
+from sklearn.base import clone
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import StratifiedKFold, train_test_split
 from sklearn.metrics import classification_report, confusion_matrix
 import joblib
 import logging
+import time
+import argparse
+from itertools import product
+from typing import Any, Dict, List, Tuple
+
+from feature_store import FeatureStore
+from model_backends import BACKENDS, DEFAULT_BACKEND, backend_name, build_model, feature_importances
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+FEATURE_NAMES = [
+    'flux_mean', 'flux_std', 'flux_min', 'flux_max', 'flux_range',
+    'flux_skew', 'flux_kurtosis', 'transit_depth_estimate',
+    'period_estimate', 'snr_estimate'
+]
+
+# Candidate forests for compaction: tree count, depth and cost-complexity pruning
+COMPACTION_GRID = {
+    'n_estimators': [25, 50, 100, 200],
+    'max_depth': [6, 10, 15],
+    'ccp_alpha': [0.0, 0.001]
+}
+DEFAULT_MAX_ACCURACY_LOSS = 0.005
+LATENCY_BATCH_SIZE = 1000
+# Share of the training split held out to choose the compact forest; the test split is only reported
+COMPACTION_VALIDATION_SIZE = 0.2
+
+# Hyperparameter search space; class_weight and min_samples_split stay as in train_model
+SEARCH_SPACE = {
+    'n_estimators': [50, 100, 200],
+    'max_depth': [8, 15, None],
+    'min_samples_leaf': [1, 2, 4],
+    'max_features': ['sqrt', None]
+}
+DEFAULT_SEARCH_FOLDS = 5
+
+# Skipped by the reduced-feature variant: the period search dominates feature extraction time
+REDUCED_FEATURE_DROP = ['period_estimate']
+DEFAULT_SEARCH_CACHE = '.search_cache'
+
 def generate_synthetic_features(n_samples: int, class_label: str) -> np.ndarray:
     """Generate synthetic features for different exoplanet classes"""
     np.random.seed(42)
@@ -98,37 +136,197 @@ def create_training_dataset():
     
     return X, np.array(y)
 
-def train_model():
-    """Train the exoplanet detection model"""
+def load_stored_features(path: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Labelled feature vectors recorded by the service's feature store"""
+    stored = FeatureStore(path, FEATURE_NAMES).load(labelled_only=True)
+    # Curves scored by a reduced-feature model lack the skipped features
+    stored = stored.dropna(subset=FEATURE_NAMES)
+    logger.info(f"Loaded {len(stored)} labelled curves with every feature from feature store {path}")
+    return stored[FEATURE_NAMES].to_numpy(dtype=np.float64), stored['label'].to_numpy()
+
+def measure_latency(model, X: np.ndarray, repeat: int = 50) -> Dict[str, float]:
+    """
+    Inference latency in milliseconds: p50/p99 of one row classified the way the
+    service does it (predict + predict_proba), and one batch of LATENCY_BATCH_SIZE rows
+    """
+    rows = X[np.arange(repeat) % len(X)]
+    samples = []
+    for i in range(repeat):
+        row = rows[i:i + 1]
+        start = time.perf_counter()
+        model.predict(row)
+        model.predict_proba(row)
+        samples.append((time.perf_counter() - start) * 1000)
+    batch = X[np.arange(LATENCY_BATCH_SIZE) % len(X)]
+    start = time.perf_counter()
+    model.predict_proba(batch)
+    batch_ms = (time.perf_counter() - start) * 1000
+    return {
+        'row_p50_ms': float(np.percentile(samples, 50)),
+        'row_p99_ms': float(np.percentile(samples, 99)),
+        'batch_ms': batch_ms
+    }
+
+def pareto_front(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Rows not beaten on both validation accuracy and single-row p99 latency by any other row"""
+    front = []
+    for row in rows:
+        dominated = any(
+            other['accuracy'] >= row['accuracy'] and other['row_p99_ms'] <= row['row_p99_ms']
+            and (other['accuracy'] > row['accuracy'] or other['row_p99_ms'] < row['row_p99_ms'])
+            for other in rows
+        )
+        if not dominated:
+            front.append(row)
+    return sorted(front, key=lambda row: row['row_p99_ms'])
+
+def compact_forest(X_train: np.ndarray, y_train: np.ndarray, X_val: np.ndarray, y_val: np.ndarray,
+                   reference_accuracy: float, max_accuracy_loss: float = DEFAULT_MAX_ACCURACY_LOSS):
+    """
+    Train every forest in COMPACTION_GRID and keep the fastest one whose
+    validation accuracy is within `max_accuracy_loss` of the reference
+    model's accuracy on the same validation split. The test split must not
+    be passed here: it is reserved for reporting the chosen forest.
+    Prints the Pareto report and returns the chosen model and its row.
+    """
+    logger.info(f"Compacting the forest over {np.prod([len(v) for v in COMPACTION_GRID.values()])} candidates...")
+    rows, models = [], []
+    for n_estimators, max_depth, ccp_alpha in product(*COMPACTION_GRID.values()):
+        model = build_model('random_forest', n_estimators=n_estimators, max_depth=max_depth, ccp_alpha=ccp_alpha)
+        model.fit(X_train, y_train)
+        # The service classifies one row per request; thread dispatch would dominate
+        model.n_jobs = 1
+        rows.append({
+            'n_estimators': n_estimators,
+            'max_depth': max_depth,
+            'ccp_alpha': ccp_alpha,
+            'nodes': sum(tree.tree_.node_count for tree in model.estimators_),
+            'accuracy': model.score(X_val, y_val),
+            **measure_latency(model, X_val)
+        })
+        models.append(model)
+    
+    front = pareto_front(rows)
+    acceptable = [row for row in front if row['accuracy'] >= reference_accuracy - max_accuracy_loss]
+    chosen = acceptable[0] if acceptable else max(front, key=lambda row: row['accuracy'])
+    
+    report = pd.DataFrame(front)
+    report['chosen'] = [row is chosen for row in front]
+    logger.info(f"\nPareto front on the validation split (reference accuracy {reference_accuracy:.4f}, "
+                f"tolerated loss {max_accuracy_loss:.4f}):")
+    print(report.to_string(index=False, float_format=lambda v: f'{v:.4f}'))
+    return models[rows.index(chosen)], chosen
+
+def _search_forest(params: Dict[str, Any], n_jobs: int = 1) -> RandomForestClassifier:
+    return build_model('random_forest', **params, n_jobs=n_jobs)
+
+def _cross_validate_fold(params: Dict[str, Any], X: np.ndarray, y: np.ndarray,
+                         train_index: np.ndarray, test_index: np.ndarray) -> float:
+    """Held-out accuracy of one configuration on one fold"""
+    model = _search_forest(params)
+    model.fit(X[train_index], y[train_index])
+    return float(model.score(X[test_index], y[test_index]))
+
+def search_hyperparameters(X_train: np.ndarray, y_train: np.ndarray, latency_budget_ms: float = None,
+                           folds: int = DEFAULT_SEARCH_FOLDS, candidates: int = None,
+                           cache_dir: str = DEFAULT_SEARCH_CACHE, n_jobs: int = -1) -> RandomForestClassifier:
+    """
+    Cross-validate SEARCH_SPACE configurations (or a random sample of
+    `candidates` of them) in parallel, one task per configuration and fold.
+    Fold results are cached in `cache_dir`, so an interrupted search resumes
+    where it stopped. Configurations are then refitted in order of mean CV
+    accuracy until one meets the single-row p99 `latency_budget_ms`, which
+    is measured here, serially, rather than in the contended workers.
+    """
+    grid = [dict(zip(SEARCH_SPACE, values)) for values in product(*SEARCH_SPACE.values())]
+    if candidates and candidates < len(grid):
+        chosen = np.random.default_rng(42).choice(len(grid), candidates, replace=False)
+        grid = [grid[i] for i in sorted(chosen)]
+    splits = list(StratifiedKFold(folds, shuffle=True, random_state=42).split(X_train, y_train))
+    
+    evaluate = joblib.Memory(cache_dir, verbose=0).cache(_cross_validate_fold) if cache_dir else _cross_validate_fold
+    logger.info(f"Cross-validating {len(grid)} configurations x {folds} folds...")
+    start = time.perf_counter()
+    scores = joblib.Parallel(n_jobs=n_jobs)(
+        joblib.delayed(evaluate)(params, X_train, y_train, train, test) for params in grid for train, test in splits
+    )
+    logger.info(f"Cross-validation finished in {time.perf_counter() - start:.1f}s")
+    
+    scores = np.array(scores).reshape(len(grid), folds)
+    rows = sorted(
+        ({**params, 'cv_accuracy': float(fold_scores.mean()), 'cv_std': float(fold_scores.std()),
+          'row_p99_ms': np.nan} for params, fold_scores in zip(grid, scores)),
+        key=lambda row: -row['cv_accuracy']
+    )
+    
+    best = None
+    for row in rows:
+        params = {name: row[name] for name in SEARCH_SPACE}
+        model = _search_forest(params, n_jobs=-1)
+        model.fit(X_train, y_train)
+        # The service classifies one row per request; thread dispatch would dominate
+        model.n_jobs = 1
+        row['row_p99_ms'] = measure_latency(model, X_train)['row_p99_ms']
+        if latency_budget_ms is None or row['row_p99_ms'] <= latency_budget_ms:
+            best = row
+            break
+    
+    logger.info(f"\nSearch results (p99 budget: {latency_budget_ms or 'none'} ms):")
+    print(pd.DataFrame(rows).to_string(index=False, float_format=lambda v: f'{v:.4f}'))
+    if best is None:
+        fastest = min(rows, key=lambda row: row['row_p99_ms'])
+        raise ValueError(f"No configuration meets the {latency_budget_ms} ms p99 budget; "
+                         f"the fastest needs {fastest['row_p99_ms']:.2f} ms")
+    logger.info(f"Selected {dict((name, best[name]) for name in SEARCH_SPACE)}: "
+                f"CV accuracy {best['cv_accuracy']:.4f}, p99 {best['row_p99_ms']:.2f} ms per row")
+    return model
+
+def train_model(feature_store: str = None, compact: bool = False,
+                max_accuracy_loss: float = DEFAULT_MAX_ACCURACY_LOSS, search: bool = False,
+                search_options: Dict[str, Any] = None, drop_features: List[str] = None,
+                backend: str = DEFAULT_BACKEND):
+    """
+    Train the exoplanet detection model with a registered `backend`
+    (see model_backends.BACKENDS). With `search`, hyperparameters come
+    from `search_hyperparameters(**search_options)` instead of the defaults;
+    with `compact`, the forest is then compacted to a smaller, faster one.
+    `drop_features` trains a reduced-feature variant on the remaining
+    columns only, so the service does not compute the dropped ones.
+    Returns the model, its scaler and the feature names it was trained on.
+    """
     logger.info("Starting model training...")
     
     # Generate training data
     X, y = create_training_dataset()
     
+    # Add vetted curves seen in production, without reprocessing their light curves
+    if feature_store:
+        X_stored, y_stored = load_stored_features(feature_store)
+        X = np.vstack([X, X_stored])
+        y = np.concatenate([y, y_stored])
+    
     # Split the data
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.2, random_state=42, stratify=y
     )
     
+    # A reduced-feature variant is scaled, trained and saved on the retained columns only
+    feature_names = [name for name in FEATURE_NAMES if name not in (drop_features or [])]
+    kept = [FEATURE_NAMES.index(name) for name in feature_names]
+    
     # Scale the features
     scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
-    
-    # Train Random Forest model
-    # Using parameters that achieve good performance on imbalanced data
-    model = RandomForestClassifier(
-        n_estimators=200,
-        max_depth=15,
-        min_samples_split=5,
-        min_samples_leaf=2,
-        class_weight='balanced',  # Handle class imbalance
-        random_state=42,
-        n_jobs=-1
-    )
+    X_train_scaled = scaler.fit_transform(X_train[:, kept])
+    X_test_scaled = scaler.transform(X_test[:, kept])
     
-    logger.info("Training Random Forest model...")
-    model.fit(X_train_scaled, y_train)
+    if search:
+        model = search_hyperparameters(X_train_scaled, y_train, **(search_options or {}))
+    else:
+        # Backend defaults are tuned for the imbalanced class distribution
+        model = build_model(backend)
+        
+        logger.info(f"Training {backend} model...")
+        model.fit(X_train_scaled, y_train)
     
     # Evaluate the model
     train_score = model.score(X_train_scaled, y_train)
@@ -143,34 +341,57 @@ def train_model():
     print(classification_report(y_test, y_pred))
     
     # Feature importance
-    feature_names = [
-        'flux_mean', 'flux_std', 'flux_min', 'flux_max', 'flux_range',
-        'flux_skew', 'flux_kurtosis', 'transit_depth_estimate',
-        'period_estimate', 'snr_estimate'
-    ]
+    importances = feature_importances(model)
+    if importances is not None:
+        importance_df = pd.DataFrame({
+            'feature': feature_names,
+            'importance': importances
+        }).sort_values('importance', ascending=False)
+        
+        logger.info("\nFeature Importance:")
+        print(importance_df)
     
-    importance_df = pd.DataFrame({
-        'feature': feature_names,
-        'importance': model.feature_importances_
-    }).sort_values('importance', ascending=False)
+    if drop_features:
+        full_scaler = StandardScaler().fit(X_train)
+        full_model = clone(model).fit(full_scaler.transform(X_train), y_train)
+        full_score = full_model.score(full_scaler.transform(X_test), y_test)
+        logger.info(f"Reduced feature set without {', '.join(drop_features)}: test accuracy {test_score:.4f}, "
+                    f"{full_score:.4f} with every feature ({test_score - full_score:+.4f}). "
+                    f"Run `python benchmarks.py features` for the extraction time it saves")
     
-    logger.info("\nFeature Importance:")
-    print(importance_df)
+    if compact:
+        model.n_jobs = 1
+        reference = measure_latency(model, X_test_scaled)
+        logger.info(f"Reference forest: p99 {reference['row_p99_ms']:.2f} ms per row, "
+                    f"{reference['batch_ms']:.1f} ms per {LATENCY_BATCH_SIZE} rows")
+        # Candidates are compared on a validation split carved from the training data
+        X_fit, X_val, y_fit, y_val = train_test_split(
+            X_train_scaled, y_train, test_size=COMPACTION_VALIDATION_SIZE, random_state=42, stratify=y_train
+        )
+        reference_accuracy = clone(model).fit(X_fit, y_fit).score(X_val, y_val)
+        compact, chosen = compact_forest(X_fit, y_fit, X_val, y_val, reference_accuracy, max_accuracy_loss)
+        # The chosen configuration is refitted on the whole training split and scored once on the test split
+        model = clone(compact).fit(X_train_scaled, y_train)
+        model.n_jobs = 1
+        logger.info(f"Compact forest: {chosen['n_estimators']} trees, depth {chosen['max_depth']}, "
+                    f"validation accuracy {chosen['accuracy']:.4f}, "
+                    f"test accuracy {model.score(X_test_scaled, y_test):.4f} (reference {test_score:.4f}), "
+                    f"p99 {chosen['row_p99_ms']:.2f} ms per row")
     
-    return model, scaler
+    return model, scaler, feature_names
 
-def save_model(model, scaler, filename='model.pkl'):
-    """Save the trained model and scaler"""
+def save_model(model, scaler, filename='model.pkl', feature_names: List[str] = None,
+               dropped_features: List[str] = None):
+    """Save the trained model and scaler with the feature columns it takes, in order"""
     model_data = {
         'model': model,
         'scaler': scaler,
-        'feature_names': [
-            'flux_mean', 'flux_std', 'flux_min', 'flux_max', 'flux_range',
-            'flux_skew', 'flux_kurtosis', 'transit_depth_estimate',
-            'period_estimate', 'snr_estimate'
-        ],
+        'feature_names': list(feature_names or FEATURE_NAMES),
         'classes': model.classes_.tolist(),
-        'model_type': 'RandomForestClassifier',
+        'model_type': type(model).__name__,
+        'backend': backend_name(model),
+        'hyperparameters': model.get_params(deep=False),
+        'dropped_features': list(dropped_features or []),
         'version': '1.0.0'
     }
     
@@ -179,13 +400,56 @@ def save_model(model, scaler, filename='model.pkl'):
 
 def main():
     """Main function to create and save the model"""
+    parser = argparse.ArgumentParser(description='Create the exoplanet detection model')
+    parser.add_argument('--feature-store', help='feature store database whose labelled curves are added to training')
+    parser.add_argument('--compact', action='store_true',
+                        help='search smaller forests and save the fastest within --max-accuracy-loss')
+    parser.add_argument('--max-accuracy-loss', type=float, default=DEFAULT_MAX_ACCURACY_LOSS,
+                        help='held-out accuracy the compact forest may give up (default: %(default)s)')
+    parser.add_argument('--search', action='store_true',
+                        help='cross-validate SEARCH_SPACE in parallel instead of the default hyperparameters')
+    parser.add_argument('--latency-budget-ms', type=float,
+                        help='single-row p99 inference latency the searched model must meet')
+    parser.add_argument('--folds', type=int, default=DEFAULT_SEARCH_FOLDS, help='cross-validation folds')
+    parser.add_argument('--candidates', type=int, help='evaluate a random sample of this many configurations')
+    parser.add_argument('--search-cache', default=DEFAULT_SEARCH_CACHE,
+                        help='directory of cached fold results, so searches resume (empty disables)')
+    parser.add_argument('--search-jobs', type=int, default=-1, help='parallel search processes (-1: all cores)')
+    parser.add_argument('--reduced-features', action='store_true',
+                        help=f"train the reduced-feature variant without {', '.join(REDUCED_FEATURE_DROP)}")
+    parser.add_argument('--drop-features', help='comma-separated features the reduced variant skips instead')
+    parser.add_argument('--output', default='model.pkl', help='model file to write (default: %(default)s)')
+    parser.add_argument('--backend', choices=list(BACKENDS), default=DEFAULT_BACKEND,
+                        help='classifier backend to train (default: %(default)s)')
+    args = parser.parse_args()
+    
+    if (args.search or args.compact) and args.backend != 'random_forest':
+        parser.error('--search and --compact tune random forests; use --backend random_forest')
+    
+    drop_features = None
+    if args.drop_features:
+        drop_features = [name.strip() for name in args.drop_features.split(',') if name.strip()]
+    elif args.reduced_features:
+        drop_features = REDUCED_FEATURE_DROP
+    unknown = [name for name in drop_features or [] if name not in FEATURE_NAMES]
+    if unknown:
+        parser.error(f"unknown feature(s): {', '.join(unknown)}")
+    
     logger.info("Creating exoplanet detection model...")
     
     # Train the model
-    model, scaler = train_model()
+    search_options = {
+        'latency_budget_ms': args.latency_budget_ms,
+        'folds': args.folds,
+        'candidates': args.candidates,
+        'cache_dir': args.search_cache or None,
+        'n_jobs': args.search_jobs
+    }
+    model, scaler, feature_names = train_model(args.feature_store, args.compact, args.max_accuracy_loss, args.search,
+                                search_options, drop_features, args.backend)
     
     # Save the model
-    save_model(model, scaler)
+    save_model(model, scaler, args.output, feature_names, drop_features)
     
     logger.info("Model creation completed successfully!")
     logger.info("The model achieves ~99% accuracy on synthetic data")
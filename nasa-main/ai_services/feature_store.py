@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Persistent feature store for served light curves
+Every analyzed curve's feature vector is kept in a local SQLite table, one
+column per feature, keyed by a hash of the curve and the options that
+shape its features. Repeat analyses of the same curve skip detrending and
+extraction, and retraining can read features, model version and outcome
+for many curves at once instead of reprocessing raw light curves.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional
+
+from folding import curve_hash
+
+logger = logging.getLogger(__name__)
+
+# Shared with the job queue; the directory is created when the store is first opened
+DATA_DIR = os.environ.get('DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+FEATURE_STORE = os.environ.get('FEATURE_STORE', os.path.join(DATA_DIR, 'features.db'))  # empty disables the store
+
+
+def feature_key(time_data: np.ndarray, flux_data: np.ndarray, **options) -> Dict[str, str]:
+    """Hash of the raw curve and the store key combining it with the extraction options"""
+    raw_hash = curve_hash(time_data, flux_data)
+    key = hashlib.blake2b(f'{raw_hash}:{json.dumps(options, sort_keys=True)}'.encode(), digest_size=16)
+    return {'curve_hash': raw_hash, 'curve_key': key.hexdigest()}
+
+
+class FeatureStore:
+    """
+    SQLite table of feature vectors, transit estimates and predictions per curve
+    """
+
+    def __init__(self, path: str, feature_names: List[str]):
+        self.path = path
+        self.feature_names = list(feature_names)
+        self._local = threading.local()
+        self._schema_ready = False
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        # Features the serving model does not use are not computed and stored as NULL
+        columns = ', '.join(f'{name} REAL' for name in self.feature_names)
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS features (
+                curve_key TEXT PRIMARY KEY,
+                curve_hash TEXT NOT NULL,
+                n_points INTEGER NOT NULL,
+                options TEXT NOT NULL,
+                {columns},
+                transit_period REAL,
+                transit_depth REAL NOT NULL,
+                detrending TEXT,
+                transit_shape TEXT,
+                model_version TEXT,
+                prediction TEXT,
+                confidence REAL,
+                label TEXT,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.execute('CREATE INDEX IF NOT EXISTS features_hash ON features (curve_hash)')
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; connections must not cross a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            if not self._schema_ready:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            if not self._schema_ready:
+                self._create_schema(conn)
+                self._schema_ready = True
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, curve_key: str) -> Optional[Dict[str, Any]]:
+        """Stored extraction results for a curve key, or None"""
+        row = self._connect().execute('SELECT * FROM features WHERE curve_key = ?', (curve_key,)).fetchone()
+        if row is None:
+            return None
+        return {
+            'features': np.array([[row[name] for name in self.feature_names]], dtype=np.float64),
+            'transit_period': row['transit_period'],
+            'transit_depth': row['transit_depth'],
+            'detrending': json.loads(row['detrending']) if row['detrending'] else None,
+            'transit_shape': json.loads(row['transit_shape']) if row['transit_shape'] else None
+        }
+
+    def put(self, keys: Dict[str, str], n_points: int, options: Dict[str, Any], features: np.ndarray,
+            transit_period: float, transit_depth: float, detrending: Dict[str, Any] = None,
+            transit_shape: Dict[str, float] = None):
+        """Store a freshly extracted feature vector; NaN features and a None period are stored as NULL"""
+        now = time.time()
+        names = ', '.join(self.feature_names)
+        values = [None if np.isnan(value) else value for value in np.asarray(features, dtype=np.float64).ravel()]
+        try:
+            self._connect().execute(
+                f'INSERT OR REPLACE INTO features (curve_key, curve_hash, n_points, options, {names}, transit_period, '
+                f'transit_depth, detrending, transit_shape, created_at, updated_at) '
+                f'VALUES ({", ".join("?" * (len(self.feature_names) + 10))})',
+                (keys['curve_key'], keys['curve_hash'], int(n_points), json.dumps(options, sort_keys=True),
+                 *values, None if transit_period is None else float(transit_period), float(transit_depth),
+                 json.dumps(detrending) if detrending is not None else None,
+                 json.dumps(transit_shape) if transit_shape is not None else None, now, now)
+            )
+        except sqlite3.IntegrityError as e:
+            # Databases created before features could be skipped require every column
+            logger.warning(f"Feature store {self.path} rejected a partial feature vector: {e}")
+
+    def record_outcome(self, curve_key: str, model_version: str, prediction: str, confidence: float,
+                       hit: bool = False):
+        """Record the latest model version and prediction for a stored curve"""
+        self._connect().execute(
+            'UPDATE features SET model_version = ?, prediction = ?, confidence = ?, hits = hits + ?, '
+            'updated_at = ? WHERE curve_key = ?',
+            (model_version, prediction, float(confidence), int(hit), time.time(), curve_key)
+        )
+
+    def set_label(self, curve_hash: str, label: str) -> int:
+        """Attach a vetted class label to every stored entry of a curve; returns rows updated"""
+        cursor = self._connect().execute(
+            'UPDATE features SET label = ?, updated_at = ? WHERE curve_hash = ?', (label, time.time(), curve_hash)
+        )
+        return cursor.rowcount
+
+    def delete(self, curve_hash: str) -> int:
+        """Remove every stored entry of a curve; returns rows deleted"""
+        return self._connect().execute('DELETE FROM features WHERE curve_hash = ?', (curve_hash,)).rowcount
+
+    def load(self, labelled_only: bool = False, model_version: str = None) -> pd.DataFrame:
+        """All stored rows as a DataFrame, for bulk retraining or export (e.g. `.to_parquet`)"""
+        query = 'SELECT * FROM features'
+        clauses, args = [], []
+        if labelled_only:
+            clauses.append('label IS NOT NULL')
+        if model_version is not None:
+            clauses.append('model_version = ?')
+            args.append(model_version)
+        if clauses:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        return pd.read_sql_query(query, self._connect(), params=args)
+
+    def stats(self) -> Dict[str, int]:
+        row = self._connect().execute(
+            'SELECT COUNT(*) AS curves, COALESCE(SUM(hits), 0) AS hits, COUNT(label) AS labelled FROM features'
+        ).fetchone()
+        return dict(row)
+
+
+def open_feature_store(feature_names: List[str], path: str = FEATURE_STORE) -> Optional[FeatureStore]:
+    """The configured feature store, or None when disabled or unavailable"""
+    if not path:
+        return None
+    try:
+        store = FeatureStore(path, feature_names)
+        store.stats()  # creates the database, so an unusable path disables the store here
+        return store
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"Feature store {path} unavailable: {e}")
+        return None
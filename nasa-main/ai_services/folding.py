@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Vectorized phase folding and binning
+Folds a light curve on one or many trial periods at once and averages it
+into phase bins with np.bincount, so no sort is needed. Single-period folds
+are cached per (curve hash, period, epoch, bins), letting the analyzer's
+depth and duration estimates and the visualization payload share one fold.
+"""
+
+import os
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Upper bound on (trial period x point) elements folded at once
+MAX_FOLD_ELEMENTS = int(os.environ.get('MAX_FOLD_ELEMENTS', 4_000_000))
+FOLD_CACHE_SIZE = int(os.environ.get('FOLD_CACHE_SIZE', 256))
+
+
+def curve_hash(time_data: np.ndarray, flux_data: np.ndarray) -> str:
+    """Content hash identifying a light curve"""
+    digest = hashlib.blake2b(digest_size=16)
+    for array in (time_data, flux_data):
+        array = np.ascontiguousarray(array)
+        digest.update(array.dtype.str.encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def fold_phase(time_data: np.ndarray, period, epoch: float, centered: bool = False) -> np.ndarray:
+    """
+    Phase of each point in [0, 1). With `centered`, phase 0.5 falls on the
+    epoch so a transit at the epoch sits in the middle of the folded curve.
+    `period` may be an array of shape (P, 1) to fold on many periods at once.
+    """
+    offset = 0.5 if centered else 0.0
+    return np.mod((np.asarray(time_data, dtype=np.float64) - epoch) / period + offset, 1.0)
+
+
+def binned_sums(time_data: np.ndarray, flux_data: np.ndarray, periods: np.ndarray, epoch: float,
+                n_bins: int, centered: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Phase-binned flux sums and counts for every trial period, shape (P, n_bins).
+    Periods are processed in batches of at most MAX_FOLD_ELEMENTS folded points.
+    """
+    periods = np.atleast_1d(np.asarray(periods, dtype=np.float64))
+    sums = np.zeros((len(periods), n_bins))
+    counts = np.zeros((len(periods), n_bins))
+    if len(time_data) == 0:
+        return sums, counts
+
+    t = np.asarray(time_data, dtype=np.float64)
+    f = np.asarray(flux_data, dtype=np.float64)
+    batch = max(1, MAX_FOLD_ELEMENTS // len(t))
+    for start in range(0, len(periods), batch):
+        chunk = periods[start:start + batch]
+        phase = fold_phase(t[None, :], chunk[:, None], epoch, centered)
+        bins = np.minimum((phase * n_bins).astype(np.int64), n_bins - 1)
+        bins += (np.arange(len(chunk)) * n_bins)[:, None]
+        size = len(chunk) * n_bins
+        flat = bins.ravel()
+        sums[start:start + batch] = np.bincount(
+            flat, weights=np.broadcast_to(f, bins.shape).ravel(), minlength=size
+        ).reshape(len(chunk), n_bins)
+        counts[start:start + batch] = np.bincount(flat, minlength=size).reshape(len(chunk), n_bins)
+    return sums, counts
+
+
+class FoldCache:
+    """
+    Thread-safe LRU cache of single-period folds
+    """
+
+    def __init__(self, max_size: int = FOLD_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[tuple, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: tuple, value: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+fold_cache = FoldCache()
+
+
+def fold(time_data: np.ndarray, flux_data: np.ndarray, period: float, epoch: float,
+         n_bins: int, key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Fold on one period, centred on `epoch`, and average into `n_bins` bins.
+    Phases run over [-0.5, 0.5) with the epoch at 0. Results are cached;
+    pass `key` (see `curve_hash`) to skip re-hashing a curve.
+    """
+    key = key or curve_hash(time_data, flux_data)
+    cache_key = (key, round(float(period), 12), round(float(epoch), 12), int(n_bins))
+    cached = fold_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    sums, counts = binned_sums(time_data, flux_data, [period], epoch, n_bins, centered=True)
+    sums, counts = sums[0], counts[0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = np.where(counts > 0, sums / counts, np.nan)
+
+    result = {
+        'period': float(period),
+        'epoch': float(epoch),
+        'phase': (np.arange(n_bins) + 0.5) / n_bins - 0.5,
+        'flux': means,
+        'counts': counts.astype(np.int64)
+    }
+    fold_cache.put(cache_key, result)
+    return result
+
+
+def shape_bins(period: float) -> int:
+    """Number of phase bins `estimate_transit_shape` folds on: ~30 minute bins"""
+    return int(np.clip(period * 48, 50, 1000))
+
+
+def deepest_epoch(coarse_means: np.ndarray, t0: float, period: float) -> Optional[float]:
+    """Centre of the deepest bin of a fold starting half a period before `t0`, or None if the fold is empty"""
+    if np.all(np.isnan(coarse_means)):
+        return None
+    deepest = int(np.nanargmin(coarse_means))
+    return t0 + (deepest + 0.5) / len(coarse_means) * period
+
+
+def shape_from_fold(means: np.ndarray, epoch: float, period: float) -> Optional[Dict[str, float]]:
+    """Depth and duration of the dip at the centre of a fold centred on `epoch`; None without a dip"""
+    n_bins = len(means)
+    filled = ~np.isnan(means)
+    baseline = float(np.median(means[filled]))
+    centre = n_bins // 2
+    depth = baseline - float(means[centre])
+    if not depth > 0:
+        return None
+
+    # Contiguous run of below-half-depth bins around the centre (empty bins bridge gaps)
+    above = np.flatnonzero(~np.where(filled, means < baseline - depth / 2, True))
+    left = int(above[above < centre].max()) + 1 if np.any(above < centre) else 0
+    right = int(above[above > centre].min()) - 1 if np.any(above > centre) else n_bins - 1
+
+    return {
+        'epoch': float(epoch),
+        'depth': depth / baseline if baseline else depth,
+        'duration_hours': (right - left + 1) / n_bins * period * 24
+    }
+
+
+def estimate_transit_shape(time_data: np.ndarray, flux_data: np.ndarray, period: float,
+                           n_bins: int = None, key: Optional[str] = None) -> Optional[Dict[str, float]]:
+    """
+    Epoch, depth and duration of the deepest dip in the curve folded on `period`.
+    The epoch comes from an uncentred fold; depth is the binned median minus
+    the deepest bin, and duration the contiguous run of bins around it below
+    half depth. Returns None when the fold shows no dip.
+    """
+    if n_bins is None:
+        n_bins = shape_bins(period)
+    key = key or curve_hash(time_data, flux_data)
+    t0 = float(np.min(time_data))
+
+    coarse = fold(time_data, flux_data, period, t0 - period / 2, n_bins, key)
+    epoch = deepest_epoch(coarse['flux'], t0, period)
+    if epoch is None:
+        return None
+    centred = fold(time_data, flux_data, period, epoch, n_bins, key)
+    return shape_from_fold(centred['flux'], epoch, period)
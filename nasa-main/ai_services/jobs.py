@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Persistent background job queue for long-running analyses
+Jobs are stored in a local SQLite database and executed by worker threads
+inside each service process, so requests that would outlive the gunicorn
+worker timeout can be submitted and polled without an external broker.
+Every process serving the app shares the same database: jobs are claimed
+atomically, highest priority first, and survive restarts. Handlers report
+progress through their `JobContext`, which is also where a cancellation
+request stops a running job.
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+from serialization import numpy_default
+
+logger = logging.getLogger(__name__)
+
+# Local state lives in DATA_DIR (created on first use), never in the working directory
+DATA_DIR = os.environ.get('DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+JOBS_DB = os.environ.get('JOBS_DB', os.path.join(DATA_DIR, 'jobs.db'))
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_RETENTION = int(os.environ.get('JOB_RETENTION', 24 * 3600))  # seconds a finished job is kept
+JOB_STALE_AFTER = int(os.environ.get('JOB_STALE_AFTER', 600))  # seconds without a heartbeat
+JOB_POLL_INTERVAL = 1.0
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    params TEXT NOT NULL,
+    payload BLOB,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    updated_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, priority DESC, created_at);
+"""
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when its job has been cancelled"""
+
+
+class JobContext:
+    """
+    Handle passed to a job handler for its parameters, uploaded payload
+    and progress reporting
+    """
+
+    def __init__(self, queue: 'JobQueue', job_id: str, params: Dict[str, Any], payload: Optional[bytes]):
+        self.queue = queue
+        self.job_id = job_id
+        self.params = params
+        self.payload = payload
+
+    def progress(self, fraction: float, message: str = None):
+        """Record progress in [0, 1]; raises JobCancelled if cancellation was requested"""
+        if self.queue._update_progress(self.job_id, min(max(float(fraction), 0.0), 1.0), message):
+            raise JobCancelled(f'Job {self.job_id} cancelled')
+
+
+class JobQueue:
+    """
+    SQLite-backed priority queue with an in-process pool of worker threads
+    """
+
+    def __init__(self, db_path: str = JOBS_DB, workers: int = JOB_WORKERS,
+                 retention: int = JOB_RETENTION, stale_after: int = JOB_STALE_AFTER):
+        self.db_path = db_path
+        self.workers = workers
+        self.retention = retention
+        self.stale_after = stale_after
+        self.handlers: Dict[str, Callable[[JobContext], Dict[str, Any]]] = {}
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._start_lock = threading.Lock()
+        self._pid = None
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; connections must not cross a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            if not self._schema_ready:
+                # The database is created on first use, not when the queue is constructed
+                os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            if not self._schema_ready:
+                conn.executescript(_SCHEMA)
+                self._schema_ready = True
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def register(self, kind: str, handler: Callable[[JobContext], Dict[str, Any]]):
+        """Register the function that runs jobs of `kind`"""
+        self.handlers[kind] = handler
+
+    def start(self):
+        """Start the worker threads of this process (idempotent, fork-aware)"""
+        with self._start_lock:
+            if self._pid == os.getpid() or self.workers < 1:
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._worker, name=f'job-worker-{i}', daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout: float = None):
+        """Stop the worker threads after their current jobs"""
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._pid = None
+
+    def submit(self, kind: str, params: Dict[str, Any], payload: bytes = None, priority: int = 0) -> str:
+        """Queue a job and return its id"""
+        if kind not in self.handlers:
+            raise ValueError(f'Unknown job kind: {kind}')
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._connect().execute(
+            'INSERT INTO jobs (job_id, kind, status, priority, params, payload, created_at, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (job_id, kind, QUEUED, int(priority), json.dumps(params), payload, now, now)
+        )
+        self.start()
+        self._wake.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status of a job, with its result once it has succeeded"""
+        row = self._connect().execute(
+            'SELECT job_id, kind, status, priority, progress, message, result, error, '
+            'created_at, started_at, finished_at FROM jobs WHERE job_id = ?', (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        result = job.pop('result')
+        if result is not None:
+            job['result'] = json.loads(result)
+        if job['error'] is None:
+            del job['error']
+        return job
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        Cancel a job. Queued jobs are cancelled at once; running jobs stop at
+        their next progress report. Returns the resulting status, or None if
+        the job does not exist.
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            'UPDATE jobs SET status = ?, finished_at = ?, updated_at = ?, payload = NULL '
+            'WHERE job_id = ? AND status = ?', (CANCELLED, now, now, job_id, QUEUED)
+        )
+        conn.execute('UPDATE jobs SET cancel_requested = 1 WHERE job_id = ? AND status = ?', (job_id, RUNNING))
+        row = conn.execute('SELECT status, cancel_requested FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        return 'cancelling' if row['status'] == RUNNING and row['cancel_requested'] else row['status']
+
+    def purge(self) -> int:
+        """Delete finished jobs older than the retention period"""
+        cursor = self._connect().execute(
+            f'DELETE FROM jobs WHERE status IN ({",".join("?" * len(FINISHED_STATES))}) AND finished_at < ?',
+            (*FINISHED_STATES, time.time() - self.retention)
+        )
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        """Number of jobs in each state"""
+        rows = self._connect().execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status').fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Requeue jobs whose worker died without finishing them
+            conn.execute(
+                'UPDATE jobs SET status = ?, progress = 0, message = ? WHERE status = ? AND updated_at < ?',
+                (QUEUED, 'Requeued after worker loss', RUNNING, now - self.stale_after)
+            )
+            row = conn.execute(
+                'SELECT job_id, kind, params, payload FROM jobs WHERE status = ? '
+                'ORDER BY priority DESC, created_at LIMIT 1', (QUEUED,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    'UPDATE jobs SET status = ?, started_at = ?, updated_at = ? WHERE job_id = ?',
+                    (RUNNING, now, now, row['job_id'])
+                )
+            conn.execute('COMMIT')
+            return row
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _update_progress(self, job_id: str, progress: float, message: Optional[str]) -> bool:
+        """Store progress and refresh the heartbeat; returns whether cancellation was requested"""
+        conn = self._connect()
+        conn.execute(
+            'UPDATE jobs SET progress = ?, message = COALESCE(?, message), updated_at = ? WHERE job_id = ?',
+            (progress, message, time.time(), job_id)
+        )
+        row = conn.execute('SELECT cancel_requested FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return bool(row and row['cancel_requested'])
+
+    def _finish(self, job_id: str, status: str, result: Dict[str, Any] = None, error: str = None):
+        now = time.time()
+        self._connect().execute(
+            'UPDATE jobs SET status = ?, result = ?, error = ?, progress = CASE WHEN ? THEN 1 ELSE progress END, '
+            'message = CASE WHEN ? THEN ? ELSE message END, finished_at = ?, updated_at = ?, payload = NULL '
+            'WHERE job_id = ?',
+            (status, None if result is None else json.dumps(result, default=numpy_default), error,
+             status == SUCCEEDED, status == SUCCEEDED, 'Completed', now, now, job_id)
+        )
+
+    def _heartbeat(self, job_id: str, done: threading.Event):
+        # Keeps a job that reports progress rarely from being taken for a dead one
+        while not done.wait(self.stale_after / 3):
+            try:
+                self._connect().execute('UPDATE jobs SET updated_at = ? WHERE job_id = ?', (time.time(), job_id))
+            except sqlite3.Error as e:
+                logger.warning(f"Job {job_id} heartbeat failed: {e}")
+
+    def _run(self, row: sqlite3.Row):
+        job_id = row['job_id']
+        context = JobContext(self, job_id, json.loads(row['params']), row['payload'])
+        done = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(job_id, done), daemon=True).start()
+        try:
+            handler = self.handlers[row['kind']]
+            context.progress(0.0, 'Started')
+            result = handler(context)
+            self._finish(job_id, SUCCEEDED, result=result)
+        except JobCancelled:
+            self._finish(job_id, CANCELLED, error='Cancelled')
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            self._finish(job_id, FAILED, error=str(e))
+        finally:
+            done.set()
+
+    def _worker(self):
+        last_purge = 0.0
+        while not self._stop.is_set():
+            try:
+                if time.time() - last_purge > 60:
+                    self.purge()
+                    last_purge = time.time()
+                row = self._claim()
+            except sqlite3.Error as e:
+                logger.error(f"Job queue error: {e}")
+                row = None
+            if row is None:
+                self._wake.wait(JOB_POLL_INTERVAL)
+                self._wake.clear()
+                continue
+            self._run(row)
+
+
+def parse_job_options(params: Mapping[str, Any]) -> Dict[str, Any]:
+    """Read and validate the async/priority options from request JSON or form data"""
+    run_async = params.get('async', False)
+    if isinstance(run_async, str):
+        run_async = run_async.lower() in ('1', 'true', 'yes')
+    try:
+        priority = int(params.get('priority', 0))
+    except (TypeError, ValueError):
+        raise ValueError('priority must be an integer')
+    return {'async': bool(run_async), 'priority': priority}
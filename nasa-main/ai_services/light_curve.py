@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Light curve parsing and numeric precision helpers
+Shared by the Flask service and the offline tools so every entry point
+turns raw input into NumPy arrays exactly once, in the configured precision.
+"""
+
+import io
+import os
+import numpy as np
+from typing import Any, Iterable, Iterator, Optional, Tuple
+
+try:
+    from astropy.io import fits
+except ImportError:  # FITS input is unavailable without astropy
+    fits = None
+
+# Supported numeric precisions for the light curve data path
+SUPPORTED_PRECISIONS = {
+    'float32': np.float32,
+    'float64': np.float64
+}
+
+# Default flux precision, overridable per deployment
+DEFAULT_PRECISION = os.environ.get('FLOAT_PRECISION', 'float64').lower()
+
+# Timestamps stay in float64: BJD-scale values lose sub-minute resolution in float32
+TIME_DTYPE = np.dtype(np.float64)
+
+# Kepler/TESS light curve files: flux columns in order of preference
+FITS_EXTENSIONS = ('.fits', '.fit')
+FITS_FLUX_COLUMNS = ('PDCSAP_FLUX', 'SAP_FLUX', 'FLUX')
+# Header names of a text column holding quality flags; other extra columns (e.g. flux_err) are ignored
+QUALITY_COLUMNS = ('quality', 'sap_quality')
+
+# Hard limits that reject pathological payloads before they are parsed
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', 512 * 1024 * 1024))
+MAX_INPUT_POINTS = int(os.environ.get('MAX_INPUT_POINTS', 20_000_000))
+
+
+class InputTooLargeError(ValueError):
+    """Raised when a light curve exceeds MAX_INPUT_POINTS"""
+
+
+def check_input_size(n_points: int):
+    """Reject curves longer than MAX_INPUT_POINTS"""
+    if n_points > MAX_INPUT_POINTS:
+        raise InputTooLargeError(f'Light curve has {n_points} points; the limit is {MAX_INPUT_POINTS}')
+
+
+def resolve_dtype(precision: Optional[str] = None) -> np.dtype:
+    """Map a precision name to a NumPy dtype"""
+    name = (precision or DEFAULT_PRECISION).lower()
+    if name not in SUPPORTED_PRECISIONS:
+        raise ValueError(
+            f"Unsupported precision '{precision}'. "
+            f"Choose one of: {', '.join(SUPPORTED_PRECISIONS)}"
+        )
+    return np.dtype(SUPPORTED_PRECISIONS[name])
+
+
+def to_array(values: Any, dtype: np.dtype = np.float64) -> np.ndarray:
+    """Convert a sequence to a 1-D array without copying when possible"""
+    return np.asarray(values, dtype=dtype).ravel()
+
+
+def _is_header(line: str) -> bool:
+    """Whether the first line of a text light curve names its columns rather than holding data"""
+    parts = line.replace(',', ' ').split()
+    if not parts:
+        return False
+    try:
+        float(parts[0])
+        return False
+    except ValueError:
+        return True
+
+
+def parse_light_curve_text(content: str, dtype: np.dtype = np.float64, with_quality: bool = False):
+    """
+    Parse CSV or whitespace separated light curve text into time and flux arrays.
+    A leading header line is skipped, as are lines that do not hold two
+    numeric columns. Flux uses `dtype`, time is float64. With `with_quality`,
+    quality flags are returned as well: read from the column the header names
+    'quality' or 'sap_quality', and 0 when there is no such column.
+    Raises InputTooLargeError before parsing when there are too many lines.
+    """
+    check_input_size(content.count('\n'))
+    lines = content.strip().split('\n')
+    quality_index = None
+    if lines and _is_header(lines[0]):
+        names = [name.strip().strip('"\'').lower() for name in lines[0].replace(',', ' ').split()]
+        quality_index = next((i for i, name in enumerate(names) if name in QUALITY_COLUMNS), None)
+        lines = lines[1:]
+
+    time_data = []
+    flux_data = []
+    quality = []
+    for line in lines:
+        if line.strip():
+            parts = line.replace(',', ' ').split()
+            if len(parts) >= 2:
+                try:
+                    t = float(parts[0])
+                    f = float(parts[1])
+                except ValueError:
+                    continue
+                time_data.append(t)
+                flux_data.append(f)
+                if with_quality:
+                    try:
+                        quality.append(int(float(parts[quality_index])) if quality_index is not None
+                                       and len(parts) > quality_index else 0)
+                    except ValueError:
+                        quality.append(0)
+
+    arrays = np.array(time_data, dtype=TIME_DTYPE), np.array(flux_data, dtype=dtype)
+    if with_quality:
+        return arrays + (np.array(quality, dtype=np.int64),)
+    return arrays
+
+
+def parse_fits_light_curve(content: bytes, dtype: np.dtype = np.float64) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Read TIME, the preferred flux column and QUALITY from the first binary
+    table of a Kepler/TESS style FITS file. Returns time, flux and quality.
+    """
+    if fits is None:
+        raise ValueError('Reading FITS light curves requires astropy')
+    with fits.open(io.BytesIO(content), memmap=False) as hdul:
+        table = next((hdu for hdu in hdul if isinstance(hdu, fits.BinTableHDU)), None)
+        if table is None:
+            raise ValueError('FITS file has no binary table')
+        columns = {name.upper(): name for name in table.columns.names}
+        flux_column = next((columns[name] for name in FITS_FLUX_COLUMNS if name in columns), None)
+        if 'TIME' not in columns or flux_column is None:
+            raise ValueError('FITS table needs TIME and one of ' + ', '.join(FITS_FLUX_COLUMNS))
+        check_input_size(len(table.data))
+        time_data = np.asarray(table.data[columns['TIME']], dtype=TIME_DTYPE)
+        flux_data = np.asarray(table.data[flux_column], dtype=dtype)
+        if 'QUALITY' in columns:
+            quality = np.asarray(table.data[columns['QUALITY']], dtype=np.int64)
+        else:
+            quality = np.zeros(len(time_data), dtype=np.int64)
+    return time_data, flux_data, quality
+
+
+def parse_light_curve_file(content: bytes, filename: str,
+                           dtype: np.dtype = np.float64) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Parse an uploaded FITS or CSV/TXT light curve into time, flux and quality arrays"""
+    if filename.lower().endswith(FITS_EXTENSIONS):
+        return parse_fits_light_curve(content, dtype)
+    return parse_light_curve_text(content.decode('utf-8'), dtype, with_quality=True)
+
+
+def calculate_moments(data: np.ndarray) -> Tuple[float, float, float, float]:
+    """
+    Mean, standard deviation, skewness and excess kurtosis in one pass over
+    the centred data. Sums are accumulated in float64 so float32 inputs keep
+    the same accuracy as the float64 path.
+    """
+    mean = np.mean(data, dtype=np.float64)
+    centered = data - data.dtype.type(mean) if data.dtype.kind == 'f' else data - mean
+    m2 = np.mean(np.square(centered), dtype=np.float64)
+    std = float(np.sqrt(m2))
+    if std == 0:
+        return float(mean), 0.0, 0.0, 0.0
+    m3 = np.mean(centered ** 3, dtype=np.float64)
+    m4 = np.mean(centered ** 4, dtype=np.float64)
+    skewness = m3 / std ** 3
+    kurtosis = m4 / m2 ** 2 - 3
+    return float(mean), std, float(skewness), float(kurtosis)
+
+
+def iter_text_chunks(lines: Iterable[str], chunk_size: int,
+                     dtype: np.dtype = np.float64) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Parse a text light curve `chunk_size` lines at a time, with the same
+    rules as `parse_light_curve_text`, so the whole file is never in memory.
+    """
+    block = []
+    for line in lines:
+        block.append(line if isinstance(line, str) else line.decode('utf-8'))
+        if len(block) >= chunk_size:
+            yield parse_light_curve_text(''.join(block), dtype)
+            block = []
+    if block:
+        yield parse_light_curve_text(''.join(block), dtype)
+
+
+def iter_array_chunks(time_data: np.ndarray, flux_data: np.ndarray, chunk_size: int,
+                      dtype: np.dtype = np.float64) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Yield in-memory copies of consecutive chunks of (possibly memory-mapped) arrays"""
+    for start in range(0, len(flux_data), chunk_size):
+        yield (np.asarray(time_data[start:start + chunk_size], dtype=TIME_DTYPE),
+               np.asarray(flux_data[start:start + chunk_size], dtype=dtype))
+
+
+def open_light_curve_chunks(path: str, chunk_size: int, dtype: np.dtype = np.float64,
+                            flux_path: Optional[str] = None) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Iterate over a light curve file in chunks without loading it whole.
+    `.npy` files are memory-mapped: either one (n, 2) array of time and flux,
+    or separate time and flux arrays when `flux_path` is given. Anything else
+    is parsed as CSV/TXT text.
+    """
+    if path.endswith('.npy'):
+        data = np.load(path, mmap_mode='r')
+        if flux_path is not None:
+            time_data, flux_data = data, np.load(flux_path, mmap_mode='r')
+        elif data.ndim == 2 and data.shape[1] >= 2:
+            time_data, flux_data = data[:, 0], data[:, 1]
+        else:
+            raise ValueError('A single .npy light curve must have shape (n, 2)')
+        if len(time_data) != len(flux_data):
+            raise ValueError('time and flux arrays must have the same length')
+        yield from iter_array_chunks(time_data, flux_data, chunk_size, dtype)
+    else:
+        with open(path, 'r', encoding='utf-8') as handle:
+            yield from iter_text_chunks(handle, chunk_size, dtype)
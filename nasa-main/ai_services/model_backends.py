@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Registry of classifier backends for the exoplanet model
+Each backend is a factory returning an unfitted estimator with the
+scikit-learn classifier interface the service relies on: fit, predict,
+predict_proba and classes_. `create_model.py` trains any registered backend
+and `app.py` serves whichever one a model file holds, so trying a faster
+classifier needs a new factory here rather than changes to either.
+"""
+
+import logging
+import joblib
+import numpy as np
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+BACKENDS: Dict[str, Callable[..., Any]] = {}
+# Import path of the estimator class each backend builds, so a loaded model is
+# identified without importing or constructing every backend
+BACKEND_CLASSES: Dict[str, str] = {}
+DEFAULT_BACKEND = 'random_forest'
+
+
+def register_backend(name: str, model_class: str):
+    """
+    Register a factory `f(**params) -> estimator` under `name`; `model_class`
+    is the import path of the estimator it returns (e.g. 'sklearn.svm.SVC')
+    """
+    def decorator(factory: Callable[..., Any]) -> Callable[..., Any]:
+        BACKENDS[name] = factory
+        BACKEND_CLASSES[name] = model_class
+        return factory
+    return decorator
+
+
+@register_backend('random_forest', 'sklearn.ensemble.RandomForestClassifier')
+def random_forest(**params):
+    """The service's original forest: balanced classes, 200 trees of depth 15"""
+    from sklearn.ensemble import RandomForestClassifier
+    options = {'n_estimators': 200, 'max_depth': 15, 'min_samples_split': 5, 'min_samples_leaf': 2,
+               'class_weight': 'balanced', 'random_state': 42, 'n_jobs': -1}
+    options.update(params)
+    return RandomForestClassifier(**options)
+
+
+@register_backend('hist_gradient_boosting', 'sklearn.ensemble.HistGradientBoostingClassifier')
+def hist_gradient_boosting(**params):
+    """Histogram gradient boosting: binned features, fast single-row inference"""
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    options = {'max_iter': 200, 'learning_rate': 0.1, 'max_leaf_nodes': 31, 'class_weight': 'balanced',
+               'random_state': 42}
+    options.update(params)
+    return HistGradientBoostingClassifier(**options)
+
+
+@register_backend('logistic', 'sklearn.linear_model.LogisticRegression')
+def logistic(**params):
+    """Multinomial logistic regression on the scaled features"""
+    from sklearn.linear_model import LogisticRegression
+    options = {'C': 1.0, 'max_iter': 1000, 'class_weight': 'balanced'}
+    options.update(params)
+    return LogisticRegression(**options)
+
+
+def build_model(backend: str = DEFAULT_BACKEND, **params):
+    """Unfitted estimator of a registered backend"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown model backend '{backend}'. Choose one of: {', '.join(BACKENDS)}")
+    return BACKENDS[backend](**params)
+
+
+def backend_name(model) -> str:
+    """Registered name of the backend that built `model`, or its class name"""
+    cls = type(model)
+    for name, path in BACKEND_CLASSES.items():
+        module, _, class_name = path.rpartition('.')
+        # Estimators are defined in private submodules of the package they are imported from
+        if cls.__name__ == class_name and (cls.__module__ == module or cls.__module__.startswith(module + '.')):
+            return name
+    return cls.__name__
+
+
+def feature_importances(model) -> Optional[np.ndarray]:
+    """
+    Non-negative importance per input feature, or None when the backend
+    does not expose one. Zero means the model never looks at the feature.
+    """
+    importances = getattr(model, 'feature_importances_', None)
+    if importances is not None:
+        return np.asarray(importances, dtype=np.float64)
+    coef = getattr(model, 'coef_', None)
+    if coef is not None:
+        return np.abs(np.atleast_2d(coef)).sum(axis=0)
+    return None
+
+
+def load_model_data(path: str) -> Dict[str, Any]:
+    """
+    Read a model file: the standard dict layout written by `create_model.py`
+    (model, scaler, version, backend, ...) or a bare fitted estimator.
+    Raises ValueError if the model lacks the classifier interface.
+    """
+    model_data = joblib.load(path)
+    if not isinstance(model_data, dict):
+        model_data = {'model': model_data}
+    model = model_data.get('model')
+    missing = [name for name in ('predict', 'predict_proba', 'classes_') if not hasattr(model, name)]
+    if missing:
+        raise ValueError(f"Model in {path} lacks {', '.join(missing)}")
+    model_data.setdefault('backend', backend_name(model))
+    return model_data
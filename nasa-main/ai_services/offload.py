@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Process-pool offload of CPU-bound analyses
+Request threads share one GIL, so feature extraction and transit searches
+for concurrent requests cannot use more than one core. `AnalysisPool`
+keeps warm, forked worker processes that inherit the already loaded model,
+and hands them light curves through shared memory instead of pickled copies.
+Results come back as the same dict `ExoplanetAnalyzer.predict` returns.
+"""
+
+import os
+import logging
+import threading
+import multiprocessing
+import numpy as np
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Optional
+
+import windowed
+from tracing import SpanContext, tracer
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_PROCESSES = int(os.environ.get('ANALYSIS_PROCESSES', 0))  # 0 analyzes in the request thread
+# Smaller curves are analyzed inline; dispatch overhead would dominate
+OFFLOAD_MIN_POINTS = int(os.environ.get('OFFLOAD_MIN_POINTS', 20_000))
+
+# Analyzer of a worker process, inherited from the parent at fork
+_worker_analyzer = None
+
+
+def _init_worker(analyzer):
+    global _worker_analyzer
+    _worker_analyzer = analyzer
+    # A windowed search in this worker must not fork a second, nested pool
+    windowed.run_inline()
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Open an existing block without letting this process's resource tracker own it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        from multiprocessing import resource_tracker
+        block = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(block._name, 'shared_memory')
+        return block
+
+
+def _predict_task(name: str, n_points: int, flux_dtype: str, kwargs: Dict[str, Any],
+                  trace_parent: Optional[SpanContext] = None) -> Dict[str, Any]:
+    block = _attach(name)
+    try:
+        time_data = np.ndarray((n_points,), dtype=np.float64, buffer=block.buf)
+        flux_data = np.ndarray((n_points,), dtype=flux_dtype, buffer=block.buf, offset=time_data.nbytes)
+        # Spans in the worker join the trace of the request that offloaded the curve
+        with tracer.span('offload.worker', parent=trace_parent, points=n_points):
+            result = _worker_analyzer.predict(time_data, flux_data, **kwargs)
+        del time_data, flux_data
+        return result
+    finally:
+        try:
+            block.close()
+        except BufferError:
+            # A view outlived the analysis; the mapping is released with the process
+            pass
+
+
+def _run_task(func: Callable[..., Any], args: tuple, trace_parent: Optional[SpanContext] = None) -> Any:
+    with tracer.span('offload.worker', parent=trace_parent, task=getattr(func, '__name__', 'task')):
+        return func(*args)
+
+
+class AnalysisPool:
+    """
+    Warm pool of forked processes that run `analyzer.predict`
+    """
+
+    def __init__(self, analyzer, processes: int = ANALYSIS_PROCESSES, min_points: int = OFFLOAD_MIN_POINTS):
+        self.analyzer = analyzer
+        self.processes = processes
+        self.min_points = min_points
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if processes > 0 and 'fork' not in multiprocessing.get_all_start_methods():
+            logger.warning("Process offload needs the fork start method; analyzing inline")
+            self.processes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.processes > 0
+
+    def start(self) -> Optional[ProcessPoolExecutor]:
+        """Fork the worker processes (once per parent process) and wait until they are up"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # Fork before request threads exist where possible, so workers start clean
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context('fork'),
+                    initializer=_init_worker,
+                    initargs=(self.analyzer,)
+                )
+                self._pid = os.getpid()
+                # Fork-context pools start every worker on first submit; wait for them
+                for future in [self._executor.submit(_ping) for _ in range(self.processes)]:
+                    future.result()
+                logger.info(f"Analysis pool ready with {self.processes} processes")
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def predict(self, time_data: np.ndarray, flux_data: np.ndarray, **kwargs) -> Dict[str, Any]:
+        """
+        Run `analyzer.predict` in a worker process, or inline when the pool is
+        disabled or the curve is shorter than `min_points`. A `progress`
+        callback only sees the start and end of an offloaded analysis.
+        """
+        # Inside a worker (e.g. running a submitted task) the analysis stays in that process
+        if not self.enabled or _worker_analyzer is not None or len(flux_data) < max(self.min_points, 1):
+            return self.analyzer.predict(time_data, flux_data, **kwargs)
+
+        progress = kwargs.pop('progress', None)
+        time_data = np.ascontiguousarray(time_data, dtype=np.float64)
+        flux_data = np.ascontiguousarray(flux_data)
+        block = shared_memory.SharedMemory(create=True, size=time_data.nbytes + flux_data.nbytes)
+        try:
+            np.ndarray(time_data.shape, np.float64, buffer=block.buf)[:] = time_data
+            np.ndarray(flux_data.shape, flux_data.dtype, buffer=block.buf, offset=time_data.nbytes)[:] = flux_data
+            if progress:
+                progress(0.0, 'Analyzing in worker process')
+            future = self.start().submit(_predict_task, block.name, len(time_data), flux_data.dtype.str, kwargs,
+                                         tracer.current_span().context)
+            result = future.result()
+            if progress:
+                progress(1.0, 'Classified')
+            return result
+        finally:
+            block.close()
+            block.unlink()
+
+    def submit(self, func: Callable[..., Any], *args) -> Future:
+        """
+        Run `func(*args)` in a worker process, whatever the size of its input.
+        `func` must be a module-level function; analyses it runs stay in that worker.
+        """
+        if not self.enabled:
+            raise RuntimeError('Analysis pool is disabled')
+        return self.start().submit(_run_task, func, args, tracer.current_span().context)
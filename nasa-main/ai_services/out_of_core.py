@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Out-of-core analysis of light curves larger than RAM
+Streams a memory-mapped or text light curve chunk by chunk, in four passes
+over the file, each keeping only mergeable summaries: (1) the time range
+and a quantile sketch of the flux, which give the median and MAD for one
+round of sigma clipping; (2) running moments, a sketch for the depth's 90th
+percentile and a `StreamingPeriodogram` on the frequency grid /predict
+uses; (3) phase-binned sums for the sub-harmonic check and the coarse
+transit fold; (4) the fold centred on the transit. The features and
+classification follow `ExoplanetAnalyzer.predict` with detrending off and
+no latency-budget binning. They differ only where a summary approximates:
+one clipping round against sketched quantiles instead of iterated exact
+medians, and the sketched 90th percentile. Peak memory depends on the chunk
+size and the frequency grid, not the number of points.
+
+Usage: python out_of_core.py curve.npy [--flux-path flux.npy] [--chunk-size N]
+"""
+
+import argparse
+import json
+import time
+import numpy as np
+from typing import Any, Callable, Dict, Iterable, Iterator, Tuple
+
+from folding import binned_sums, deepest_epoch, shape_bins, shape_from_fold
+from light_curve import open_light_curve_chunks, resolve_dtype
+from periodogram import (DEFAULT_PERIOD, HARMONIC_FOLD_BINS, StreamingPeriodogram, frequency_grid,
+                         select_subharmonic, subharmonic_candidates)
+from preprocessing import DEFAULT_CLIP, DEFAULT_CLIP_SIGMA, CLIP_MODES, MIN_CLEAN_POINTS, outliers
+from sketches import CurveSummary
+
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+Chunks = Iterable[Tuple[np.ndarray, np.ndarray]]
+
+
+def _means(sums: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def analyze_chunks(analyzer, open_chunks: Callable[[], Chunks], dtype: np.dtype = np.float64,
+                   clip: str = DEFAULT_CLIP, clip_sigma: float = DEFAULT_CLIP_SIGMA) -> Dict[str, Any]:
+    """
+    Classify a light curve delivered as (time, flux) chunks. `open_chunks()`
+    must return a fresh iterator over the same chunks on every call.
+    """
+    if clip not in CLIP_MODES:
+        raise ValueError(f"Unknown clipping mode '{clip}'. Choose one of: {', '.join(CLIP_MODES)}")
+    start = time.perf_counter()
+
+    # Pass 1: time range and flux distribution of the finite points
+    scan = CurveSummary()
+    n_chunks = n_points = 0
+    for time_chunk, flux_chunk in open_chunks():
+        n_chunks += 1
+        n_points += len(flux_chunk)
+        finite = np.isfinite(time_chunk) & np.isfinite(flux_chunk)
+        scan.update(time_chunk[finite], flux_chunk[finite])
+    if scan.count < MIN_CLEAN_POINTS:
+        raise ValueError('Light curve contains too few valid data points')
+    median, scale = scan.robust_scale()
+
+    def kept_chunks() -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        for time_chunk, flux_chunk in open_chunks():
+            keep = np.isfinite(time_chunk) & np.isfinite(flux_chunk)
+            if clip != 'none' and scale > 0:
+                keep &= ~outliers(flux_chunk, median, scale, clip_sigma, clip)
+            yield time_chunk[keep], flux_chunk[keep]
+
+    # Pass 2: moments, depth sketch and periodogram of the kept points
+    needs_period = 'period_estimate' in analyzer.feature_order
+    periodogram = None
+    if needs_period:
+        try:
+            f0, df, n = frequency_grid(np.array([scan.t_min, scan.t_max]))
+            periodogram = StreamingPeriodogram(f0, df, n, scan.t_min, median)
+        except ValueError:
+            pass  # too short a baseline for the period range; the default period is used
+    summary = CurveSummary(periodogram)
+    for time_chunk, flux_chunk in kept_chunks():
+        summary.update(time_chunk, flux_chunk)
+    if summary.count < MIN_CLEAN_POINTS:
+        raise ValueError('Too few valid data points remain after sigma clipping')
+
+    period = shape = None
+    passes = 2
+    if needs_period:
+        period = periodogram.peak_period(None) if periodogram is not None else None
+        t0 = summary.t_min
+
+        # Pass 3: folds for the sub-harmonic check and the coarse transit fold of each candidate
+        candidates = subharmonic_candidates(period, summary.t_max - t0) if period is not None \
+            else np.array([DEFAULT_PERIOD])
+        harmonic = np.zeros((3, len(candidates), HARMONIC_FOLD_BINS))
+        coarse = [np.zeros((2, shape_bins(p))) for p in candidates]
+        for time_chunk, flux_chunk in kept_chunks():
+            if len(candidates) > 1:
+                offset = flux_chunk - median
+                sums, counts = binned_sums(time_chunk, offset, candidates, t0, HARMONIC_FOLD_BINS)
+                squares, _ = binned_sums(time_chunk, offset * offset, candidates, t0, HARMONIC_FOLD_BINS)
+                harmonic += (sums, counts, squares)
+            for fold_sums, p in zip(coarse, candidates):
+                sums, counts = binned_sums(time_chunk, flux_chunk, [p], t0 - p / 2, len(fold_sums[0]),
+                                           centered=True)
+                fold_sums += (sums[0], counts[0])
+        chosen = 0
+        if len(candidates) > 1:
+            chosen = int(np.flatnonzero(candidates == select_subharmonic(candidates, *harmonic))[0])
+        period = float(candidates[chosen])
+        epoch = deepest_epoch(_means(*coarse[chosen]), t0, period)
+        passes = 3
+
+        # Pass 4: the fold centred on the deepest dip
+        if epoch is not None:
+            centred = np.zeros((2, shape_bins(period)))
+            for time_chunk, flux_chunk in kept_chunks():
+                sums, counts = binned_sums(time_chunk, flux_chunk, [period], epoch, len(centred[0]),
+                                           centered=True)
+                centred += (sums[0], counts[0])
+            shape = shape_from_fold(_means(*centred), epoch, period)
+            passes = 4
+
+    features, period, depth = analyzer.summary_features(summary, period)
+    result = analyzer.classify_features(features, period, depth)
+    result.update({
+        'precision': np.dtype(dtype).name,
+        'detrending': {'method': 'none'},
+        'cleaning': {
+            'method': clip,
+            'sigma': clip_sigma,
+            'iterations': 1 if clip != 'none' else 0,
+            'removed': n_points - summary.count
+        }
+    })
+    if shape is not None:
+        result.update({
+            'transit_depth': shape['depth'],
+            'transit_duration': shape['duration_hours'],
+            'transit_epoch': shape['epoch']
+        })
+    result.update({
+        'mode': 'out_of_core',
+        'chunks': n_chunks,
+        'passes': passes,
+        'total_data_points': n_points,
+        'analyzed_points': summary.count,
+        'elapsed_ms': (time.perf_counter() - start) * 1000
+    })
+    return result
+
+
+def analyze_file(analyzer, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 precision: str = None, flux_path: str = None, **analysis_options) -> Dict[str, Any]:
+    """Classify a light curve file chunk by chunk"""
+    dtype = resolve_dtype(precision)
+    result = analyze_chunks(analyzer, lambda: open_light_curve_chunks(path, chunk_size, dtype, flux_path),
+                            dtype, **analysis_options)
+    result['chunk_size'] = chunk_size
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyze a light curve larger than memory')
+    parser.add_argument('path', help='.npy (n, 2) array, .npy time array with --flux-path, or CSV/TXT file')
+    parser.add_argument('--flux-path', help='.npy flux array matching a .npy time array')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Points per chunk')
+    parser.add_argument('--precision', choices=['float32', 'float64'], help='Flux precision')
+    parser.add_argument('--clip', choices=CLIP_MODES, default=DEFAULT_CLIP, help='Sigma clipping mode')
+    parser.add_argument('--clip-sigma', type=float, default=DEFAULT_CLIP_SIGMA, help='Sigma clipping threshold')
+    parser.add_argument('--model', default='model.pkl', help='Path to the trained model')
+    args = parser.parse_args()
+
+    from app import ExoplanetAnalyzer
+
+    analyzer = ExoplanetAnalyzer()
+    analyzer.load_model(args.model)
+    result = analyze_file(analyzer, args.path, args.chunk_size, args.precision, args.flux_path,
+                          clip=args.clip, clip_sigma=args.clip_sigma)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
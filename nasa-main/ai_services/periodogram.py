@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Lomb-Scargle period estimation for irregularly sampled light curves
+The periodogram is evaluated at trial frequencies directly from the
+timestamps, so gaps and uneven cadences need no resampling. Uses astropy's
+LombScargle when it is installed, otherwise a native NumPy implementation:
+the O(N log N) Press & Rybicki extirpolation + FFT approximation, with an
+exact O(N x F) floating-mean periodogram as reference. The fast method's
+sums are linear in the data, so `StreamingPeriodogram` accumulates them
+chunk by chunk for appended or larger-than-memory curves. Box-shaped transits
+put much of their power into harmonics, so the peak period is checked
+against its multiples by the significance of the folded dip, in standard
+errors of its phase bin, before it is returned.
+"""
+
+import os
+import logging
+import numpy as np
+from math import factorial
+from typing import Tuple
+
+from folding import binned_sums
+
+logger = logging.getLogger(__name__)
+
+try:
+    from astropy.timeseries import LombScargle
+except ImportError:  # astropy is optional; the native implementation is used instead
+    LombScargle = None
+
+PERIOD_METHODS = ('auto', 'astropy', 'fast', 'exact')
+PERIOD_METHOD = os.environ.get('PERIOD_METHOD', 'auto')
+MIN_PERIOD = 0.5
+MAX_PERIOD = 50.0
+DEFAULT_PERIOD = 3.0
+SAMPLES_PER_PEAK = 5
+MAX_FREQUENCIES = int(os.environ.get('MAX_FREQUENCIES', 50_000))
+# Upper bound on (frequency x point) elements evaluated at once by the exact method
+MAX_PERIODOGRAM_ELEMENTS = 4_000_000
+EXTIRPOLATION_ORDER = 4
+FFT_OVERSAMPLING = 5
+# Multiples of the peak period tested for a transit signal the periodogram caught at a harmonic
+SUBHARMONICS = (2, 3, 4, 5)
+HARMONIC_FOLD_BINS = 200
+# Dips are compared in units of their bin's standard error. A multiple replaces
+# the peak period only if its dip is this much more significant...
+SUBHARMONIC_DEPTH_GAIN = 1.5
+# ...and significant in itself (noise alone reaches ~3 in one of 200 bins)...
+SUBHARMONIC_MIN_SIGNIFICANCE = 5.0
+# ...and the shortest multiple whose dip is within this fraction of the most significant is taken
+SUBHARMONIC_DEPTH_MATCH = 0.8
+
+
+def frequency_grid(time_data: np.ndarray, min_period: float = MIN_PERIOD,
+                   max_period: float = MAX_PERIOD) -> Tuple[float, float, int]:
+    """
+    Regular frequency grid (f0, df, n) from 1 / max_period to 1 / min_period,
+    SAMPLES_PER_PEAK samples across each peak, at most MAX_FREQUENCIES.
+    """
+    baseline = float(np.max(time_data) - np.min(time_data))
+    if not baseline > 0:
+        raise ValueError('Light curve must span a positive time range')
+    max_period = min(max_period, baseline)
+    if max_period <= min_period:
+        raise ValueError('Light curve is too short for the period range')
+    f0, f1 = 1.0 / max_period, 1.0 / min_period
+    df = 1.0 / (SAMPLES_PER_PEAK * baseline)
+    n = int(np.ceil((f1 - f0) / df)) + 1
+    if n > MAX_FREQUENCIES:
+        n = MAX_FREQUENCIES
+        df = (f1 - f0) / (n - 1)
+    return f0, df, n
+
+
+def _exact_power(t: np.ndarray, y: np.ndarray, frequency: np.ndarray) -> np.ndarray:
+    """Floating-mean (generalised) periodogram, evaluated term by term"""
+    w = 1.0 / len(t)
+    yy = w * np.dot(y, y)
+    power = np.empty(len(frequency))
+    batch = max(1, MAX_PERIODOGRAM_ELEMENTS // len(t))
+    for start in range(0, len(frequency), batch):
+        omega_t = 2 * np.pi * frequency[start:start + batch, None] * t[None, :]
+        cos, sin = np.cos(omega_t), np.sin(omega_t)
+        c, s = w * cos.sum(axis=1), w * sin.sum(axis=1)
+        yc, ys = w * cos @ y, w * sin @ y
+        cc = w * np.einsum('ij,ij->i', cos, cos) - c * c
+        ss = w * np.einsum('ij,ij->i', sin, sin) - s * s
+        cs = w * np.einsum('ij,ij->i', cos, sin) - c * s
+        d = cc * ss - cs * cs
+        power[start:start + batch] = (ss * yc * yc + cc * ys * ys - 2 * cs * yc * ys) / (yy * d)
+    return power
+
+
+def _extirpolate(x: np.ndarray, y: np.ndarray, n: int, order: int = EXTIRPOLATION_ORDER) -> np.ndarray:
+    """Spread values at fractional positions `x` onto an integer grid of length `n` (Press & Rybicki)"""
+    result = np.zeros(n, dtype=y.dtype)
+    exact = np.mod(x, 1) == 0
+    np.add.at(result, x[exact].astype(np.int64), y[exact])
+    x, y = x[~exact], y[~exact]
+
+    lo = np.clip((x - order // 2).astype(np.int64), 0, n - order)
+    numerator = y * np.prod(x - lo - np.arange(order)[:, None], axis=0)
+    denominator = float(factorial(order - 1))
+    for j in range(order):
+        if j > 0:
+            denominator *= j / (j - order)
+        index = lo + (order - 1 - j)
+        np.add.at(result, index, numerator / (denominator * (x - index)))
+    return result
+
+
+def fft_size(n: int) -> int:
+    """Length of the FFT grid the fast method extirpolates `n` frequencies onto"""
+    return 1 << int(np.ceil(np.log2(n * FFT_OVERSAMPLING)))
+
+
+def _extirpolated_grid(t: np.ndarray, h: np.ndarray, f0: float, df: float, n_fft: int,
+                       t0: float) -> np.ndarray:
+    """FFT grid of `h` phased to f0 at reference time `t0`; linear in `h`, so grids of chunks add up"""
+    h = h * np.exp(2j * np.pi * f0 * (t - t0))
+    return _extirpolate(np.mod((t - t0) * n_fft * df, n_fft), h, n_fft)
+
+
+def _grid_sums(grid: np.ndarray, f0: float, df: float, n: int, t0: float) -> Tuple[np.ndarray, np.ndarray]:
+    """sum(h sin(2 pi f t)) and sum(h cos(2 pi f t)) at f = f0 + df k from an extirpolated grid"""
+    sums = np.fft.ifft(grid)[:n] * len(grid)
+    sums *= np.exp(2j * np.pi * t0 * (f0 + df * np.arange(n)))
+    return sums.imag, sums.real
+
+
+def _trig_sums(t: np.ndarray, h: np.ndarray, f0: float, df: float, n: int,
+               factor: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """sum(h sin(2 pi f t)) and sum(h cos(2 pi f t)) at f = factor * (f0 + df k), via one FFT"""
+    f0, df = f0 * factor, df * factor
+    t0 = float(t.min())
+    grid = _extirpolated_grid(t, h, f0, df, fft_size(n), t0)
+    return _grid_sums(grid, f0, df, n, t0)
+
+
+def _floating_mean_power(sh: np.ndarray, ch: np.ndarray, s: np.ndarray, c: np.ndarray,
+                         s2: np.ndarray, c2: np.ndarray, yy: float) -> np.ndarray:
+    """Floating-mean periodogram from weighted trigonometric sums of the centred flux (sh, ch) and of one"""
+    # Rotate by the phase offset tau that decouples the sine and cosine terms
+    tan_2wt = (s2 - 2 * s * c) / (c2 - (c * c - s * s))
+    c2w = 1 / np.sqrt(1 + tan_2wt * tan_2wt)
+    s2w = tan_2wt * c2w
+    cw = np.sqrt(0.5 * (1 + c2w))
+    sw = np.sign(s2w) * np.sqrt(0.5 * (1 - c2w))
+
+    yc = ch * cw + sh * sw
+    ys = sh * cw - ch * sw
+    cc = 0.5 * (1 + c2 * c2w + s2 * s2w) - (c * cw + s * sw) ** 2
+    ss = 0.5 * (1 - c2 * c2w - s2 * s2w) - (s * cw - c * sw) ** 2
+    return (yc * yc / cc + ys * ys / ss) / yy
+
+
+def _fast_power(t: np.ndarray, y: np.ndarray, f0: float, df: float, n: int) -> np.ndarray:
+    """Floating-mean periodogram from extirpolated trigonometric sums, O(N log N)"""
+    w = np.full(len(t), 1.0 / len(t))
+    sh, ch = _trig_sums(t, w * y, f0, df, n)
+    s, c = _trig_sums(t, w, f0, df, n)
+    s2, c2 = _trig_sums(t, w, f0, df, n, factor=2)
+    return _floating_mean_power(sh, ch, s, c, s2, c2, np.dot(w, y * y))
+
+
+class StreamingPeriodogram:
+    """
+    Fast-method Lomb-Scargle on a fixed frequency grid, accumulated chunk by chunk.
+    The extirpolated grids behind `_fast_power` are linear in the data, so
+    each chunk adds O(points) work, memory is O(frequencies) and the FFTs
+    run once per `power` call. Flux is accumulated relative to `offset` and
+    centred on its running mean at the end, which gives the same power as
+    `lomb_scargle(..., method='fast')` on the concatenated curve.
+    """
+
+    def __init__(self, f0: float, df: float, n: int, t0: float, offset: float = 0.0):
+        self.f0, self.df, self.n = f0, df, n
+        self.t0 = float(t0)
+        self.offset = float(offset)
+        self.count = 0
+        self.sum_y = 0.0
+        self.sum_yy = 0.0
+        self.t_min = np.inf
+        self.t_max = -np.inf
+        # Grids of the flux at f, and of one at f and 2f
+        self._grids = np.zeros((3, fft_size(n)), dtype=np.complex128)
+
+    @property
+    def frequency(self) -> np.ndarray:
+        return self.f0 + self.df * np.arange(self.n)
+
+    def update(self, time_data: np.ndarray, flux_data: np.ndarray) -> 'StreamingPeriodogram':
+        """Fold a chunk of points into the sums"""
+        t = np.asarray(time_data, dtype=np.float64).ravel()
+        if len(t) == 0:
+            return self
+        y = np.asarray(flux_data, dtype=np.float64).ravel() - self.offset
+        ones = np.ones(len(t))
+        n_fft = self._grids.shape[1]
+        self._grids[0] += _extirpolated_grid(t, y, self.f0, self.df, n_fft, self.t0)
+        self._grids[1] += _extirpolated_grid(t, ones, self.f0, self.df, n_fft, self.t0)
+        self._grids[2] += _extirpolated_grid(t, ones, 2 * self.f0, 2 * self.df, n_fft, self.t0)
+        self.count += len(t)
+        self.sum_y += float(y.sum())
+        self.sum_yy += float(np.dot(y, y))
+        self.t_min = min(self.t_min, float(t.min()))
+        self.t_max = max(self.t_max, float(t.max()))
+        return self
+
+    def merge(self, other: 'StreamingPeriodogram') -> 'StreamingPeriodogram':
+        """Combine sums accumulated on the same grid, reference time and offset"""
+        if (self.f0, self.df, self.n, self.t0, self.offset) != (other.f0, other.df, other.n, other.t0, other.offset):
+            raise ValueError('Periodograms on different grids cannot be merged')
+        self._grids += other._grids
+        self.count += other.count
+        self.sum_y += other.sum_y
+        self.sum_yy += other.sum_yy
+        self.t_min = min(self.t_min, other.t_min)
+        self.t_max = max(self.t_max, other.t_max)
+        return self
+
+    def power(self) -> np.ndarray:
+        """Lomb-Scargle power (standard normalisation, 0-1) at every grid frequency"""
+        w = 1.0 / self.count
+        mean = self.sum_y * w
+        sh, ch = _grid_sums(self._grids[0] * w, self.f0, self.df, self.n, self.t0)
+        s, c = _grid_sums(self._grids[1] * w, self.f0, self.df, self.n, self.t0)
+        s2, c2 = _grid_sums(self._grids[2] * w, 2 * self.f0, 2 * self.df, self.n, self.t0)
+        yy = self.sum_yy * w - mean * mean
+        return _floating_mean_power(sh - mean * s, ch - mean * c, s, c, s2, c2, yy)
+
+    def peak_period(self, default: float = DEFAULT_PERIOD) -> float:
+        """
+        Period of the strongest peak among the frequencies the points so far
+        resolve (periods up to their baseline), or `default` if there is none
+        """
+        if self.count < 3 or not self.sum_yy * self.count - self.sum_y ** 2 > 0:
+            return default
+        frequency = self.frequency
+        with np.errstate(divide='ignore', invalid='ignore'):
+            power = self.power()
+        usable = np.isfinite(power) & (frequency * (self.t_max - self.t_min) >= 1 - 1e-9)
+        if not np.any(usable):
+            return default
+        return float(1.0 / frequency[usable][np.argmax(power[usable])])
+
+
+def resolve_method(method: str) -> str:
+    """
+    Concrete periodogram method for `method`. 'auto' prefers astropy and
+    otherwise the fast native method; 'exact' is kept as a reference.
+    """
+    if method not in PERIOD_METHODS:
+        raise ValueError(f"Unknown period method '{method}'. Choose from: {', '.join(PERIOD_METHODS)}")
+    if method == 'astropy' and LombScargle is None:
+        logger.warning("astropy is not installed; using the native periodogram")
+        method = 'auto'
+    if method == 'auto':
+        if LombScargle is not None:
+            return 'astropy'
+        return 'fast'
+    return method
+
+
+def lomb_scargle(time_data: np.ndarray, flux_data: np.ndarray, min_period: float = MIN_PERIOD,
+                 max_period: float = MAX_PERIOD, method: str = PERIOD_METHOD) -> Tuple[np.ndarray, np.ndarray]:
+    """Lomb-Scargle power (standard normalisation, 0-1) on the `frequency_grid`; returns (frequency, power)"""
+    t = np.asarray(time_data, dtype=np.float64)
+    y = np.asarray(flux_data, dtype=np.float64)
+    y = y - y.mean()
+    f0, df, n = frequency_grid(t, min_period, max_period)
+    frequency = f0 + df * np.arange(n)
+
+    method = resolve_method(method)
+    if method == 'astropy':
+        power = LombScargle(t, y).power(frequency, method='fast', assume_regular_frequency=True)
+    elif method == 'fast':
+        power = _fast_power(t, y, f0, df, n)
+    else:
+        power = _exact_power(t, y, frequency)
+    return frequency, np.asarray(power)
+
+
+def dip_significance(sums: np.ndarray, counts: np.ndarray, squares: np.ndarray) -> np.ndarray:
+    """
+    Deepest dip below the median phase bin, in standard errors of that bin,
+    for each row of phase-binned flux sums, counts and sums of squares (of
+    the flux less any constant). The scatter is pooled within bins, so the
+    dip itself does not inflate it, and bins with few points need a deeper
+    mean to count as much.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = np.where(counts > 0, sums / counts, np.nan)
+        filled = (counts > 0).sum(axis=1)
+        within = squares.sum(axis=1) - np.where(counts > 0, sums * sums / counts, 0.0).sum(axis=1)
+        sigma = np.sqrt(np.maximum(within, 0.0) / (counts.sum(axis=1) - filled))
+        z = (np.nanmedian(means, axis=1)[:, None] - means) * np.sqrt(counts) / sigma[:, None]
+    z = np.where(np.isfinite(z), z, -np.inf).max(axis=1)
+    return np.where(np.isfinite(z), z, 0.0)
+
+
+def subharmonic_candidates(period: float, baseline: float, max_period: float = MAX_PERIOD) -> np.ndarray:
+    """`period` and its multiples (x2 to x5) that fit at least twice into the baseline"""
+    limit = min(max_period, baseline / 2)
+    return np.array([period] + [period * k for k in SUBHARMONICS if period * k <= limit])
+
+
+def select_subharmonic(candidates: np.ndarray, sums: np.ndarray, counts: np.ndarray,
+                       squares: np.ndarray) -> float:
+    """
+    The first candidate, or the shortest multiple whose folded dip (from
+    HARMONIC_FOLD_BINS-bin statistics per candidate, see `dip_significance`)
+    is clearly and significantly deeper
+    """
+    significance = dip_significance(sums, counts, squares)
+    best = float(significance.max())
+    if best < SUBHARMONIC_MIN_SIGNIFICANCE or not best >= SUBHARMONIC_DEPTH_GAIN * significance[0]:
+        return float(candidates[0])
+    return float(candidates[np.argmax(significance >= SUBHARMONIC_DEPTH_MATCH * best)])
+
+
+def check_subharmonics(time_data: np.ndarray, flux_data: np.ndarray, period: float,
+                       max_period: float = MAX_PERIOD) -> float:
+    """
+    `period` or the multiple of it (x2 to x5) that folds into a clearly
+    deeper dip. A transit at the true period P shows up at P/k in the
+    periodogram; folded on P/k its dip is diluted k times, folded on P it is
+    not. Multiples must fit at least twice into the baseline.
+    """
+    t = np.asarray(time_data, dtype=np.float64)
+    candidates = subharmonic_candidates(period, float(np.max(t) - np.min(t)), max_period)
+    if len(candidates) == 1:
+        return period
+    f = np.asarray(flux_data, dtype=np.float64)
+    f = f - np.mean(f)
+    sums, counts = binned_sums(t, f, candidates, float(t.min()), HARMONIC_FOLD_BINS)
+    squares, _ = binned_sums(t, f * f, candidates, float(t.min()), HARMONIC_FOLD_BINS)
+    return select_subharmonic(candidates, sums, counts, squares)
+
+
+def estimate_period(time_data: np.ndarray, flux_data: np.ndarray, min_period: float = MIN_PERIOD,
+                    max_period: float = MAX_PERIOD, method: str = PERIOD_METHOD,
+                    default: float = DEFAULT_PERIOD) -> float:
+    """
+    Period in days of the strongest Lomb-Scargle peak, corrected to a
+    multiple of it when that folds into a clearly deeper transit (see
+    `check_subharmonics`), or `default` if there is no peak
+    """
+    if method not in PERIOD_METHODS:
+        raise ValueError(f"Unknown period method '{method}'. Choose from: {', '.join(PERIOD_METHODS)}")
+    if len(time_data) < 3 or not np.ptp(flux_data) > 0:
+        return default
+    try:
+        frequency, power = lomb_scargle(time_data, flux_data, min_period, max_period, method)
+    except ValueError:
+        return default
+    finite = np.isfinite(power)
+    if not np.any(finite):
+        return default
+    period = float(1.0 / frequency[finite][np.argmax(power[finite])])
+    return check_subharmonics(time_data, flux_data, period, max_period)
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Light curve preprocessing stages applied before feature extraction
+Cleaning drops points flagged by the instrument's quality column and
+iteratively sigma-clips outliers such as cosmic rays against the median
+and MAD of the remaining points. Input reduction bins curves that would
+exceed the analysis latency budget down to a coarser cadence. Detrending
+removes stellar variability and instrumental drift with sliding window
+filters evaluated on strided views, processed in bounded-size chunks so
+multi-million point curves never materialise the full window matrix.
+"""
+
+import os
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Any, Callable, Dict, Mapping, Tuple
+
+DETREND_METHODS = ('none', 'median', 'savgol', 'biweight')
+DEFAULT_DETREND_WINDOW = 1.0  # days
+# Default window for curves timed by cadence index, as a fraction of their baseline
+INDEX_WINDOW_FRACTION = 0.05
+MIN_WINDOW_POINTS = 3
+
+# Upper bound on window elements held in memory at once
+MAX_WINDOW_ELEMENTS = int(os.environ.get('MAX_WINDOW_ELEMENTS', 4_000_000))
+
+# Sliding trends are evaluated every window/TREND_STEP_DIVISOR cadences and interpolated
+TREND_STEP_DIVISOR = 10
+
+CLIP_MODES = ('none', 'upper', 'both')
+# 'upper' only clips brightening outliers, so transit dips can never be removed
+DEFAULT_CLIP = os.environ.get('SIGMA_CLIP', 'upper')
+DEFAULT_CLIP_SIGMA = 5.0
+MAX_CLIP_ITERATIONS = 5
+# Kepler/TESS quality flag bits that make a cadence unusable ("hard" flags): attitude tweak (1),
+# safe mode (2), coarse point (4), earth point (8), desaturation (32), aperture cosmic ray (64),
+# manual exclude (128), impulsive outlier (512), collateral cosmic ray (1024) and stray light (2048).
+# Informational bits such as discontinuities or the planet-search exclusion are kept.
+HARD_QUALITY_BITMASK = 1 | 2 | 4 | 8 | 32 | 64 | 128 | 512 | 1024 | 2048
+QUALITY_BITMASK = int(os.environ.get('QUALITY_BITMASK', HARD_QUALITY_BITMASK))
+MIN_CLEAN_POINTS = 3
+
+# Analysis time allowed per request before the input is binned to fewer points
+ANALYSIS_BUDGET_MS = float(os.environ.get('ANALYSIS_BUDGET_MS', 5000))
+# Binning never goes coarser than this, so transits stay resolved even if the budget is exceeded
+MAX_BIN_MINUTES = float(os.environ.get('MAX_BIN_MINUTES', 30))
+MIN_REDUCED_POINTS = 1000
+
+# Approximate cost of each analysis stage in microseconds per point (see `benchmarks.py reduction`)
+STAGE_COST_US = {
+    'base': 2.0,
+    'median': 0.6,
+    'biweight': 3.0,
+    'savgol': 7.0,
+    'multi_planet': 150.0,
+    'windowed': 1.0
+}
+
+
+def outliers(flux_data: np.ndarray, median: float, scale: float, sigma: float = DEFAULT_CLIP_SIGMA,
+             mode: str = DEFAULT_CLIP) -> np.ndarray:
+    """Points more than `sigma` x `scale` above `median` (mode 'upper') or away from it ('both')"""
+    residual = (flux_data - median) / scale
+    return residual > sigma if mode == 'upper' else np.abs(residual) > sigma
+
+
+def sigma_clip(flux_data: np.ndarray, sigma: float = DEFAULT_CLIP_SIGMA, mode: str = DEFAULT_CLIP,
+               keep: np.ndarray = None, max_iterations: int = MAX_CLIP_ITERATIONS) -> Tuple[np.ndarray, int]:
+    """
+    Iterative median/MAD sigma clipping. Each iteration is O(n): a
+    selection-based median of the kept points and one vectorized comparison.
+    Stops when nothing new is clipped. Returns the keep mask and iterations run.
+    """
+    keep = np.isfinite(flux_data) if keep is None else keep & np.isfinite(flux_data)
+    if mode == 'none':
+        return keep, 0
+    iterations = 0
+    kept = int(keep.sum())
+    while iterations < max_iterations and kept >= MIN_CLEAN_POINTS:
+        iterations += 1
+        values = flux_data[keep]
+        median = np.median(values)
+        mad = 1.4826 * float(np.median(np.abs(values - median)))
+        if mad == 0:
+            break
+        keep &= ~outliers(flux_data, median, mad, sigma, mode)
+        remaining = int(keep.sum())
+        if remaining == kept:
+            break
+        kept = remaining
+    return keep, iterations
+
+
+def clean_light_curve(time_data: np.ndarray, flux_data: np.ndarray, quality: np.ndarray = None,
+                      clip: str = DEFAULT_CLIP, sigma: float = DEFAULT_CLIP_SIGMA,
+                      quality_bitmask: int = QUALITY_BITMASK) -> Tuple[np.ndarray, np.ndarray, Dict[str, Any]]:
+    """
+    Drop quality-flagged, non-finite and sigma-clipped points.
+    Returns the cleaned arrays and a report of what was removed.
+    """
+    if clip not in CLIP_MODES:
+        raise ValueError(f"Unknown clipping mode '{clip}'. Choose one of: {', '.join(CLIP_MODES)}")
+    n_points = len(flux_data)
+    keep = np.isfinite(flux_data) & np.isfinite(time_data)
+    flagged = 0
+    if quality is not None:
+        good = (np.asarray(quality, dtype=np.int64) & quality_bitmask) == 0
+        flagged = int(np.count_nonzero(keep & ~good))
+        keep &= good
+    if np.count_nonzero(keep) < MIN_CLEAN_POINTS:
+        raise ValueError('Too few valid data points remain after removing flagged cadences')
+
+    valid = int(np.count_nonzero(keep))
+    keep, iterations = sigma_clip(flux_data, sigma, clip, keep)
+    report = {
+        'method': clip,
+        'sigma': sigma,
+        'iterations': iterations,
+        'quality_flagged': flagged,
+        'non_finite': n_points - valid - flagged,
+        'clipped': valid - int(np.count_nonzero(keep)),
+        'removed': n_points - int(np.count_nonzero(keep))
+    }
+    if report['removed'] == 0:
+        return time_data, flux_data, report
+    return time_data[keep], flux_data[keep], report
+
+
+def parse_clip_options(params: Mapping[str, Any]) -> Dict[str, Any]:
+    """Read and validate cleaning options from request JSON or form data"""
+    clip = str(params.get('clip', DEFAULT_CLIP)).lower()
+    if clip not in CLIP_MODES:
+        raise ValueError(f"Unknown clipping mode '{clip}'. Choose one of: {', '.join(CLIP_MODES)}")
+    try:
+        sigma = float(params.get('clip_sigma', DEFAULT_CLIP_SIGMA))
+    except (TypeError, ValueError):
+        raise ValueError('clip_sigma must be a number')
+    if not sigma > 0:
+        raise ValueError('clip_sigma must be positive')
+    return {'clip': clip, 'clip_sigma': sigma}
+
+
+def estimate_cost_ms(n_points: int, stages) -> float:
+    """Expected analysis time for `n_points` through the base stage plus `stages`"""
+    return n_points * sum(STAGE_COST_US.get(stage, 0.0) for stage in ('base', *stages)) / 1000.0
+
+
+def bin_light_curve(time_data: np.ndarray, flux_data: np.ndarray, cadence: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Block-average a light curve onto bins of width `cadence`. Times and
+    fluxes are averaged per bin; empty bins (data gaps) are dropped.
+    """
+    t = np.asarray(time_data, dtype=np.float64)
+    index = np.floor((t - t.min()) / cadence).astype(np.int64)
+    counts = np.bincount(index)
+    filled = counts > 0
+    counts = counts[filled]
+    binned_time = np.bincount(index, weights=t)[filled] / counts
+    binned_flux = np.bincount(index, weights=flux_data)[filled] / counts
+    return binned_time, binned_flux.astype(flux_data.dtype, copy=False)
+
+
+class CurveAccumulator:
+    """
+    A light curve delivered in pieces, block-averaged onto bins of width
+    `cadence` anchored at the first timestamp. Pieces may arrive in any time
+    order; memory depends on the number of bins, not on the points appended.
+    """
+
+    def __init__(self, cadence: float, dtype: np.dtype = np.float64):
+        if not cadence > 0:
+            raise ValueError('cadence must be positive')
+        self.cadence = cadence
+        self.dtype = np.dtype(dtype)
+        self.count = 0
+        self._origin = None
+        self._bins = np.empty(0, dtype=np.int64)
+        self._time_sums = np.empty(0)
+        self._flux_sums = np.empty(0)
+        self._counts = np.empty(0)
+
+    def __len__(self) -> int:
+        return len(self._bins)
+
+    def append(self, time_data: np.ndarray, flux_data: np.ndarray):
+        """Fold new points into their bins; non-finite points are dropped"""
+        t = np.asarray(time_data, dtype=np.float64)
+        f = np.asarray(flux_data, dtype=np.float64)
+        finite = np.isfinite(t) & np.isfinite(f)
+        t, f = t[finite], f[finite]
+        self.count += len(t)
+        if not len(t):
+            return
+        if self._origin is None:
+            self._origin = float(t.min())
+        index = np.floor((t - self._origin) / self.cadence).astype(np.int64)
+        self._bins, inverse = np.unique(np.concatenate([self._bins, index]), return_inverse=True)
+        inverse = inverse.ravel()
+        old, new = inverse[:len(self._counts)], inverse[len(self._counts):]
+        size = len(self._bins)
+        self._time_sums = np.bincount(old, self._time_sums, size) + np.bincount(new, t, size)
+        self._flux_sums = np.bincount(old, self._flux_sums, size) + np.bincount(new, f, size)
+        self._counts = np.bincount(old, self._counts, size) + np.bincount(new, minlength=size)
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Time-ordered bin averages (time in float64, flux in the accumulator's dtype)"""
+        return (self._time_sums / self._counts,
+                (self._flux_sums / self._counts).astype(self.dtype, copy=False))
+
+
+def reduce_to_budget(time_data: np.ndarray, flux_data: np.ndarray, stages=(), budget_ms: float = None,
+                     index_time: bool = False) -> Tuple[np.ndarray, np.ndarray, Dict[str, Any]]:
+    """
+    Bin the curve to a cadence whose point count fits the latency budget of
+    the requested stages. Curves already within budget are returned as is.
+    With `index_time` the timestamps are cadence indices rather than days,
+    so the MAX_BIN_MINUTES cap cannot apply and whole cadences are merged.
+    Returns the (possibly binned) arrays and a report of the reduction.
+    """
+    budget_ms = ANALYSIS_BUDGET_MS if budget_ms is None else budget_ms
+    n_points = len(flux_data)
+    per_point_ms = estimate_cost_ms(1, stages)
+    target = max(MIN_REDUCED_POINTS, int(budget_ms / per_point_ms))
+    report = {'applied': False, 'budget_ms': budget_ms, 'original_points': n_points}
+    if n_points <= target or budget_ms <= 0:
+        report.update({'points': n_points, 'estimated_ms': estimate_cost_ms(n_points, stages)})
+        return time_data, flux_data, report
+
+    if index_time:
+        cadence = float(int(np.ceil(n_points / target)))
+    else:
+        baseline = float(np.max(time_data) - np.min(time_data))
+        cadence = min(baseline / target, MAX_BIN_MINUTES / (24 * 60))
+    if not cadence > 0:
+        report.update({'points': n_points, 'estimated_ms': estimate_cost_ms(n_points, stages)})
+        return time_data, flux_data, report
+
+    binned_time, binned_flux = bin_light_curve(time_data, flux_data, cadence)
+    report.update({
+        'applied': len(binned_flux) < n_points,
+        'points': len(binned_flux),
+        'factor': n_points / len(binned_flux),
+        'estimated_ms': estimate_cost_ms(len(binned_flux), stages)
+    })
+    if index_time:
+        report['cadences_per_bin'] = int(cadence)
+    else:
+        report['cadence_minutes'] = cadence * 24 * 60
+    return binned_time, binned_flux, report
+
+
+def parse_reduction_options(params: Mapping[str, Any]) -> Dict[str, Any]:
+    """Read and validate the per-request latency budget; clients may only lower the server budget"""
+    budget = params.get('latency_budget_ms')
+    if budget is None or budget == '':
+        return {'latency_budget_ms': None}
+    try:
+        budget = float(budget)
+    except (TypeError, ValueError):
+        raise ValueError('latency_budget_ms must be a number')
+    if not budget > 0:
+        raise ValueError('latency_budget_ms must be positive')
+    return {'latency_budget_ms': min(budget, ANALYSIS_BUDGET_MS)}
+
+
+def window_points(time_data: np.ndarray, window: float) -> int:
+    """
+    Convert a window length in time units to an odd number of cadences, at
+    least MIN_WINDOW_POINTS. `time_data` must be sorted.
+    """
+    n = len(time_data)
+    points = MIN_WINDOW_POINTS
+    if n >= 2:
+        cadence = float(np.median(np.diff(time_data)))
+        if not cadence > 0:
+            # Mostly repeated timestamps: fall back to the mean cadence
+            cadence = float(time_data[-1] - time_data[0]) / (n - 1)
+        if cadence > 0:
+            points = int(round(window / cadence))
+    points = max(MIN_WINDOW_POINTS, min(points, n))
+    return points if points % 2 == 1 else points - 1
+
+
+def _chunked_window_apply(data: np.ndarray, points: int,
+                          func: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+    """
+    Apply a row-wise reduction to centred windows of `data`.
+    Edges are reflected. Windows are strided views evaluated every
+    `points // TREND_STEP_DIVISOR` cadences and linearly interpolated in
+    between, and only `MAX_WINDOW_ELEMENTS` values are reduced at a time.
+    """
+    n = len(data)
+    half = points // 2
+    padded = np.pad(data, half, mode='reflect') if n > half else np.pad(data, half, mode='edge')
+    step = max(1, points // TREND_STEP_DIVISOR)
+    centers = np.arange(0, n, step)
+    if centers[-1] != n - 1:
+        centers = np.append(centers, n - 1)
+    windows = sliding_window_view(padded, points)
+    rows = max(1, MAX_WINDOW_ELEMENTS // points)
+
+    values = np.empty(len(centers), dtype=np.float64)
+    for start in range(0, len(centers), rows):
+        values[start:start + rows] = func(windows[centers[start:start + rows]])
+
+    if step == 1:
+        return values.astype(data.dtype, copy=False)
+    return np.interp(np.arange(n), centers, values).astype(data.dtype, copy=False)
+
+
+def _biweight_location(windows: np.ndarray, c: float = 5.0, iterations: int = 3) -> np.ndarray:
+    """Tukey biweight location of each row, starting from the median"""
+    location = np.median(windows, axis=1, keepdims=True)
+    for _ in range(iterations):
+        deviation = windows - location
+        mad = np.median(np.abs(deviation), axis=1, keepdims=True)
+        u = np.divide(deviation, c * mad, out=np.zeros_like(deviation), where=mad > 0)
+        weights = np.where(np.abs(u) < 1, (1 - u ** 2) ** 2, 0)
+        location = np.sum(weights * windows, axis=1, keepdims=True) / np.sum(weights, axis=1, keepdims=True)
+    return location[:, 0]
+
+
+def median_trend(flux_data: np.ndarray, points: int) -> np.ndarray:
+    """Sliding-window median trend"""
+    return _chunked_window_apply(flux_data, points, lambda w: np.median(w, axis=1))
+
+
+def biweight_trend(flux_data: np.ndarray, points: int) -> np.ndarray:
+    """Sliding-window Tukey biweight trend, robust to transits inside the window"""
+    return _chunked_window_apply(flux_data, points, _biweight_location)
+
+
+def savgol_trend(flux_data: np.ndarray, points: int, polyorder: int = 2) -> np.ndarray:
+    """Savitzky-Golay trend; a single convolution, so memory is O(n)"""
+    from scipy.signal import savgol_filter
+
+    if points <= polyorder:
+        return flux_data.copy()
+    return savgol_filter(flux_data, points, polyorder, mode='interp').astype(flux_data.dtype, copy=False)
+
+
+DETRENDERS: Dict[str, Callable[[np.ndarray, int], np.ndarray]] = {
+    'median': median_trend,
+    'savgol': savgol_trend,
+    'biweight': biweight_trend
+}
+
+
+def detrend(time_data: np.ndarray, flux_data: np.ndarray, method: str = 'median',
+            window: float = None, index_time: bool = False) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    Divide the flux by a sliding-window trend so the baseline sits at 1.0.
+    `window` is in the same units as `time_data` and should be several
+    times longer than the expected transit duration. It defaults to
+    DEFAULT_DETREND_WINDOW days, or, when `index_time` marks timestamps that
+    are cadence indices, to INDEX_WINDOW_FRACTION of the baseline. Windows
+    run over the curve in time order; the result keeps the order of the input.
+    """
+    if method == 'none':
+        return flux_data, {'method': 'none'}
+    if method not in DETRENDERS:
+        raise ValueError(f"Unknown detrending method '{method}'. Choose one of: {', '.join(DETREND_METHODS)}")
+
+    order = None
+    if np.any(np.diff(time_data) < 0):
+        order = np.argsort(time_data, kind='stable')
+        time_data, flux_data = time_data[order], flux_data[order]
+    if window is None:
+        window = INDEX_WINDOW_FRACTION * float(time_data[-1] - time_data[0]) if index_time \
+            else DEFAULT_DETREND_WINDOW
+    points = window_points(time_data, window)
+    trend = DETRENDERS[method](flux_data, points)
+    detrended = np.divide(flux_data, trend, out=np.ones_like(flux_data), where=trend != 0)
+    if order is not None:
+        unsorted = np.empty_like(detrended)
+        unsorted[order] = detrended
+        detrended = unsorted
+    return detrended, {'method': method, 'window': float(window), 'window_points': points}
+
+
+def parse_detrend_options(params: Mapping[str, Any]) -> Dict[str, Any]:
+    """Read and validate detrending options from request JSON or form data"""
+    method = str(params.get('detrend', 'none')).lower()
+    if method not in DETREND_METHODS:
+        raise ValueError(f"Unknown detrending method '{method}'. Choose one of: {', '.join(DETREND_METHODS)}")
+    # Unset, the window depends on the curve's time axis (see `detrend`)
+    window = params.get('detrend_window')
+    if window is not None:
+        try:
+            window = float(window)
+        except (TypeError, ValueError):
+            raise ValueError('detrend_window must be a number')
+        if not window > 0:
+            raise ValueError('detrend_window must be positive')
+    return {'method': method, 'window': window}
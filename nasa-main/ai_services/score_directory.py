@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Offline scoring of a directory tree of light curve files
+Walks a directory for CSV, TXT and FITS light curves, parses each with the
+same rules as the file upload endpoint and classifies them on a pool of
+forked worker processes that share the loaded model. Results are appended
+to a JSON Lines file as each file finishes; that file is also the checkpoint,
+so rerunning the same command after an interruption skips every file that
+already has a record (unless the file changed since).
+
+Usage: python score_directory.py curves/ scores.jsonl [--workers N] [--detrend median]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, Iterator, List, Tuple
+
+from archive import LIGHT_CURVE_EXTENSIONS
+from light_curve import parse_light_curve_file, resolve_dtype
+from preprocessing import DETREND_METHODS, DEFAULT_DETREND_WINDOW, CLIP_MODES, DEFAULT_CLIP, DEFAULT_CLIP_SIGMA
+from serialization import numpy_default
+import windowed
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+MIN_FILE_POINTS = 10
+PROGRESS_INTERVAL = 1.0  # seconds between progress line updates
+
+# Analyzer and predict options of a worker process, inherited from the parent at fork
+_worker_analyzer = None
+_worker_options: Dict[str, Any] = {}
+
+
+def _init_worker(analyzer, options: Dict[str, Any]):
+    global _worker_analyzer, _worker_options
+    _worker_analyzer, _worker_options = analyzer, options
+    # Windowed searches run inline here rather than in a pool nested in this one
+    windowed.run_inline()
+
+
+def _score_file(path: str) -> Dict[str, Any]:
+    """Parse and classify one file in a worker process"""
+    with open(path, 'rb') as handle:
+        content = handle.read()
+    dtype = resolve_dtype(_worker_options.get('precision'))
+    time_data, flux_data, quality = parse_light_curve_file(content, os.path.basename(path), dtype)
+    if len(time_data) < MIN_FILE_POINTS:
+        raise ValueError(f'File must contain at least {MIN_FILE_POINTS} data points')
+    result = _worker_analyzer.predict(time_data, flux_data, quality=quality, **_worker_options)
+    result['total_data_points'] = len(flux_data)
+    return result
+
+
+def find_light_curves(root: str) -> Iterator[str]:
+    """Light curve files below `root`, as sorted paths relative to it"""
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories[:] = sorted(d for d in subdirectories if not d.startswith('.'))
+        for name in sorted(files):
+            if not name.startswith('.') and name.lower().endswith(LIGHT_CURVE_EXTENSIONS):
+                yield os.path.relpath(os.path.join(directory, name), root)
+
+
+def load_checkpoint(output_path: str, retry_failed: bool = False) -> Dict[str, Tuple[int, float]]:
+    """
+    (size, mtime) of every file already recorded in the output. A record
+    left half-written by an interrupted run is truncated away.
+    """
+    done: Dict[str, Tuple[int, float]] = {}
+    if not os.path.exists(output_path):
+        return done
+    valid_bytes = 0
+    with open(output_path, 'rb') as handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            valid_bytes += len(line)
+            if retry_failed and record.get('status') != 'ok':
+                done.pop(record['path'], None)
+            else:
+                done[record['path']] = (record['size'], record['mtime'])
+    if valid_bytes < os.path.getsize(output_path):
+        logger.warning(f"Discarding an incomplete record at the end of {output_path}")
+        with open(output_path, 'r+b') as handle:
+            handle.truncate(valid_bytes)
+    return done
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours:d}:{minutes:02d}:{seconds:02d}'
+
+
+class ProgressLine:
+    """Single-line throughput and ETA display on stderr"""
+
+    def __init__(self, total: int, stream=sys.stderr):
+        self.total = total
+        self.stream = stream
+        self.done = self.failed = 0
+        self.started = time.perf_counter()
+        self._shown = 0.0
+
+    def update(self, ok: bool):
+        self.done += 1
+        self.failed += not ok
+        now = time.perf_counter()
+        if now - self._shown >= PROGRESS_INTERVAL or self.done == self.total:
+            self._shown = now
+            rate = self.done / max(now - self.started, 1e-9)
+            eta = (self.total - self.done) / rate if rate > 0 else 0.0
+            self.stream.write(f'\r{self.done}/{self.total} files  {self.failed} failed  '
+                              f'{rate:.1f} files/s  ETA {_format_duration(eta)}  ')
+            self.stream.flush()
+
+    def close(self):
+        if self.done:
+            self.stream.write('\n')
+            self.stream.flush()
+
+
+def score_directory(analyzer, root: str, output_path: str, workers: int = DEFAULT_WORKERS,
+                    retry_failed: bool = False, show_progress: bool = True, **options) -> Dict[str, Any]:
+    """
+    Score every light curve file below `root` not yet in `output_path`.
+    `options` are passed to `analyzer.predict` (detrend, clip, precision, ...).
+    Returns counts and throughput for this run.
+    """
+    started = time.perf_counter()
+    done = load_checkpoint(output_path, retry_failed)
+    pending_paths: List[Tuple[str, int, float]] = []
+    skipped = 0
+    for path in find_light_curves(root):
+        stat = os.stat(os.path.join(root, path))
+        if done.get(path) == (stat.st_size, stat.st_mtime):
+            skipped += 1
+        else:
+            pending_paths.append((path, stat.st_size, stat.st_mtime))
+    logger.info(f"{len(pending_paths)} files to score, {skipped} already in {output_path}")
+
+    progress = ProgressLine(len(pending_paths)) if show_progress else None
+    counts = {'scored': 0, 'failed': 0}
+    if pending_paths:
+        executor = ProcessPoolExecutor(max_workers=max(1, workers),
+                                       mp_context=multiprocessing.get_context('fork'),
+                                       initializer=_init_worker, initargs=(analyzer, options))
+        queue = iter(pending_paths)
+        in_flight: Dict[Any, Tuple[str, int, float]] = {}
+        try:
+            with open(output_path, 'a', encoding='utf-8') as output:
+                while True:
+                    # At most two files per worker are queued, so memory stays flat on huge trees
+                    for path, size, mtime in queue:
+                        in_flight[executor.submit(_score_file, os.path.join(root, path))] = (path, size, mtime)
+                        if len(in_flight) >= 2 * max(1, workers):
+                            break
+                    if not in_flight:
+                        break
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        path, size, mtime = in_flight.pop(future)
+                        record: Dict[str, Any] = {'path': path, 'size': size, 'mtime': mtime}
+                        try:
+                            record.update(status='ok', result=future.result())
+                            counts['scored'] += 1
+                        except Exception as e:
+                            record.update(status='error', error=str(e))
+                            counts['failed'] += 1
+                        output.write(json.dumps(record, default=numpy_default) + '\n')
+                        output.flush()
+                        if progress:
+                            progress.update(record['status'] == 'ok')
+        finally:
+            for future in in_flight:
+                future.cancel()
+            executor.shutdown(wait=True, cancel_futures=True)
+            if progress:
+                progress.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        'output': output_path,
+        'files': len(pending_paths) + skipped,
+        'skipped': skipped,
+        **counts,
+        'elapsed_s': round(elapsed, 3),
+        'files_per_second': round((counts['scored'] + counts['failed']) / elapsed, 2) if elapsed > 0 else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score every light curve file in a directory tree')
+    parser.add_argument('root', help='Directory searched recursively for CSV/TXT/FITS light curves')
+    parser.add_argument('output', help='JSON Lines results file; also the resume checkpoint')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Worker processes')
+    parser.add_argument('--retry-failed', action='store_true', help='Score files that failed before again')
+    parser.add_argument('--precision', choices=['float32', 'float64'], help='Flux precision')
+    parser.add_argument('--detrend', choices=DETREND_METHODS, default='none', help='Detrending method')
+    parser.add_argument('--detrend-window', type=float, default=DEFAULT_DETREND_WINDOW,
+                        help='Detrending window (days)')
+    parser.add_argument('--clip', choices=CLIP_MODES, default=DEFAULT_CLIP, help='Sigma clipping mode')
+    parser.add_argument('--clip-sigma', type=float, default=DEFAULT_CLIP_SIGMA, help='Sigma clipping threshold')
+    parser.add_argument('--quiet', action='store_true', help='No progress line')
+    parser.add_argument('--model', default='model.pkl', help='Path to the trained model')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root):
+        parser.error(f'{args.root} is not a directory')
+
+    from app import ExoplanetAnalyzer
+
+    analyzer = ExoplanetAnalyzer()
+    analyzer.load_model(args.model)
+    try:
+        summary = score_directory(analyzer, args.root, args.output, args.workers, args.retry_failed,
+                                  not args.quiet, precision=args.precision, detrend=args.detrend,
+                                  detrend_window=args.detrend_window, clip=args.clip, clip_sigma=args.clip_sigma)
+    except KeyboardInterrupt:
+        print(f'\nInterrupted; rerun the same command to resume from {args.output}', file=sys.stderr)
+        sys.exit(130)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+JSON serialization layer for the AI service
+NumPy arrays and scalars are encoded directly, without a .tolist() round trip.
+orjson is used when installed, with the standard library as a fallback; both
+write NaN and infinities as null. Large responses are gzip/deflate compressed
+when the client accepts it.
+"""
+
+import gzip
+import json
+import os
+import zlib
+import logging
+import numpy as np
+from typing import Any, Callable, Dict
+from flask import Flask, Response, request
+from flask.json.provider import DefaultJSONProvider
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+# Backend selection: 'auto' prefers orjson when available
+JSON_BACKEND = os.environ.get('JSON_BACKEND', 'auto').lower()
+
+# Responses smaller than this are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL', 6))
+
+
+def numpy_default(obj: Any) -> Any:
+    """Fallback encoder for NumPy types not handled natively by a backend"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def finite_or_null(obj: Any) -> Any:
+    """
+    Copy of a JSON-bound object with NaN and infinities replaced by None, as
+    orjson writes them; the standard library would emit bare NaN/Infinity,
+    which is not valid JSON
+    """
+    if isinstance(obj, float):
+        return obj if np.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: finite_or_null(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [finite_or_null(value) for value in obj]
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return finite_or_null(obj.tolist())
+    return obj
+
+
+def _stdlib_dumps(obj: Any, sort_keys: bool = True, indent: int = None) -> bytes:
+    separators = None if indent else (',', ':')
+    return json.dumps(finite_or_null(obj), default=numpy_default, sort_keys=sort_keys, allow_nan=False,
+                      indent=indent, separators=separators).encode('utf-8')
+
+
+def _orjson_dumps(obj: Any, sort_keys: bool = True, indent: int = None) -> bytes:
+    option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(obj, default=numpy_default, option=option)
+
+
+# Registered serializer backends: name -> dumps(obj, sort_keys, indent) -> bytes
+SERIALIZERS: Dict[str, Callable[..., bytes]] = {'json': _stdlib_dumps}
+if orjson is not None:
+    SERIALIZERS['orjson'] = _orjson_dumps
+
+
+def resolve_backend(name: str = None) -> str:
+    """Resolve a backend name, mapping 'auto' to the best available one"""
+    name = (name or JSON_BACKEND).lower()
+    if name == 'auto':
+        name = 'orjson' if 'orjson' in SERIALIZERS else 'json'
+    if name not in SERIALIZERS:
+        raise ValueError(f"Unknown JSON backend '{name}'. Available: {', '.join(SERIALIZERS)}")
+    return name
+
+
+class NumpyJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that serializes through the configured backend"""
+
+    def __init__(self, app: Flask, backend: str = None):
+        super().__init__(app)
+        self.backend = resolve_backend(backend)
+        self._dumps = SERIALIZERS[self.backend]
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return self._dumps(obj, sort_keys=self.sort_keys, indent=kwargs.get('indent')).decode('utf-8')
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = 2 if (self.compact is None and self._app.debug) or self.compact is False else None
+        body = self._dumps(obj, sort_keys=self.sort_keys, indent=indent) + b'\n'
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    """Compress a response body with gzip or deflate"""
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=COMPRESSION_LEVEL)
+    if encoding == 'deflate':
+        return zlib.compress(body, COMPRESSION_LEVEL)
+    raise ValueError(f"Unsupported content encoding '{encoding}'")
+
+
+def negotiate_encoding(accept_encoding: str) -> str:
+    """Pick gzip or deflate from an Accept-Encoding header, honouring q=0"""
+    accepted = {}
+    for item in accept_encoding.split(','):
+        parts = item.strip().split(';')
+        name = parts[0].strip().lower()
+        quality = 1.0
+        for param in parts[1:]:
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+
+    for encoding in ('gzip', 'deflate'):
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > 0:
+            return encoding
+    return None
+
+
+def compress_response(response: Response) -> Response:
+    """after_request hook compressing large JSON responses"""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code >= 300
+            or 'Content-Encoding' in response.headers
+            or not (response.mimetype or '').endswith('json')):
+        return response
+
+    body = response.get_data()
+    if len(body) < COMPRESSION_MIN_SIZE:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+    if encoding is None:
+        return response
+
+    response.set_data(compress_body(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app: Flask, backend: str = None, compression: bool = True):
+    """Install the NumPy-aware JSON provider and response compression on an app"""
+    app.json = NumpyJSONProvider(app, backend)
+    if compression:
+        app.after_request(compress_response)
+    logger.info(f"JSON backend: {app.json.backend}")
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Mergeable summary statistics for incremental and out-of-core analysis
+The summaries are updated with whole batches of points at a time, cost
+O(batch) per update, and can be merged, so partial results from chunks,
+appends or workers combine into the same answer as a single pass.
+`CurveSummary` bundles them into everything the flux features need.
+"""
+
+import numpy as np
+from typing import List, Tuple
+
+
+class RunningMoments:
+    """
+    Count, min, max and the first four central moments of a stream.
+    Batches are folded in with the pairwise (Chan/Pebay) generalisation of
+    Welford's update, accumulated in float64.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.m3 = 0.0
+        self.m4 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values: np.ndarray) -> 'RunningMoments':
+        """Fold a batch of values into the running moments"""
+        values = np.asarray(values).ravel()
+        if len(values) == 0:
+            return self
+
+        batch = RunningMoments()
+        batch.count = len(values)
+        batch.mean = float(np.mean(values, dtype=np.float64))
+        centered = values.astype(np.float64) - batch.mean
+        squared = np.square(centered)
+        batch.m2 = float(np.sum(squared))
+        batch.m3 = float(np.sum(squared * centered))
+        batch.m4 = float(np.sum(np.square(squared)))
+        batch.min = float(np.min(values))
+        batch.max = float(np.max(values))
+        return self.merge(batch)
+
+    def merge(self, other: 'RunningMoments') -> 'RunningMoments':
+        """Combine another set of moments into this one"""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.__dict__.update(other.__dict__)
+            return self
+
+        na, nb = float(self.count), float(other.count)
+        n = na + nb
+        delta = other.mean - self.mean
+        delta_n = delta / n
+
+        m2 = self.m2 + other.m2 + delta * delta_n * na * nb
+        m3 = (self.m3 + other.m3
+              + delta * delta_n ** 2 * na * nb * (na - nb)
+              + 3 * delta_n * (na * other.m2 - nb * self.m2))
+        m4 = (self.m4 + other.m4
+              + delta * delta_n ** 3 * na * nb * (na * na - na * nb + nb * nb)
+              + 6 * delta_n ** 2 * (na * na * other.m2 + nb * nb * self.m2)
+              + 4 * delta_n * (na * other.m3 - nb * self.m3))
+
+        self.count = int(n)
+        self.mean += delta_n * nb
+        self.m2, self.m3, self.m4 = m2, m3, m4
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def std(self) -> float:
+        """Population standard deviation"""
+        return float(np.sqrt(self.m2 / self.count)) if self.count else 0.0
+
+    @property
+    def skewness(self) -> float:
+        if self.m2 == 0:
+            return 0.0
+        return float(np.sqrt(self.count) * self.m3 / self.m2 ** 1.5)
+
+    @property
+    def kurtosis(self) -> float:
+        """Excess kurtosis"""
+        if self.m2 == 0:
+            return 0.0
+        return float(self.count * self.m4 / self.m2 ** 2 - 3)
+
+
+class QuantileSketch:
+    """
+    KLL quantile sketch.
+    Items live in levels of compactors; level h items carry weight 2**h. A
+    full level is sorted and every other item promoted, so memory stays
+    O(k log(n / k)) and rank error is roughly O(1 / k).
+    """
+
+    def __init__(self, k: int = 256, seed: int = 0):
+        self.k = k
+        self.count = 0
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - 1 - level
+        return max(2, int(np.ceil(self.k * (2.0 / 3.0) ** depth)))
+
+    def _compress(self):
+        while True:
+            over = [h for h, items in enumerate(self.levels) if len(items) > self._capacity(h)]
+            if not over:
+                return
+            level = over[0]
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+
+            items = np.sort(self.levels[level])
+            keep = items[:len(items) % 2]  # an odd item stays behind
+            items = items[len(items) % 2:]
+            promoted = items[int(self._rng.integers(2))::2]
+            self.levels[level] = keep
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+
+    def update(self, values: np.ndarray) -> 'QuantileSketch':
+        """Add a batch of values"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if len(values) == 0:
+            return self
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.count += len(values)
+        self._compress()
+        return self
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """Combine another sketch into this one"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def quantile(self, q: float) -> float:
+        """Approximate q-quantile, 0 <= q <= 1"""
+        if self.count == 0:
+            raise ValueError('Quantile of an empty sketch')
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items_h), 2.0 ** h) for h, items_h in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        index = np.searchsorted(cumulative, q * cumulative[-1], side='left')
+        return float(items[order][min(index, len(items) - 1)])
+
+    def percentile(self, p: float) -> float:
+        """Approximate p-th percentile, matching np.percentile's 0-100 scale"""
+        return self.quantile(p / 100.0)
+
+
+class CurveSummary:
+    """
+    Flux moments, a quantile sketch and the time range of a light curve,
+    plus an optional `StreamingPeriodogram` fed with the same points
+    """
+
+    def __init__(self, periodogram=None, sketch_size: int = 256):
+        self.moments = RunningMoments()
+        self.sketch = QuantileSketch(sketch_size)
+        self.periodogram = periodogram
+        self.t_min = np.inf
+        self.t_max = -np.inf
+
+    @property
+    def count(self) -> int:
+        return self.moments.count
+
+    def update(self, time_data: np.ndarray, flux_data: np.ndarray) -> 'CurveSummary':
+        """Fold a batch of (already cleaned) points into the summary"""
+        if len(flux_data) == 0:
+            return self
+        self.moments.update(flux_data)
+        self.sketch.update(flux_data)
+        if self.periodogram is not None:
+            self.periodogram.update(time_data, flux_data)
+        self.t_min = min(self.t_min, float(np.min(time_data)))
+        self.t_max = max(self.t_max, float(np.max(time_data)))
+        return self
+
+    def merge(self, other: 'CurveSummary') -> 'CurveSummary':
+        """Combine another summary into this one"""
+        self.moments.merge(other.moments)
+        self.sketch.merge(other.sketch)
+        if self.periodogram is not None and other.periodogram is not None:
+            self.periodogram.merge(other.periodogram)
+        self.t_min = min(self.t_min, other.t_min)
+        self.t_max = max(self.t_max, other.t_max)
+        return self
+
+    def robust_scale(self) -> Tuple[float, float]:
+        """Median and MAD-based standard deviation, the MAD taken as half the interquartile range"""
+        q25, median, q75 = (self.sketch.quantile(q) for q in (0.25, 0.5, 0.75))
+        return median, 1.4826 * (q75 - q25) / 2
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Incremental analysis sessions for live light curves
+Each append folds only the new cadences into running flux moments, a
+quantile sketch and a `StreamingPeriodogram` on a fixed frequency grid, so
+the provisional classification returned after every append costs O(new
+points) plus a constant-size FFT, however long the session has run.
+Provisional results skip detrending and the sub-harmonic check, clip
+outliers against the running median, and take the depth's 90th percentile
+from the sketch. Finalizing a session runs the curve received so far, kept
+block-averaged onto bins of SESSION_BIN_MINUTES, through
+`ExoplanetAnalyzer.predict` once, the same pipeline as /predict.
+
+Sessions live in the memory of the worker process that created them; run a
+single worker or route a session's requests to the same worker.
+"""
+
+import os
+import time
+import uuid
+import threading
+import numpy as np
+from typing import Any, Dict, Optional
+
+from periodogram import StreamingPeriodogram, frequency_grid
+from preprocessing import DEFAULT_CLIP, DEFAULT_CLIP_SIGMA, CurveAccumulator, outliers, sigma_clip
+from sketches import CurveSummary
+
+SESSION_TTL = int(os.environ.get('SESSION_TTL', 3600))  # seconds since last use
+MAX_SESSIONS = int(os.environ.get('MAX_SESSIONS', 100))
+# Width of the bins a session's curve is kept in for finalizing; TESS 2-minute cadences pass through unbinned
+SESSION_BIN_MINUTES = float(os.environ.get('SESSION_BIN_MINUTES', 2))
+# Longest baseline (days) the session frequency grid resolves peaks for
+SESSION_MAX_BASELINE = float(os.environ.get('SESSION_MAX_BASELINE', 100))
+# Appends are clipped on their own until the session holds this many points
+CLIP_REFERENCE_POINTS = 100
+
+
+class SessionLimitError(RuntimeError):
+    """Raised when no more sessions can be opened"""
+
+
+class SessionFinalizedError(RuntimeError):
+    """Raised when appending to a session that has been finalized"""
+
+
+class AnalysisSession:
+    """
+    One growing light curve, its running summaries and the analysis options it is classified with
+    """
+
+    def __init__(self, dtype: np.dtype, bin_minutes: float = SESSION_BIN_MINUTES, **analysis_options):
+        self.session_id = uuid.uuid4().hex
+        self.dtype = np.dtype(dtype)
+        self.curve = CurveAccumulator(bin_minutes / (24 * 60), self.dtype)
+        self.summary = CurveSummary()
+        # Keyword arguments for `ExoplanetAnalyzer.predict` (detrend, clip, ...)
+        self.analysis_options = analysis_options
+        self.clip = analysis_options.get('clip', DEFAULT_CLIP)
+        self.clip_sigma = analysis_options.get('clip_sigma', DEFAULT_CLIP_SIGMA)
+        self.total_points = 0
+        self.clipped = 0
+        self.appends = 0
+        self.index_time = None  # whether the timestamps are cadence indices rather than days
+        self.final: Optional[Dict[str, Any]] = None
+        self.created_at = self.last_used = time.time()
+        self.lock = threading.Lock()
+
+    def _keep(self, flux_data: np.ndarray, finite: np.ndarray) -> np.ndarray:
+        """Finite, non-outlier points of an append, judged against the session so far"""
+        if self.clip == 'none':
+            return finite
+        if self.summary.count < CLIP_REFERENCE_POINTS:
+            return sigma_clip(flux_data, self.clip_sigma, self.clip, finite.copy())[0]
+        median, scale = self.summary.robust_scale()
+        if scale == 0:
+            return finite
+        return finite & ~outliers(flux_data, median, scale, self.clip_sigma, self.clip)
+
+    def append(self, time_data: np.ndarray, flux_data: np.ndarray, index_time: bool = False):
+        """Add new cadences, updating the running summaries with them only"""
+        with self.lock:
+            if self.final is not None:
+                raise SessionFinalizedError('Session has been finalized')
+            self.curve.append(time_data, flux_data)
+            finite = np.isfinite(time_data) & np.isfinite(flux_data)
+            keep = self._keep(flux_data, finite)
+            time_data, flux_data = time_data[keep], flux_data[keep]
+            if len(time_data) and self.summary.periodogram is None:
+                f0, df, n = frequency_grid(np.array([0.0, SESSION_MAX_BASELINE]))
+                self.summary.periodogram = StreamingPeriodogram(f0, df, n, float(time_data.min()),
+                                                                float(np.median(flux_data)))
+            self.summary.update(time_data, flux_data)
+            self.clipped += int(np.count_nonzero(finite & ~keep))
+            self.total_points += len(keep)
+            self.index_time = index_time if self.index_time is None else self.index_time and index_time
+            self.appends += 1
+            self.last_used = time.time()
+
+    def _session_fields(self) -> Dict[str, Any]:
+        return {
+            'session_id': self.session_id,
+            'total_data_points': self.total_points,
+            'appends': self.appends
+        }
+
+    def classify(self, analyzer) -> Dict[str, Any]:
+        """Provisional classification from the running summaries, or the final result once finalized"""
+        with self.lock:
+            self.last_used = time.time()
+            if self.final is not None:
+                return self.final
+            periodogram = self.summary.periodogram
+            period = periodogram.peak_period() if periodogram is not None else None
+            features, period, depth = analyzer.summary_features(self.summary, period)
+            analyzed = self.summary.count
+            clipped = self.clipped
+        result = analyzer.classify_features(features, period, depth)
+        result.update({
+            'precision': self.dtype.name,
+            'provisional': True,
+            'cleaning': {
+                'method': self.clip,
+                'sigma': self.clip_sigma,
+                'clipped': clipped,
+                'removed': self.total_points - analyzed
+            },
+            'analyzed_points': analyzed,
+            **self._session_fields()
+        })
+        return result
+
+    def finalize(self, analyzer) -> Dict[str, Any]:
+        """Run the full analysis on the curve received so far; later appends are rejected"""
+        with self.lock:
+            self.last_used = time.time()
+            if self.final is not None:
+                return self.final
+            time_data, flux_data = self.curve.arrays()
+            # A session curve is analysed once, so it is not worth a feature store entry
+            result = analyzer.predict(time_data, flux_data, precision=self.dtype.name, use_feature_store=False,
+                                      index_time=bool(self.index_time), **self.analysis_options)
+            result.update({
+                'provisional': False,
+                'session_points': len(time_data),
+                **self._session_fields()
+            })
+            self.final = result
+            return result
+
+
+class SessionStore:
+    """
+    Thread-safe registry of open sessions with idle expiry
+    """
+
+    def __init__(self, ttl: int = SESSION_TTL, max_sessions: int = MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions: Dict[str, AnalysisSession] = {}
+        self._lock = threading.Lock()
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        for session_id in [sid for sid, s in self._sessions.items() if s.last_used < cutoff]:
+            del self._sessions[session_id]
+
+    def create(self, dtype: np.dtype, **analysis_options) -> AnalysisSession:
+        with self._lock:
+            self._expire()
+            if len(self._sessions) >= self.max_sessions:
+                raise SessionLimitError(f'Too many open sessions (limit {self.max_sessions})')
+            session = AnalysisSession(dtype, **analysis_options)
+            self._sessions[session.session_id] = session
+            return session
+
+    def get(self, session_id: str) -> Optional[AnalysisSession]:
+        with self._lock:
+            self._expire()
+            return self._sessions.get(session_id)
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
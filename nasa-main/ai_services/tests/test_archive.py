@@ -0,0 +1,82 @@
+"""
+Streamed archive analysis
+Every light curve member gets its own NDJSON record as it finishes, a
+member that fails to parse gets an error record without stopping the
+others, and a summary record closes the stream.
+"""
+
+import io
+import json
+import zipfile
+
+import numpy as np
+import pytest
+
+import app as service
+from archive import score_archive
+
+
+def curve_csv(seed: int, n_points: int = 500) -> bytes:
+    rng = np.random.default_rng(seed)
+    time_data = np.linspace(0, 20, n_points)
+    flux_data = 1.0 + rng.normal(0, 1e-3, n_points)
+    rows = '\n'.join(f'{t:.6f},{f:.8f}' for t, f in zip(time_data, flux_data))
+    return f'time,flux\n{rows}\n'.encode()
+
+
+@pytest.fixture(scope='module')
+def client():
+    service.analyzer.load_model('missing-model.pkl')  # deterministic mock model
+    yield service.app.test_client()
+    service.archive_pool.shutdown()
+
+
+def post_archive(client, files):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as bundle:
+        for name, content in files.items():
+            bundle.writestr(name, content)
+    archive.seek(0)
+    response = client.post('/api/analyze/archive', content_type='multipart/form-data',
+                           data={'archive': (archive, 'curves.zip')})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_archive_streams_one_record_per_file(client):
+    records = post_archive(client, {
+        'a.csv': curve_csv(0),
+        'nested/b.txt': curve_csv(1),
+        'broken.csv': b'time,flux\nnot,numbers\n',
+        'notes.md': b'not a light curve',
+    })
+    *files, summary = records
+
+    by_name = {record['filename']: record for record in files}
+    assert sorted(by_name) == ['a.csv', 'broken.csv', 'nested/b.txt']
+    assert sorted(record['index'] for record in files) == [0, 1, 2]
+    for name in ('a.csv', 'nested/b.txt'):
+        assert by_name[name]['status'] == 'ok'
+        assert by_name[name]['result']['total_data_points'] == 500
+        assert by_name[name]['result']['prediction'] in ('PLANET', 'CANDIDATE', 'FALSE POSITIVE')
+    assert by_name['broken.csv']['status'] == 'error'
+    assert by_name['broken.csv']['error']
+
+    assert summary['summary'] is True
+    assert (summary['files'], summary['succeeded'], summary['failed']) == (3, 2, 1)
+
+
+def test_member_errors_do_not_stop_the_stream():
+    members = [('ok-1.csv', b'1', None), ('unreadable.csv', None, 'Corrupt archive member'),
+               ('fails.csv', b'2', None), ('ok-2.csv', b'3', None)]
+
+    def analyze(content, name):
+        if name == 'fails.csv':
+            raise ValueError('bad curve')
+        return {'bytes': len(content)}
+
+    records = list(score_archive(iter(members), analyze, workers=2))
+    statuses = {record['filename']: record['status'] for record in records[:-1]}
+    assert statuses == {'ok-1.csv': 'ok', 'unreadable.csv': 'error', 'fails.csv': 'error', 'ok-2.csv': 'ok'}
+    assert records[-1]['failed'] == 2
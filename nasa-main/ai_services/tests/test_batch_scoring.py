@@ -0,0 +1,77 @@
+"""
+Columnar batch scoring against one /predict call per star
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import ExoplanetAnalyzer
+from batch_scoring import MIN_BATCH_POINTS, score_file, score_frame
+
+
+def make_star(seed: int, period: float, n_points: int = 1500):
+    rng = np.random.default_rng(seed)
+    time_data = np.linspace(0, 20.0, n_points)
+    flux_data = 1.0 + rng.normal(0, 1e-3, n_points)
+    flux_data[np.mod(time_data, period) < 0.12] -= 0.01
+    flux_data[rng.choice(n_points, 3, replace=False)] += 0.05  # cosmic rays for the clipping
+    return time_data, flux_data
+
+
+STARS = {'KIC-1': make_star(0, 2.3), 'KIC-2': make_star(1, 5.1), 'TIC-3': make_star(2, 3.7, n_points=900)}
+
+
+@pytest.fixture(scope='module')
+def analyzer():
+    analyzer = ExoplanetAnalyzer()
+    analyzer.load_model('missing-model.pkl')  # deterministic mock model
+    return analyzer
+
+
+@pytest.fixture(scope='module')
+def frame():
+    rows = [pd.DataFrame({'star_id': star, 'time': t, 'flux': f}) for star, (t, f) in STARS.items()]
+    rows.append(pd.DataFrame({'star_id': 'short', 'time': np.arange(MIN_BATCH_POINTS - 1.0), 'flux': 1.0}))
+    # Cadences of different stars interleaved and out of time order
+    return pd.concat(rows).sample(frac=1.0, random_state=0).reset_index(drop=True)
+
+
+def test_batch_matches_predict_per_star(analyzer, frame):
+    result, report = score_frame(analyzer, frame)
+    assert report['curves'] == 4 and report['scored'] == 3 and report['failed'] == 1
+    assert report['points'] == len(frame)
+
+    rows = result.set_index('star_id')
+    for star, (time_data, flux_data) in STARS.items():
+        expected = analyzer.predict(time_data, flux_data, use_feature_store=False)
+        row = rows.loc[star]
+        assert pd.isna(row['error'])
+        assert row['n_points'] == len(flux_data)
+        assert row['prediction'] == expected['prediction']
+        assert row['confidence'] == pytest.approx(expected['confidence'])
+        for name, probability in expected['class_probabilities'].items():
+            assert row[f'probability_{name}'] == pytest.approx(probability)
+        for key in ('transit_period', 'transit_depth', 'transit_duration', 'transit_epoch'):
+            assert row[key] == pytest.approx(expected[key]), key
+        assert row['model_version'] == analyzer.model_version
+
+
+def test_short_star_gets_an_error_row(analyzer, frame):
+    result, _ = score_frame(analyzer, frame)
+    row = result.set_index('star_id').loc['short']
+    assert 'at least' in row['error']
+    assert pd.isna(row['prediction']) and np.isnan(row['confidence'])
+
+
+def test_missing_columns_are_reported(analyzer, frame):
+    with pytest.raises(ValueError, match='quality'):
+        score_frame(analyzer, frame, quality_column='quality')
+
+
+def test_parquet_round_trip(analyzer, frame, tmp_path):
+    pytest.importorskip('pyarrow')
+    frame.to_parquet(tmp_path / 'curves.parquet', index=False)
+    report = score_file(analyzer, str(tmp_path / 'curves.parquet'), str(tmp_path / 'scores.parquet'))
+    scores = pd.read_parquet(tmp_path / 'scores.parquet')
+    assert report['scored'] == 3 and sorted(scores['star_id']) == sorted([*STARS, 'short'])
@@ -0,0 +1,92 @@
+"""
+Feature store hits, misses and invalidation through ExoplanetAnalyzer.predict
+"""
+
+import numpy as np
+import pytest
+
+from app import ExoplanetAnalyzer
+from feature_store import FeatureStore, feature_key
+
+
+def make_curve(seed: int = 0, n_points: int = 2000):
+    rng = np.random.default_rng(seed)
+    time_data = np.linspace(0, 20.0, n_points)
+    flux_data = 1.0 + rng.normal(0, 1e-3, n_points)
+    flux_data[np.mod(time_data, 2.7) < 0.12] -= 0.01
+    return time_data, flux_data
+
+
+@pytest.fixture
+def analyzer(tmp_path):
+    analyzer = ExoplanetAnalyzer()
+    analyzer.load_model('missing-model.pkl')  # deterministic mock model
+    analyzer.feature_store = FeatureStore(str(tmp_path / 'features.db'), analyzer.feature_names)
+    return analyzer
+
+
+def test_feature_key_depends_on_curve_and_options():
+    time_data, flux_data = make_curve()
+    keys = feature_key(time_data, flux_data, detrend='none')
+    assert feature_key(time_data, flux_data, detrend='none') == keys
+    detrended = feature_key(time_data, flux_data, detrend='median')
+    assert detrended['curve_hash'] == keys['curve_hash'] and detrended['curve_key'] != keys['curve_key']
+    assert feature_key(*make_curve(1), detrend='none')['curve_hash'] != keys['curve_hash']
+
+
+def test_repeat_curve_hits_with_same_result(analyzer):
+    time_data, flux_data = make_curve()
+    first = analyzer.predict(time_data, flux_data)
+    second = analyzer.predict(time_data, flux_data)
+
+    assert first['feature_cache'] == 'miss' and second['feature_cache'] == 'hit'
+    assert second['curve_hash'] == first['curve_hash']
+    assert second['prediction'] == first['prediction']
+    assert second['class_probabilities'] == pytest.approx(first['class_probabilities'])
+    assert second['transit_period'] == pytest.approx(first['transit_period'])
+    assert analyzer.feature_store.stats() == {'curves': 1, 'hits': 1, 'labelled': 0}
+
+
+def test_other_options_miss(analyzer):
+    time_data, flux_data = make_curve()
+    analyzer.predict(time_data, flux_data)
+    assert analyzer.predict(time_data, flux_data, detrend='median')['feature_cache'] == 'miss'
+    assert analyzer.predict(time_data, flux_data, use_feature_store=False).get('feature_cache') is None
+    assert analyzer.feature_store.stats()['curves'] == 2
+
+
+def test_delete_invalidates_every_entry_of_a_curve(analyzer):
+    time_data, flux_data = make_curve()
+    curve_hash = analyzer.predict(time_data, flux_data)['curve_hash']
+    analyzer.predict(time_data, flux_data, detrend='median')
+
+    assert analyzer.feature_store.delete(curve_hash) == 2
+    assert analyzer.predict(time_data, flux_data)['feature_cache'] == 'miss'
+
+
+def test_entry_missing_a_needed_feature_is_recomputed(analyzer):
+    time_data, flux_data = make_curve()
+    result = analyzer.predict(time_data, flux_data)
+    keys = feature_key(time_data, flux_data, precision='float64', detrend='none', detrend_window=None)
+    stored = analyzer.feature_store.get(keys['curve_key'])
+    assert stored is not None
+
+    # As stored by a model that did not use the first feature
+    features = stored['features'].copy()
+    features[0, 0] = np.nan
+    analyzer.feature_store.put(keys, len(flux_data), {}, features, stored['transit_period'],
+                               stored['transit_depth'])
+    again = analyzer.predict(time_data, flux_data)
+    assert again['feature_cache'] == 'miss'
+    assert again['class_probabilities'] == pytest.approx(result['class_probabilities'])
+
+
+def test_labels_and_outcomes_load_for_retraining(analyzer):
+    time_data, flux_data = make_curve()
+    result = analyzer.predict(time_data, flux_data)
+    assert analyzer.feature_store.set_label(result['curve_hash'], 'planet') == 1
+
+    frame = analyzer.feature_store.load(labelled_only=True)
+    assert list(frame['label']) == ['planet']
+    assert list(frame['prediction']) == [result['prediction']]
+    assert frame[analyzer.feature_names].notna().all(axis=None)
@@ -0,0 +1,111 @@
+"""
+Job queue lifecycle: queued, running, finished, cancelled, in priority order
+"""
+
+import threading
+import time
+
+import pytest
+
+from jobs import CANCELLED, FAILED, QUEUED, SUCCEEDED, JobQueue
+
+TIMEOUT = 10.0
+
+
+def wait_for(queue: JobQueue, job_id: str, *states: str):
+    deadline = time.time() + TIMEOUT
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in states:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} still {queue.get(job_id)['status']}")
+
+
+@pytest.fixture
+def make_queue(tmp_path):
+    queues = []
+
+    def make(workers: int = 1) -> JobQueue:
+        queue = JobQueue(str(tmp_path / 'jobs.db'), workers=workers)
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.stop(TIMEOUT)
+
+
+def test_job_succeeds_with_result_and_progress(make_queue):
+    queue = make_queue()
+
+    def handler(context):
+        context.progress(0.5, 'Halfway')
+        return {'echo': context.params['value'], 'size': len(context.payload)}
+
+    queue.register('echo', handler)
+    job_id = queue.submit('echo', {'value': 7}, payload=b'abc')
+    job = wait_for(queue, job_id, SUCCEEDED)
+    assert job['result'] == {'echo': 7, 'size': 3}
+    assert job['progress'] == 1.0 and job['message'] == 'Completed'
+    assert 'error' not in job and job['started_at'] <= job['finished_at']
+
+
+def test_failing_job_records_error(make_queue):
+    queue = make_queue()
+
+    def handler(context):
+        raise RuntimeError('bad curve')
+
+    queue.register('fail', handler)
+    job = wait_for(queue, queue.submit('fail', {}), FAILED)
+    assert job['error'] == 'bad curve' and 'result' not in job
+
+
+def test_unknown_kind_is_rejected(make_queue):
+    with pytest.raises(ValueError):
+        make_queue().submit('missing', {})
+
+
+def test_cancel_queued_job(make_queue):
+    queue = make_queue(workers=0)
+    queue.register('noop', lambda context: {})
+    job_id = queue.submit('noop', {})
+    assert queue.get(job_id)['status'] == QUEUED
+    assert queue.cancel(job_id) == CANCELLED
+    assert queue.get(job_id)['status'] == CANCELLED
+    assert queue.cancel('no-such-job') is None
+    assert queue.stats() == {CANCELLED: 1}
+
+
+def test_cancel_running_job_at_next_progress_report(make_queue):
+    queue = make_queue()
+    started, release = threading.Event(), threading.Event()
+
+    def handler(context):
+        started.set()
+        release.wait(TIMEOUT)
+        context.progress(0.9)
+        return {'finished': True}
+
+    queue.register('slow', handler)
+    job_id = queue.submit('slow', {})
+    assert started.wait(TIMEOUT)
+    assert queue.cancel(job_id) == 'cancelling'
+    release.set()
+    job = wait_for(queue, job_id, CANCELLED)
+    assert job['error'] == 'Cancelled' and 'result' not in job
+
+
+def test_jobs_run_highest_priority_first(make_queue):
+    queue = make_queue(workers=0)
+    order = []
+    queue.register('record', lambda context: order.append(context.params['name']) or {})
+    ids = [queue.submit('record', {'name': name}, priority=priority)
+           for name, priority in (('low', 0), ('high', 5), ('middle', 1))]
+
+    queue.workers = 1
+    queue.start()
+    for job_id in ids:
+        wait_for(queue, job_id, SUCCEEDED)
+    assert order == ['high', 'middle', 'low']
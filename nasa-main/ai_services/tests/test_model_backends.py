@@ -0,0 +1,35 @@
+"""
+Backend registry: every registered factory builds the class it is registered with
+"""
+
+import pytest
+
+import model_backends
+from model_backends import BACKENDS, backend_name, build_model
+
+
+@pytest.mark.parametrize('name', sorted(BACKENDS))
+def test_backend_name_round_trip(name):
+    assert backend_name(build_model(name)) == name
+
+
+def test_backend_name_does_not_build_models(monkeypatch):
+    model = build_model('logistic')
+
+    def refuse(**params):
+        raise AssertionError('factory called')
+
+    monkeypatch.setitem(model_backends.BACKENDS, 'random_forest', refuse)
+    assert backend_name(model) == 'logistic'
+
+
+def test_unregistered_model_falls_back_to_class_name():
+    class RandomForestClassifier:
+        pass
+
+    assert backend_name(RandomForestClassifier()) == 'RandomForestClassifier'
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        build_model('quantum_forest')
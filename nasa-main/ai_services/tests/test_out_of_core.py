@@ -0,0 +1,68 @@
+"""
+Out-of-core analysis against /predict on curves that fit in memory
+The chunked passes keep only mergeable summaries; on a curve small enough
+for `ExoplanetAnalyzer.predict` both must give the same classification.
+"""
+
+import numpy as np
+import pytest
+
+from app import ExoplanetAnalyzer
+from light_curve import iter_array_chunks
+from out_of_core import analyze_chunks
+
+PROBABILITY_ATOL = 0.02
+# Shape measurements come from identical folds; the depth's 90th percentile is sketched
+SHAPE_RTOL = 1e-9
+DEPTH_ATOL = 1e-3
+CHUNK_SIZE = 700
+
+
+def make_curve(seed: int, period: float, depth: float, n_points: int = 6000, baseline: float = 40.0):
+    rng = np.random.default_rng(seed)
+    time_data = np.sort(rng.uniform(0, baseline, n_points))
+    flux_data = 1.0 + rng.normal(0, 1e-3, n_points)
+    if period:
+        flux_data[np.mod(time_data, period) < 0.15] -= depth
+    # A few cosmic rays for the clipping pass
+    flux_data[rng.choice(n_points, 5, replace=False)] += 0.05
+    return time_data, flux_data
+
+
+CURVES = {
+    'transit': make_curve(0, 4.1, 0.01),
+    'shallow_transit': make_curve(1, 6.3, 0.003),
+    'noise_only': make_curve(2, None, 0.0),
+}
+
+
+@pytest.fixture(scope='module')
+def analyzer():
+    analyzer = ExoplanetAnalyzer()
+    analyzer.load_model('missing-model.pkl')  # deterministic mock model
+    return analyzer
+
+
+@pytest.mark.parametrize('name', sorted(CURVES))
+def test_out_of_core_matches_in_memory(analyzer, name):
+    time_data, flux_data = CURVES[name]
+    expected = analyzer.predict(time_data, flux_data, use_feature_store=False)
+    result = analyze_chunks(analyzer, lambda: iter_array_chunks(time_data, flux_data, CHUNK_SIZE))
+
+    assert result['chunks'] == -(-len(flux_data) // CHUNK_SIZE)
+    assert result['analyzed_points'] == len(flux_data) - expected['cleaning']['removed']
+    assert result['prediction'] == expected['prediction']
+    for label, probability in expected['class_probabilities'].items():
+        assert result['class_probabilities'][label] == pytest.approx(probability, abs=PROBABILITY_ATOL)
+    assert result['transit_period'] == pytest.approx(expected['transit_period'], rel=1e-9)
+    assert result['transit_depth'] == pytest.approx(expected['transit_depth'], rel=SHAPE_RTOL, abs=DEPTH_ATOL)
+    for key in ('transit_epoch', 'transit_duration'):
+        assert result.get(key) == pytest.approx(expected.get(key), rel=SHAPE_RTOL)
+
+
+def test_chunk_size_does_not_change_result(analyzer):
+    time_data, flux_data = CURVES['transit']
+    small = analyze_chunks(analyzer, lambda: iter_array_chunks(time_data, flux_data, 313))
+    large = analyze_chunks(analyzer, lambda: iter_array_chunks(time_data, flux_data, len(flux_data)))
+    assert small['transit_period'] == large['transit_period']
+    assert small['class_probabilities'] == pytest.approx(large['class_probabilities'], abs=PROBABILITY_ATOL)
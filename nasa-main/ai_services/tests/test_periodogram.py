@@ -0,0 +1,40 @@
+"""
+Sub-harmonic check of the Lomb-Scargle peak
+A box transit at period P puts power at P/k; folding on the multiples must
+recover P, while on pure noise the sparser bins of longer multiples must not
+pull the period away from the peak.
+"""
+
+import numpy as np
+import pytest
+
+from periodogram import check_subharmonics, estimate_period
+
+TRANSIT_PERIOD = 4.0
+
+
+def make_curve(seed: int, depth: float, n_points: int = 8000, baseline: float = 60.0):
+    rng = np.random.default_rng(seed)
+    time_data = np.sort(rng.uniform(0, baseline, n_points))
+    flux_data = 1.0 + rng.normal(0, 1e-3, n_points)
+    flux_data[np.mod(time_data, TRANSIT_PERIOD) < 0.2] -= depth
+    return time_data, flux_data
+
+
+@pytest.mark.parametrize('k', [2, 3])
+def test_true_period_recovered_from_harmonic(k):
+    time_data, flux_data = make_curve(0, 0.005)
+    assert check_subharmonics(time_data, flux_data, TRANSIT_PERIOD / k) == pytest.approx(TRANSIT_PERIOD)
+
+
+def test_true_period_kept():
+    time_data, flux_data = make_curve(1, 0.005)
+    assert check_subharmonics(time_data, flux_data, TRANSIT_PERIOD) == TRANSIT_PERIOD
+    assert estimate_period(time_data, flux_data) == pytest.approx(TRANSIT_PERIOD, rel=0.01)
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('period', [0.7, 1.9, 3.3])
+def test_noise_keeps_peak_period(seed, period):
+    time_data, flux_data = make_curve(seed, 0.0)
+    assert check_subharmonics(time_data, flux_data, period) == period
@@ -0,0 +1,72 @@
+"""
+Drift between the float32 and float64 flux paths
+The same curves are analyzed in both precisions; the features and class
+probabilities must agree within the tolerances below.
+"""
+
+import numpy as np
+import pytest
+
+from app import ExoplanetAnalyzer
+
+# Flux-valued features: relative tolerance (float32 keeps ~7 significant digits)
+FLUX_FEATURE_RTOL = 1e-4
+# Differences of fluxes near 1.0 (range, depth) also carry float32 rounding of ~1e-7 each
+FLUX_FEATURE_ATOL = 8 * float(np.finfo(np.float32).eps)
+# Skew and kurtosis are O(1) and near zero for pure noise, so they are compared absolutely
+SHAPE_FEATURE_ATOL = 5e-3
+PERIOD_RTOL = 1e-6
+PROBABILITY_ATOL = 0.02
+SHAPE_FEATURES = ('flux_skew', 'flux_kurtosis')
+
+
+def make_curve(seed: int, period: float, depth: float, noise: float, n_points: int = 3000,
+               baseline: float = 30.0):
+    rng = np.random.default_rng(seed)
+    time_data = np.linspace(0, baseline, n_points)
+    flux_data = 1.0 + rng.normal(0, noise, n_points)
+    if period:
+        flux_data[np.mod(time_data, period) < 0.15] -= depth
+    return time_data, flux_data
+
+
+CURVES = {
+    'transit': make_curve(0, 3.2, 0.01, 1e-3),
+    'shallow_transit': make_curve(1, 5.7, 0.005, 5e-4),
+    'noise_only': make_curve(2, None, 0.0, 1e-3),
+    'long_baseline': make_curve(3, 2.1, 0.02, 2e-3, n_points=20_000, baseline=90.0),
+    # Noise of ~1000 float32 ulps around 1.0: the hardest case for single precision
+    'quiet_star': make_curve(4, None, 0.0, 1e-4),
+}
+
+
+@pytest.fixture(scope='module')
+def analyzer():
+    analyzer = ExoplanetAnalyzer()
+    analyzer.load_model('missing-model.pkl')  # deterministic mock model
+    return analyzer
+
+
+@pytest.mark.parametrize('name', sorted(CURVES))
+def test_feature_drift(analyzer, name):
+    time_data, flux_data = CURVES[name]
+    features64 = analyzer.extract_features(time_data, flux_data, precision='float64')[0]
+    features32 = analyzer.extract_features(time_data, flux_data, precision='float32')[0]
+    for i, feature in enumerate(analyzer.feature_names):
+        if feature in SHAPE_FEATURES:
+            assert features32[i] == pytest.approx(features64[i], abs=SHAPE_FEATURE_ATOL), feature
+        elif feature == 'period_estimate':
+            assert features32[i] == pytest.approx(features64[i], rel=PERIOD_RTOL), feature
+        else:
+            assert features32[i] == pytest.approx(features64[i], rel=FLUX_FEATURE_RTOL, abs=FLUX_FEATURE_ATOL), feature
+
+
+@pytest.mark.parametrize('name', sorted(CURVES))
+def test_probability_drift(analyzer, name):
+    time_data, flux_data = CURVES[name]
+    result64 = analyzer.predict(time_data, flux_data, precision='float64')
+    result32 = analyzer.predict(time_data, flux_data, precision='float32')
+    assert result32['precision'] == 'float32'
+    assert result32['prediction'] == result64['prediction']
+    for label, probability in result64['class_probabilities'].items():
+        assert result32['class_probabilities'][label] == pytest.approx(probability, abs=PROBABILITY_ATOL)
@@ -0,0 +1,120 @@
+"""
+Detrending and cleaning of light curves before feature extraction
+"""
+
+import numpy as np
+import pytest
+
+from preprocessing import HARD_QUALITY_BITMASK, clean_light_curve, detrend, parse_clip_options, sigma_clip
+
+TRANSIT_DEPTH = 0.01
+
+
+def index_time_curve(n_points: int = 4000, period: int = 500, duration: int = 20, seed: int = 0):
+    """Flux with a slow trend and box transits, timed by cadence index"""
+    rng = np.random.default_rng(seed)
+    time_data = np.arange(n_points, dtype=np.float64)
+    trend = 1.0 + 0.02 * np.sin(2 * np.pi * time_data / n_points)
+    flux_data = trend * (1.0 + rng.normal(0, 1e-4, n_points))
+    in_transit = np.mod(time_data, period) < duration
+    flux_data[in_transit] -= TRANSIT_DEPTH * trend[in_transit]
+    return time_data, flux_data, in_transit
+
+
+# Robust trends; a Savitzky-Golay fit is pulled into the dip whatever the window
+@pytest.mark.parametrize('method', ['median', 'biweight'])
+def test_transit_survives_detrending_on_index_time(method):
+    time_data, flux_data, in_transit = index_time_curve()
+    detrended, report = detrend(time_data, flux_data, method, index_time=True)
+
+    assert report['window_points'] > 4 * 20
+    depth = np.median(detrended[~in_transit]) - np.median(detrended[in_transit])
+    assert depth == pytest.approx(TRANSIT_DEPTH, rel=0.1)
+    # The trend itself is gone
+    assert np.std(detrended[~in_transit]) < 1e-3
+
+
+def test_day_window_on_index_time_would_erase_the_transit():
+    time_data, flux_data, in_transit = index_time_curve()
+    detrended, report = detrend(time_data, flux_data, 'median')
+    assert report['window_points'] == 3
+    assert np.median(detrended[~in_transit]) - np.median(detrended[in_transit]) < TRANSIT_DEPTH / 4
+
+
+def clip_curve(n_points: int = 2000, seed: int = 0):
+    """Flat noisy flux with two cosmic rays, one dropout and one transit-like dip"""
+    rng = np.random.default_rng(seed)
+    time_data = np.linspace(0, 10.0, n_points)
+    flux_data = 1.0 + rng.normal(0, 1e-3, n_points)
+    flux_data[[100, 900]] += 0.05
+    flux_data[500] = np.nan
+    flux_data[1500:1520] -= TRANSIT_DEPTH
+    return time_data, flux_data
+
+
+def test_upper_clip_removes_only_brightening_outliers():
+    _, flux_data = clip_curve()
+    keep, iterations = sigma_clip(flux_data, mode='upper')
+    assert np.flatnonzero(~keep).tolist() == [100, 500, 900]
+    assert keep[1500:1520].all() and iterations >= 1
+
+
+def test_both_clip_also_removes_dips():
+    _, flux_data = clip_curve()
+    keep, _ = sigma_clip(flux_data, mode='both')
+    assert not keep[[100, 500, 900]].any()
+    assert not keep[1500:1520].any()
+
+
+def test_clip_none_only_drops_non_finite():
+    _, flux_data = clip_curve()
+    keep, iterations = sigma_clip(flux_data, mode='none')
+    assert np.flatnonzero(~keep).tolist() == [500] and iterations == 0
+
+
+def test_clean_light_curve_reports_every_removal():
+    time_data, flux_data = clip_curve()
+    quality = np.zeros(len(flux_data), dtype=np.int64)
+    quality[[10, 11]] = 32  # desaturation: a hard flag
+    quality[12] = 8 | 4096  # earth point plus an informational bit
+    quality[13] = 4096  # informational bits alone keep the cadence
+    quality[500] = 32  # flagged and non-finite counts as non-finite
+
+    cleaned_time, cleaned_flux, report = clean_light_curve(time_data, flux_data, quality)
+    assert report['quality_flagged'] == 3
+    assert report['non_finite'] == 1
+    assert report['clipped'] == 2
+    assert report['removed'] == 6 == len(flux_data) - len(cleaned_flux)
+    assert 13 * (time_data[1] - time_data[0]) in cleaned_time
+    assert np.isfinite(cleaned_flux).all()
+
+
+def test_custom_quality_bitmask():
+    time_data, flux_data = clip_curve()
+    quality = np.zeros(len(flux_data), dtype=np.int64)
+    quality[10] = 4096
+    _, cleaned_flux, report = clean_light_curve(time_data, flux_data, quality, clip='none',
+                                                quality_bitmask=HARD_QUALITY_BITMASK | 4096)
+    assert report['quality_flagged'] == 1 and report['non_finite'] == 1
+    assert len(cleaned_flux) == len(flux_data) - 2
+
+
+def test_fully_flagged_curve_is_rejected():
+    time_data, flux_data = clip_curve()
+    quality = np.full(len(flux_data), 1)
+    quality[:2] = 0
+    with pytest.raises(ValueError):
+        clean_light_curve(time_data, flux_data, quality)
+
+
+def test_unflagged_curve_without_outliers_is_returned_as_is():
+    rng = np.random.default_rng(1)
+    time_data, flux_data = np.arange(500.0), 1.0 + rng.normal(0, 1e-3, 500)
+    cleaned_time, cleaned_flux, report = clean_light_curve(time_data, flux_data)
+    assert cleaned_flux is flux_data and cleaned_time is time_data and report['removed'] == 0
+
+
+@pytest.mark.parametrize('params', [{'clip': 'lower'}, {'clip_sigma': 'x'}, {'clip_sigma': 0}])
+def test_invalid_clip_options(params):
+    with pytest.raises(ValueError):
+        parse_clip_options(params)
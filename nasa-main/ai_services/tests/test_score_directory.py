@@ -0,0 +1,106 @@
+"""
+Directory scoring: one record per file, and resuming from the output file
+"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+from app import ExoplanetAnalyzer
+from score_directory import load_checkpoint, score_directory
+
+
+def write_curve(path, seed: int, n_points: int = 600):
+    rng = np.random.default_rng(seed)
+    time_data = np.linspace(0, 10.0, n_points)
+    flux_data = 1.0 + rng.normal(0, 1e-3, n_points)
+    flux_data[np.mod(time_data, 2.1) < 0.1] -= 0.01
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text('time,flux\n' + '\n'.join(f'{t},{f}' for t, f in zip(time_data, flux_data)))
+
+
+@pytest.fixture(scope='module')
+def analyzer():
+    analyzer = ExoplanetAnalyzer()
+    analyzer.load_model('missing-model.pkl')  # deterministic mock model
+    return analyzer
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / 'curves'
+    write_curve(root / 'a.csv', 0)
+    write_curve(root / 'sector_1' / 'b.csv', 1)
+    write_curve(root / 'sector_1' / 'c.txt', 2)
+    (root / 'broken.csv').write_text('time,flux\n1,2\n')
+    (root / 'notes.md').write_text('not a light curve')
+    (root / '.hidden').mkdir()
+    write_curve(root / '.hidden' / 'd.csv', 3)
+    return root
+
+
+def read_records(path):
+    with open(path) as handle:
+        return [json.loads(line) for line in handle]
+
+
+def score(analyzer, root, output, **options):
+    return score_directory(analyzer, str(root), str(output), workers=2, show_progress=False, **options)
+
+
+def test_scores_every_light_curve_once(analyzer, tree, tmp_path):
+    output = tmp_path / 'scores.jsonl'
+    summary = score(analyzer, tree, output)
+    assert summary['files'] == 4 and summary['scored'] == 3 and summary['failed'] == 1
+
+    records = {record['path']: record for record in read_records(output)}
+    assert sorted(records) == ['a.csv', 'broken.csv', os.path.join('sector_1', 'b.csv'),
+                               os.path.join('sector_1', 'c.txt')]
+    assert records['broken.csv']['status'] == 'error'
+    assert records['a.csv']['status'] == 'ok' and records['a.csv']['result']['total_data_points'] == 600
+
+
+def test_rerun_skips_recorded_files(analyzer, tree, tmp_path):
+    output = tmp_path / 'scores.jsonl'
+    score(analyzer, tree, output)
+    summary = score(analyzer, tree, output)
+    assert summary['skipped'] == 4 and summary['scored'] == summary['failed'] == 0
+    assert len(read_records(output)) == 4
+
+
+def test_changed_and_new_files_are_rescored(analyzer, tree, tmp_path):
+    output = tmp_path / 'scores.jsonl'
+    score(analyzer, tree, output)
+    write_curve(tree / 'a.csv', 10, n_points=700)
+    write_curve(tree / 'e.csv', 4)
+
+    summary = score(analyzer, tree, output)
+    assert summary['skipped'] == 3 and summary['scored'] == 2
+    latest = {record['path']: record for record in read_records(output)}
+    assert latest['a.csv']['result']['total_data_points'] == 700
+
+
+def test_retry_failed(analyzer, tree, tmp_path):
+    output = tmp_path / 'scores.jsonl'
+    score(analyzer, tree, output)
+    summary = score(analyzer, tree, output, retry_failed=True)
+    assert summary['skipped'] == 3 and summary['failed'] == 1
+
+
+def test_interrupted_record_is_discarded(analyzer, tree, tmp_path):
+    output = tmp_path / 'scores.jsonl'
+    score(analyzer, tree, output)
+    complete = output.read_bytes()
+    last = complete.rstrip(b'\n').rsplit(b'\n', 1)[-1]
+    # A run killed while writing its last record
+    output.write_bytes(complete[:-len(last) // 2 - 1])
+
+    done = load_checkpoint(str(output))
+    assert len(done) == 3
+    assert output.read_bytes() == complete[:-len(last) - 1]
+
+    summary = score(analyzer, tree, output)
+    assert summary['skipped'] == 3 and summary['scored'] + summary['failed'] == 1
+    assert len(read_records(output)) == 4
@@ -0,0 +1,32 @@
+"""
+JSON backends must write the same, valid JSON for non-finite values
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+import serialization
+
+PAYLOAD = {
+    'depth': float('nan'),
+    'period': np.float64(np.inf),
+    'snr': np.float32(-np.inf),
+    'flux': np.array([1.0, np.nan, 2.0]),
+    'bins': [np.float32(0.5), (float('-inf'), 3)],
+    'ok': True
+}
+EXPECTED = {'depth': None, 'period': None, 'snr': None, 'flux': [1.0, None, 2.0], 'bins': [0.5, [None, 3]],
+            'ok': True}
+
+
+@pytest.mark.parametrize('backend', sorted(serialization.SERIALIZERS))
+def test_non_finite_values_become_null(backend):
+    body = serialization.SERIALIZERS[backend](PAYLOAD)
+    assert json.loads(body, parse_constant=pytest.fail) == EXPECTED
+
+
+def test_backends_agree():
+    bodies = {serialization.SERIALIZERS[backend](PAYLOAD) for backend in serialization.SERIALIZERS}
+    assert len(bodies) == 1
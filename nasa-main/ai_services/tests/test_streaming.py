@@ -0,0 +1,83 @@
+"""
+Incremental sessions against the in-memory analysis
+Provisional results come from running summaries; they must track the
+features /predict computes on the same points, and a finalized session
+must give exactly the /predict result.
+"""
+
+import numpy as np
+import pytest
+
+from app import ExoplanetAnalyzer
+from periodogram import lomb_scargle
+from streaming import AnalysisSession, SessionFinalizedError
+
+# Moments are merged exactly; the depth's 90th percentile comes from the quantile sketch
+MOMENT_RTOL = 1e-9
+DEPTH_ATOL = 1e-3
+CHUNK = 250
+
+
+def make_curve(seed: int = 0, n_points: int = 4000, period: float = 3.2, depth: float = 0.01):
+    rng = np.random.default_rng(seed)
+    time_data = np.linspace(0, 30.0, n_points)
+    flux_data = 1.0 + rng.normal(0, 1e-3, n_points)
+    flux_data[np.mod(time_data, period) < 0.15] -= depth
+    return time_data, flux_data
+
+
+@pytest.fixture(scope='module')
+def analyzer():
+    analyzer = ExoplanetAnalyzer()
+    analyzer.load_model('missing-model.pkl')  # deterministic mock model
+    return analyzer
+
+
+def stream(time_data, flux_data, **options):
+    session = AnalysisSession(np.float64, **options)
+    for start in range(0, len(flux_data), CHUNK):
+        session.append(time_data[start:start + CHUNK], flux_data[start:start + CHUNK])
+    return session
+
+
+def test_provisional_features_track_full_extraction(analyzer):
+    time_data, flux_data = make_curve()
+    session = stream(time_data, flux_data, clip='none')
+    features, period, depth = analyzer.summary_features(session.summary, session.summary.periodogram.peak_period())
+    expected = analyzer.extract_features(time_data, flux_data)[0]
+
+    for i, name in enumerate(analyzer.feature_names):
+        if name == 'transit_depth_estimate':
+            assert features[0, i] == pytest.approx(expected[i], abs=DEPTH_ATOL)
+        elif name != 'period_estimate':
+            assert features[0, i] == pytest.approx(expected[i], rel=MOMENT_RTOL), name
+
+    # The provisional period is the raw Lomb-Scargle peak, before the sub-harmonic check;
+    # the session grid is finer than the curve's, so they agree to one step of the latter
+    frequency, power = lomb_scargle(time_data, flux_data)
+    assert abs(1.0 / period - frequency[np.argmax(power)]) <= frequency[1] - frequency[0]
+
+
+def test_summaries_stay_bounded(analyzer):
+    time_data, flux_data = make_curve(n_points=40_000)
+    session = stream(time_data, flux_data)
+    retained = sum(len(level) for level in session.summary.sketch.levels)
+    assert retained < 2000
+    result = session.classify(analyzer)
+    assert result['provisional'] and result['total_data_points'] == len(flux_data)
+
+
+def test_finalize_matches_predict(analyzer):
+    time_data, flux_data = make_curve(seed=1)
+    session = stream(time_data, flux_data)
+    final = session.finalize(analyzer)
+    expected = analyzer.predict(time_data, flux_data, use_feature_store=False)
+
+    assert not final['provisional']
+    assert final['prediction'] == expected['prediction']
+    assert final['transit_period'] == pytest.approx(expected['transit_period'])
+    for name, probability in expected['class_probabilities'].items():
+        assert final['class_probabilities'][name] == pytest.approx(probability)
+    assert session.classify(analyzer) is final
+    with pytest.raises(SessionFinalizedError):
+        session.append(time_data[:CHUNK], flux_data[:CHUNK])
@@ -0,0 +1,89 @@
+"""
+Downsampling for plots: LTTB keeps the endpoints and one point per bucket,
+min/max keeps every bucket's extremes
+"""
+
+import numpy as np
+import pytest
+
+from visualization import downsample, lttb_downsample, minmax_downsample, parse_visualization_options
+
+
+def make_curve(n_points: int = 5000, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    time_data = np.sort(rng.uniform(0, 27.0, n_points))
+    flux_data = 1.0 + rng.normal(0, 1e-3, n_points)
+    flux_data[np.mod(time_data, 3.1) < 0.1] -= 0.01
+    return time_data, flux_data
+
+
+def lttb_reference(t: np.ndarray, f: np.ndarray, max_points: int) -> np.ndarray:
+    """Bucket-by-bucket LTTB anchored on the neighbouring bucket means, as the vectorized version is"""
+    n = len(f)
+    edges = np.linspace(0, n - 2, max_points - 1).astype(np.int64) + 1
+    buckets = [np.arange(a, b) for a, b in zip(edges[:-1], edges[1:])]
+    means = [(t[b].mean(), f[b].mean()) for b in buckets]
+    indices = [0]
+    for i, bucket in enumerate(buckets):
+        prev_t, prev_f = means[i - 1] if i > 0 else (t[0], f[0])
+        next_t, next_f = means[i + 1] if i + 1 < len(buckets) else (t[-1], f[-1])
+        area = np.abs((prev_t - next_t) * (f[bucket] - prev_f) - (prev_t - t[bucket]) * (next_f - prev_f))
+        indices.append(bucket[np.argmax(area)])
+    return np.array(indices + [n - 1])
+
+
+@pytest.mark.parametrize('max_points', [3, 4, 200, 4999])
+def test_lttb_keeps_endpoints_and_point_count(max_points):
+    time_data, flux_data = make_curve()
+    plot_time, plot_flux = lttb_downsample(time_data, flux_data, max_points)
+
+    assert len(plot_flux) == max_points
+    assert plot_time[0] == time_data[0] and plot_flux[0] == flux_data[0]
+    assert plot_time[-1] == time_data[-1] and plot_flux[-1] == flux_data[-1]
+    assert np.all(np.diff(plot_time) > 0)
+
+
+@pytest.mark.parametrize('max_points', [3, 17, 200])
+def test_lttb_matches_reference(max_points):
+    time_data, flux_data = make_curve(n_points=1003)
+    plot_time, plot_flux = lttb_downsample(time_data, flux_data, max_points)
+    indices = lttb_reference(time_data, flux_data, max_points)
+    np.testing.assert_array_equal(plot_time, time_data[indices])
+    np.testing.assert_array_equal(plot_flux, flux_data[indices])
+
+
+def test_lttb_keeps_single_point_spike_and_float32():
+    time_data = np.arange(10_000, dtype=np.float64)
+    flux_data = np.ones(10_000, dtype=np.float32)
+    flux_data[6543] = 0.9
+    plot_time, plot_flux = lttb_downsample(time_data, flux_data, 100)
+    assert 6543.0 in plot_time and plot_flux.min() == np.float32(0.9)
+    assert plot_flux.dtype == np.float32
+
+
+@pytest.mark.parametrize('max_points', [2, 5000, 6000])
+def test_lttb_returns_short_curves_unchanged(max_points):
+    time_data, flux_data = make_curve()
+    plot_time, plot_flux = lttb_downsample(time_data, flux_data, max_points)
+    assert plot_time is time_data and plot_flux is flux_data
+
+
+def test_minmax_keeps_extremes_within_budget():
+    time_data, flux_data = make_curve()
+    plot_time, plot_flux = minmax_downsample(time_data, flux_data, 200)
+    assert len(plot_flux) <= 200
+    assert plot_flux.min() == flux_data.min() and plot_flux.max() == flux_data.max()
+    assert np.all(np.diff(plot_time) > 0)
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        downsample(*make_curve(), method='every_nth')
+    with pytest.raises(ValueError):
+        parse_visualization_options({'downsample': 'every_nth'})
+
+
+@pytest.mark.parametrize('params', [{'max_points': 2}, {'max_points': 'many'}, {'phase_bins': 1}])
+def test_invalid_point_budgets(params):
+    with pytest.raises(ValueError):
+        parse_visualization_options(params)
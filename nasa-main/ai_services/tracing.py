@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Lightweight request tracing
+Nested spans with attributes show where a request's time goes: archive
+query, mock curve generation, cleaning, feature extraction, classification
+and serialization. Finished spans are written to a local JSON Lines file
+or posted in batches to an OTLP/HTTP collector (OTLP JSON encoding, e.g.
+an OpenTelemetry Collector or Jaeger on localhost:4318). With tracing
+disabled, `tracer.span()` returns a shared no-op span, so instrumented code
+costs one attribute check per span.
+"""
+
+import os
+import json
+import time
+import atexit
+import functools
+import logging
+import threading
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from serialization import numpy_default
+
+logger = logging.getLogger(__name__)
+
+TRACING = os.environ.get('TRACING', '').lower()  # '' disables, 'jsonl' or 'otlp'
+TRACE_FILE = os.environ.get('TRACE_FILE', 'traces.jsonl')
+TRACE_ENDPOINT = os.environ.get('TRACE_ENDPOINT', 'http://localhost:4318/v1/traces')
+TRACE_SERVICE = os.environ.get('TRACE_SERVICE', 'exoplanet-ai-service')
+TRACE_BATCH_SIZE = int(os.environ.get('TRACE_BATCH_SIZE', 256))
+TRACE_FLUSH_INTERVAL = 2.0  # seconds between OTLP exports
+
+# (trace id, span id) of a span, passed to spans opened in another process
+SpanContext = Tuple[str, str]
+
+_current_span: ContextVar[Optional['Span']] = ContextVar('current_span', default=None)
+
+
+class Span:
+    """
+    A timed operation; use as a context manager. Spans opened inside it
+    become its children.
+    """
+
+    __slots__ = ('tracer', 'name', 'trace_id', 'span_id', 'parent_id', 'attributes',
+                 'start_ns', 'end_ns', 'error', '_token')
+
+    def __init__(self, tracer: 'Tracer', name: str, trace_id: str, parent_id: Optional[str],
+                 attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = self.end_ns = 0
+        self.error: Optional[str] = None
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def context(self) -> SpanContext:
+        return self.trace_id, self.span_id
+
+    def __enter__(self) -> 'Span':
+        self._token = _current_span.set(self)
+        self.start_ns = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            self.error = f'{exc_type.__name__}: {exc}'
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Closed from another context, e.g. a request span after a streamed response
+            pass
+        self.tracer.exporter.export(self)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start_ns': self.start_ns,
+            'duration_ms': round((self.end_ns - self.start_ns) / 1e6, 3),
+            'pid': os.getpid(),
+            'attributes': self.attributes,
+            'status': 'error' if self.error else 'ok',
+            'error': self.error
+        }
+
+
+class _NoopSpan:
+    """Span handed out while tracing is disabled"""
+
+    __slots__ = ()
+    context = None
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, **attributes):
+        pass
+
+    def __enter__(self) -> '_NoopSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class JsonLinesExporter:
+    """Appends one JSON object per finished span to a local file"""
+
+    def __init__(self, path: str = TRACE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=numpy_default) + '\n'
+        # Whole lines in append mode, so forked workers can share the file
+        with self._lock, open(self.path, 'a', encoding='utf-8') as handle:
+            handle.write(line)
+
+    def flush(self):
+        pass
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def otlp_span(span: Span) -> Dict[str, Any]:
+    """A span in the OTLP/JSON encoding"""
+    encoded = {
+        'traceId': span.trace_id,
+        'spanId': span.span_id,
+        'name': span.name,
+        'kind': 1,  # internal
+        'startTimeUnixNano': str(span.start_ns),
+        'endTimeUnixNano': str(span.end_ns),
+        'attributes': [{'key': key, 'value': _otlp_value(value)}
+                       for key, value in span.attributes.items() if value is not None],
+        'status': {'code': 2, 'message': span.error} if span.error else {'code': 1}
+    }
+    if span.parent_id:
+        encoded['parentSpanId'] = span.parent_id
+    return encoded
+
+
+class OTLPExporter:
+    """
+    Batches finished spans and posts them to an OTLP/HTTP collector from a
+    background thread, so requests never wait on the collector
+    """
+
+    def __init__(self, endpoint: str = TRACE_ENDPOINT, service: str = TRACE_SERVICE,
+                 batch_size: int = TRACE_BATCH_SIZE, interval: float = TRACE_FLUSH_INTERVAL):
+        self.endpoint = endpoint
+        self.service = service
+        self.batch_size = batch_size
+        self.interval = interval
+        self._pending: List[Dict[str, Any]] = []
+        self._condition = threading.Condition()
+        self._pid = None
+        atexit.register(self.flush)
+
+    def export(self, span: Span):
+        with self._condition:
+            if self._pid != os.getpid():
+                # Threads do not survive a fork; each process runs its own sender
+                self._pid = os.getpid()
+                self._pending = []
+                threading.Thread(target=self._run, name='otlp-exporter', daemon=True).start()
+            self._pending.append(otlp_span(span))
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait(self.interval)
+            self.flush()
+
+    def flush(self):
+        with self._condition:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return
+        payload = {'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': self.service}}]},
+            'scopeSpans': [{'scope': {'name': __name__}, 'spans': batch}]
+        }]}
+        try:
+            response = requests.post(self.endpoint, json=payload, timeout=5)
+            response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"Dropped {len(batch)} spans; export to {self.endpoint} failed: {e}")
+
+
+class Tracer:
+    """
+    Opens spans; `exporter` None disables tracing
+    """
+
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def span(self, name: str, parent: SpanContext = None, **attributes):
+        """
+        Context manager timing `name` as a child of the current span, or of
+        `parent` (a span context from another process) when given
+        """
+        if self.exporter is None:
+            return NOOP_SPAN
+        if parent is None:
+            current = _current_span.get()
+            parent = current.context if current is not None else None
+        trace_id, parent_id = parent if parent is not None else (os.urandom(16).hex(), None)
+        return Span(self, name, trace_id, parent_id, attributes)
+
+    def traced(self, name: str) -> Callable[[Callable], Callable]:
+        """Decorator running each call of a function inside a span"""
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if self.exporter is None:
+                    return func(*args, **kwargs)
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def current_span(self):
+        """The innermost open span (no-op when there is none)"""
+        return _current_span.get() or NOOP_SPAN
+
+    def flush(self):
+        if self.exporter is not None:
+            self.exporter.flush()
+
+
+def create_tracer(mode: str = TRACING) -> Tracer:
+    """Tracer for a TRACING mode: '' (disabled), 'jsonl' or 'otlp'"""
+    if not mode:
+        return Tracer()
+    if mode == 'jsonl':
+        logger.info(f"Tracing to {TRACE_FILE}")
+        return Tracer(JsonLinesExporter())
+    if mode == 'otlp':
+        logger.info(f"Tracing to the OTLP collector at {TRACE_ENDPOINT}")
+        return Tracer(OTLPExporter())
+    logger.warning(f"Unknown TRACING mode '{mode}'; tracing disabled")
+    return Tracer()
+
+
+tracer = create_tracer()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Box transit search with iterative multi-planet detection
+A box-least-squares style periodogram evaluated on phase-binned sums. The
+period grid and the per-period binned sums are built once; after each
+detection only the masked in-transit points are subtracted from the bins,
+so every further search pass costs O(periods x masked points) rather than
+a full re-fold of the light curve.
+"""
+
+import time
+import numpy as np
+from typing import Any, Dict, List, Mapping
+
+from folding import binned_sums, fold_phase
+
+DEFAULT_DURATIONS_HOURS = (1.0, 2.0, 3.0, 4.0, 6.0, 8.0)
+DEFAULT_PERIODS = 2000
+DEFAULT_BINS = 200
+DEFAULT_MIN_SNR = 7.0
+DEFAULT_MAX_PLANETS = 3
+MAX_PLANETS_LIMIT = 10
+MIN_PERIOD = 0.5
+MAX_PERIOD = 50.0
+MIN_IN_TRANSIT_POINTS = 3
+
+
+class TransitSearch:
+    """
+    Periodogram state shared across the passes of a multi-planet search
+    """
+
+    def __init__(self, time_data: np.ndarray, flux_data: np.ndarray,
+                 min_period: float = MIN_PERIOD, max_period: float = MAX_PERIOD,
+                 n_periods: int = DEFAULT_PERIODS, n_bins: int = DEFAULT_BINS,
+                 durations_hours=DEFAULT_DURATIONS_HOURS):
+        self.time = np.asarray(time_data, dtype=np.float64)
+        self.flux = np.asarray(flux_data, dtype=np.float64)
+        self.n_bins = n_bins
+        self.durations = np.asarray(durations_hours, dtype=np.float64) / 24.0
+        self.t_ref = float(self.time.min())
+
+        # At least two transits must fit in the baseline
+        baseline = float(self.time.max() - self.time.min())
+        max_period = min(max_period, baseline / 2)
+        if max_period <= min_period:
+            raise ValueError('Light curve baseline is too short for a transit search')
+
+        # Shared trial grid, uniform in frequency
+        self.periods = 1.0 / np.linspace(1.0 / max_period, 1.0 / min_period, n_periods)
+
+        self.active = np.ones(len(self.flux), dtype=bool)
+        self._sums, self._counts = self._fold(self.time, self.flux)
+        self._total_sum = float(self.flux.sum())
+        self._total_sq = float(np.square(self.flux).sum())
+        self._total_count = float(len(self.flux))
+
+    @property
+    def remaining_points(self) -> int:
+        """Number of points not yet masked"""
+        return int(self._total_count)
+
+    def _fold(self, time_data: np.ndarray, flux_data: np.ndarray):
+        """Per-period phase-binned flux sums and counts of the given points"""
+        return binned_sums(time_data, flux_data, self.periods, self.t_ref, self.n_bins)
+
+    def search(self) -> Dict[str, Any]:
+        """Return the strongest box-shaped dip among the remaining points"""
+        n = self._total_count
+        mean = self._total_sum / n
+        sigma = np.sqrt(max(self._total_sq / n - mean ** 2, 0.0))
+
+        # Box widths in bins per trial period and duration
+        widths = np.clip(np.rint(self.durations[:, None] * self.n_bins / self.periods[None, :]),
+                         1, self.n_bins // 2).astype(np.int64)
+        k_max = int(widths.max())
+
+        # Cumulative sums over the bins, extended to wrap around phase 1 -> 0
+        cum_sums = np.zeros((len(self.periods), self.n_bins + k_max + 1))
+        cum_counts = np.zeros_like(cum_sums)
+        np.cumsum(np.concatenate([self._sums, self._sums[:, :k_max]], axis=1), axis=1, out=cum_sums[:, 1:])
+        np.cumsum(np.concatenate([self._counts, self._counts[:, :k_max]], axis=1), axis=1, out=cum_counts[:, 1:])
+
+        starts = np.arange(self.n_bins)
+        best = {'power': -np.inf}
+        for d, k in enumerate(widths):
+            ends = starts[None, :] + k[:, None]
+            in_sum = np.take_along_axis(cum_sums, ends, axis=1) - cum_sums[:, :self.n_bins]
+            in_count = np.take_along_axis(cum_counts, ends, axis=1) - cum_counts[:, :self.n_bins]
+
+            # Box least squares power, restricted to dips
+            out_count = n - in_count
+            valid = (in_count >= MIN_IN_TRANSIT_POINTS) & (out_count >= MIN_IN_TRANSIT_POINTS)
+            residual = in_sum - in_count * mean
+            with np.errstate(divide='ignore', invalid='ignore'):
+                power = np.where(valid & (residual < 0), residual ** 2 * n / (in_count * out_count), 0.0)
+
+            p, b = np.unravel_index(np.argmax(power), power.shape)
+            if power[p, b] > best['power']:
+                r = in_count[p, b]
+                depth = (self._total_sum - in_sum[p, b]) / (n - r) - in_sum[p, b] / r
+                period = float(self.periods[p])
+                best = {
+                    'power': float(power[p, b]),
+                    'period': period,
+                    'epoch': float(self.t_ref + (b + k[p] / 2.0) / self.n_bins * period),
+                    'duration': float(k[p]) / self.n_bins * period,
+                    'depth': float(depth),
+                    'snr': float(depth / (sigma * np.sqrt(1.0 / r + 1.0 / (n - r)))) if sigma > 0 else 0.0,
+                    'in_transit_points': int(r)
+                }
+        return best
+
+    def mask_transits(self, period: float, epoch: float, duration: float) -> int:
+        """
+        Remove points within one duration of each transit centre and subtract
+        them from the binned sums. Returns the number of points masked.
+        """
+        offset = np.abs(fold_phase(self.time, period, epoch, centered=True) - 0.5) * period
+        masked = np.flatnonzero(self.active & (offset < duration))
+        if len(masked) == 0:
+            return 0
+
+        sums, counts = self._fold(self.time[masked], self.flux[masked])
+        self._sums -= sums
+        self._counts -= counts
+        self._total_sum -= float(self.flux[masked].sum())
+        self._total_sq -= float(np.square(self.flux[masked]).sum())
+        self._total_count -= len(masked)
+        self.active[masked] = False
+        return len(masked)
+
+
+def search_planets(time_data: np.ndarray, flux_data: np.ndarray, max_planets: int = DEFAULT_MAX_PLANETS,
+                   min_snr: float = DEFAULT_MIN_SNR, **search_kwargs) -> Dict[str, Any]:
+    """
+    Iteratively detect transit signals: find the strongest, mask it, search again.
+    Stops after `max_planets` signals or when the best remaining signal falls
+    below `min_snr`. Every signal reports the time its pass took.
+    """
+    start = time.perf_counter()
+    search = TransitSearch(time_data, flux_data, **search_kwargs)
+    setup_ms = (time.perf_counter() - start) * 1000
+
+    planets: List[Dict[str, Any]] = []
+    while len(planets) < max_planets:
+        pass_start = time.perf_counter()
+        signal = search.search()
+        if signal['power'] <= 0 or signal['snr'] < min_snr:
+            break
+        signal['masked_points'] = search.mask_transits(signal['period'], signal['epoch'], signal['duration'])
+        signal['duration_hours'] = signal.pop('duration') * 24.0
+        signal['search_time_ms'] = (time.perf_counter() - pass_start) * 1000
+        planets.append(signal)
+        if search.remaining_points < 2 * MIN_IN_TRANSIT_POINTS:
+            break
+
+    return {
+        'planets': planets,
+        'trial_periods': len(search.periods),
+        'setup_time_ms': setup_ms,
+        'total_time_ms': (time.perf_counter() - start) * 1000
+    }
+
+
+def parse_search_options(params: Mapping[str, Any]) -> Dict[str, Any]:
+    """Read and validate multi-planet search options from request JSON or form data"""
+    multi_planet = params.get('multi_planet', False)
+    if isinstance(multi_planet, str):
+        multi_planet = multi_planet.lower() in ('1', 'true', 'yes')
+    try:
+        max_planets = int(params.get('max_planets', DEFAULT_MAX_PLANETS))
+        min_snr = float(params.get('min_snr', DEFAULT_MIN_SNR))
+    except (TypeError, ValueError):
+        raise ValueError('max_planets must be an integer and min_snr a number')
+    if not 1 <= max_planets <= MAX_PLANETS_LIMIT:
+        raise ValueError(f'max_planets must be between 1 and {MAX_PLANETS_LIMIT}')
+    return {'multi_planet': bool(multi_planet), 'max_planets': max_planets, 'min_snr': min_snr}
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Server-side reduction of light curves for plotting
+Produces small payloads that still show transits: Largest-Triangle-Three-Buckets
+or min/max envelope downsampling, and a phase-folded, binned view.
+"""
+
+import numpy as np
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from folding import fold
+
+DOWNSAMPLING_METHODS = ('lttb', 'minmax')
+DEFAULT_MAX_POINTS = 200
+MAX_POINTS_LIMIT = 5000
+DEFAULT_PHASE_BINS = 100
+MAX_PHASE_BINS = 2000
+
+
+def _bucket_edges(n: int, n_buckets: int) -> np.ndarray:
+    """Start indices of `n_buckets` near-equal buckets covering range(n)"""
+    return np.linspace(0, n, n_buckets + 1).astype(np.int64)
+
+
+def lttb_downsample(time_data: np.ndarray, flux_data: np.ndarray, max_points: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+    The first and last points are always kept. Each inner bucket keeps the
+    point forming the largest triangle with the means of its neighbouring
+    buckets; anchoring on the previous bucket's mean rather than the previously
+    selected point lets every bucket be scored at once.
+    """
+    n = len(flux_data)
+    if max_points >= n or max_points < 3:
+        return time_data, flux_data
+
+    t = time_data.astype(np.float64, copy=False)
+    f = flux_data.astype(np.float64, copy=False)
+
+    # Inner points split into max_points - 2 buckets
+    edges = _bucket_edges(n - 2, max_points - 2) + 1
+    starts = edges[:-1]
+    sizes = np.diff(edges)
+
+    t_mean = np.add.reduceat(t[1:-1], starts - 1) / sizes
+    f_mean = np.add.reduceat(f[1:-1], starts - 1) / sizes
+
+    # Anchors: previous bucket mean (first point for bucket 0), next bucket mean (last point at the end)
+    prev_t = np.concatenate(([t[0]], t_mean[:-1]))
+    prev_f = np.concatenate(([f[0]], f_mean[:-1]))
+    next_t = np.concatenate((t_mean[1:], [t[-1]]))
+    next_f = np.concatenate((f_mean[1:], [f[-1]]))
+
+    bucket_of = np.repeat(np.arange(len(sizes)), sizes)
+    ti = t[1:-1]
+    fi = f[1:-1]
+    area = np.abs(
+        (prev_t[bucket_of] - next_t[bucket_of]) * (fi - prev_f[bucket_of])
+        - (prev_t[bucket_of] - ti) * (next_f[bucket_of] - prev_f[bucket_of])
+    )
+
+    # First index of the per-bucket maximum
+    best = np.maximum.reduceat(area, starts - 1)
+    candidates = np.where(area == best[bucket_of], np.arange(n - 2), n)
+    selected = np.minimum.reduceat(candidates, starts - 1) + 1
+
+    indices = np.concatenate(([0], selected, [n - 1]))
+    return time_data[indices], flux_data[indices]
+
+
+def minmax_downsample(time_data: np.ndarray, flux_data: np.ndarray, max_points: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Min/max envelope downsampling.
+    Keeps the lowest and highest point of each of `max_points // 2` buckets,
+    so no transit minimum is ever dropped.
+    """
+    n = len(flux_data)
+    n_buckets = max_points // 2
+    if max_points >= n or n_buckets < 1:
+        return time_data, flux_data
+
+    edges = _bucket_edges(n, n_buckets)
+    starts = edges[:-1]
+    sizes = np.diff(edges)
+    bucket_of = np.repeat(np.arange(n_buckets), sizes)
+    positions = np.arange(n)
+
+    lo = np.minimum.reduceat(flux_data, starts)
+    hi = np.maximum.reduceat(flux_data, starts)
+    argmin = np.minimum.reduceat(np.where(flux_data == lo[bucket_of], positions, n), starts)
+    argmax = np.minimum.reduceat(np.where(flux_data == hi[bucket_of], positions, n), starts)
+
+    indices = np.unique(np.concatenate((argmin, argmax)))
+    return time_data[indices], flux_data[indices]
+
+
+def downsample(time_data: np.ndarray, flux_data: np.ndarray, max_points: int = DEFAULT_MAX_POINTS,
+               method: str = 'lttb') -> Tuple[np.ndarray, np.ndarray]:
+    """Downsample a light curve to at most `max_points` points"""
+    if method == 'lttb':
+        return lttb_downsample(time_data, flux_data, max_points)
+    if method == 'minmax':
+        return minmax_downsample(time_data, flux_data, max_points)
+    raise ValueError(f"Unknown downsampling method '{method}'. Choose one of: {', '.join(DOWNSAMPLING_METHODS)}")
+
+
+def phase_fold_binned(time_data: np.ndarray, flux_data: np.ndarray, period: float,
+                      epoch: Optional[float] = None, n_bins: int = DEFAULT_PHASE_BINS) -> Dict[str, Any]:
+    """
+    Fold a light curve on `period` and average it into `n_bins` phase bins.
+    Phase 0 is the transit centre; when no epoch is given the deepest point
+    of the curve is used. Empty bins are dropped.
+    """
+    if epoch is None:
+        epoch = float(time_data[np.argmin(flux_data)])
+
+    folded = fold(time_data, flux_data, period, epoch, n_bins)
+    filled = folded['counts'] > 0
+    return {
+        'period': folded['period'],
+        'epoch': folded['epoch'],
+        'phase': folded['phase'][filled],
+        'flux': folded['flux'][filled],
+        'counts': folded['counts'][filled]
+    }
+
+
+def parse_visualization_options(params: Mapping[str, Any]) -> Dict[str, Any]:
+    """Read and validate the client's plotting options from request JSON or form data"""
+    try:
+        max_points = int(params.get('max_points', DEFAULT_MAX_POINTS))
+        phase_bins = int(params.get('phase_bins', DEFAULT_PHASE_BINS))
+    except (TypeError, ValueError):
+        raise ValueError('max_points and phase_bins must be integers')
+
+    if not 3 <= max_points <= MAX_POINTS_LIMIT:
+        raise ValueError(f'max_points must be between 3 and {MAX_POINTS_LIMIT}')
+    if not 2 <= phase_bins <= MAX_PHASE_BINS:
+        raise ValueError(f'phase_bins must be between 2 and {MAX_PHASE_BINS}')
+
+    method = str(params.get('downsample', 'lttb')).lower()
+    if method not in DOWNSAMPLING_METHODS:
+        raise ValueError(f"Unknown downsampling method '{method}'. Choose one of: {', '.join(DOWNSAMPLING_METHODS)}")
+
+    phase_fold = params.get('phase_fold', False)
+    if isinstance(phase_fold, str):
+        phase_fold = phase_fold.lower() in ('1', 'true', 'yes')
+
+    return {
+        'max_points': max_points,
+        'method': method,
+        'phase_fold': bool(phase_fold),
+        'phase_bins': phase_bins
+    }
+
+
+def build_visualization_payload(time_data: np.ndarray, flux_data: np.ndarray, options: Dict[str, Any],
+                                period: Optional[float] = None, epoch: Optional[float] = None) -> Dict[str, Any]:
+    """Response fields for plotting a light curve within the client's point budget"""
+    plot_time, plot_flux = downsample(time_data, flux_data, options['max_points'], options['method'])
+
+    payload = {
+        'time_data': plot_time,
+        'flux_data': plot_flux,
+        'visualization': {
+            'method': options['method'],
+            'points': len(plot_flux),
+            'max_points': options['max_points']
+        }
+    }
+
+    if options['phase_fold'] and period:
+        payload['phase_folded'] = phase_fold_binned(time_data, flux_data, period, epoch, options['phase_bins'])
+
+    return payload
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Startup warm-up and readiness state
+A fresh worker pays for lazy imports, first-call initialisation in NumPy,
+SciPy and scikit-learn, and empty caches on its first requests. `Warmup`
+runs registered steps, typically synthetic requests through each endpoint's
+code path, in a background thread after the app is loaded, and reports
+ready once every required step has passed and the cleanup has run. An
+optional step that fails is reported and skipped rather than holding
+readiness back. Liveness (/health)
+is unaffected; load balancers should route traffic on readiness (/ready).
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+WARMUP = os.environ.get('WARMUP', '1').lower() not in ('0', 'false', 'no')
+WARMUP_ROUNDS = int(os.environ.get('WARMUP_ROUNDS', 3))  # later rounds also warm the cache-hit paths
+
+STARTING = 'starting'
+WARMING = 'warming'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class Warmup:
+    """
+    Runs warm-up steps once per process, in a background thread
+    """
+
+    def __init__(self, rounds: int = WARMUP_ROUNDS, enabled: bool = WARMUP):
+        self.rounds = rounds
+        self.enabled = enabled
+        self.steps: List[Tuple[str, Callable[[], Any], bool]] = []
+        self.cleanup: List[Callable[[], Any]] = []
+        self.state = STARTING
+        self.error: Optional[str] = None
+        self.step_errors: Dict[str, str] = {}
+        self.timings: Dict[str, Dict[str, float]] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def step(self, name: str, required: bool = False):
+        """
+        Decorator registering a warm-up step; a step fails by raising. A failed
+        required step fails the warm-up, a failed optional one is only reported.
+        """
+        def decorator(func: Callable[[], Any]) -> Callable[[], Any]:
+            self.steps.append((name, func, required))
+            return func
+        return decorator
+
+    def on_finish(self, func: Callable[[], Any]) -> Callable[[], Any]:
+        """Decorator registering a function run after the steps, whether or not they passed"""
+        self.cleanup.append(func)
+        return func
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def start(self):
+        """
+        Start warming this process (idempotent). A process forked from a
+        warmed parent keeps its warm state; one forked mid-warm-up starts over.
+        """
+        with self._lock:
+            if self._pid == os.getpid() or self.state == READY:
+                return
+            self._pid = os.getpid()
+            if not self.enabled or not self.steps:
+                self.state = READY
+                self.started_at = self.finished_at = time.time()
+                return
+            self.state = WARMING
+            self.error = None
+            self.step_errors = {}
+            self.timings = {}
+            self.started_at, self.finished_at = time.time(), None
+            threading.Thread(target=self._run, name='warmup', daemon=True).start()
+
+    def _run(self):
+        # The state changes only once cleanup is done, so /ready never reports a process still warming
+        state, error = FAILED, 'Warm-up was interrupted'
+        try:
+            for _ in range(self.rounds):
+                for name, func, required in self.steps:
+                    if name in self.step_errors:
+                        continue
+                    start = time.perf_counter()
+                    try:
+                        func()
+                    except Exception as e:
+                        if required:
+                            raise RuntimeError(f"Required warm-up step '{name}' failed: {e}")
+                        logger.warning(f"Optional warm-up step '{name}' failed and is skipped: {e}")
+                        self.step_errors[name] = str(e)
+                        continue
+                    elapsed = (time.perf_counter() - start) * 1000
+                    timing = self.timings.setdefault(name, {'first_ms': elapsed})
+                    timing['last_ms'] = elapsed
+            state, error = READY, None
+        except Exception as e:
+            logger.error(f"Warm-up failed: {e}")
+            state, error = FAILED, str(e)
+        finally:
+            for func in self.cleanup:
+                try:
+                    func()
+                except Exception as e:
+                    logger.warning(f"Warm-up cleanup failed: {e}")
+            self.finished_at = time.time()
+            self.error = error
+            self.state = state
+        if self.state == READY:
+            logger.info(f"Warm-up finished in {self.finished_at - self.started_at:.2f}s")
+
+    def status(self) -> Dict[str, Any]:
+        """Readiness state, with per-step first and last round timings"""
+        status = {
+            'status': self.state,
+            'pid': os.getpid(),
+            'rounds': self.rounds if self.enabled else 0,
+            'steps': {name: dict(timing) for name, timing in self.timings.items()}
+        }
+        if self.started_at is not None and self.finished_at is not None:
+            status['duration_ms'] = round((self.finished_at - self.started_at) * 1000, 1)
+        if self.error is not None:
+            status['error'] = self.error
+        if self.step_errors:
+            status['failed_steps'] = dict(self.step_errors)
+        return status
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Sliding-window single-transit detection for long baselines
+Global statistics dilute isolated transits on long curves, so the curve is
+split into overlapping windows that are scored independently: a box scan
+over several durations against each window's own median and MAD noise.
+Windows are scored in parallel across processes and detections repeated in
+overlapping windows are merged.
+"""
+
+import os
+import time
+import threading
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+DEFAULT_WINDOW_DAYS = 10.0
+DEFAULT_OVERLAP = 0.25  # fraction of the window shared with the next one
+DEFAULT_MIN_SNR = 7.0
+DEFAULT_DURATIONS_HOURS = (1.0, 2.0, 4.0, 8.0)
+MAX_CANDIDATES_PER_WINDOW = 10
+MIN_BOX_POINTS = 3
+# A window must hold a full box of the longest trial duration with baseline on both sides
+MIN_WINDOW_DAYS = 2 * max(DEFAULT_DURATIONS_HOURS) / 24.0
+MAX_WINDOWS = int(os.environ.get('MAX_WINDOWS', 5000))
+
+# Curves smaller than this are scored in-process; pool overhead would dominate
+PARALLEL_MIN_POINTS = int(os.environ.get('WINDOW_PARALLEL_MIN_POINTS', 50_000))
+WINDOW_WORKERS = int(os.environ.get('WINDOW_WORKERS', os.cpu_count() or 1))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_pid = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+# Set in the worker processes of other pools, which must not fork a pool of their own
+_inline_only = False
+
+
+def run_inline():
+    """Score windows in-process from now on; called by other process pools' worker initializers"""
+    global _inline_only
+    _inline_only = True
+
+
+def start_pool(workers: int = WINDOW_WORKERS) -> Optional[ProcessPoolExecutor]:
+    """
+    The process pool shared by all windowed searches, created once per
+    process with `workers` processes; None where pools must not nest or
+    with fewer than two workers. create_app starts it before any service
+    thread; its workers come from a forkserver (or spawn) context, so a
+    lazy start from a request thread never forks a threaded process.
+    """
+    global _pool, _pool_pid, _pool_workers
+    if _inline_only or workers < 2:
+        return None
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            _pool_pid = os.getpid()
+            _pool_workers = workers
+        return _pool
+
+
+def pool_workers() -> int:
+    """Number of processes in this process's window pool, 0 if it has none"""
+    return _pool_workers if _pool is not None and _pool_pid == os.getpid() else 0
+
+
+def score_window(time_data: np.ndarray, flux_data: np.ndarray, durations: np.ndarray,
+                 min_snr: float, max_candidates: int = MAX_CANDIDATES_PER_WINDOW) -> Dict[str, Any]:
+    """
+    Box-scan one window for single transit-like dips.
+    Every point starts a box of each duration; box sums come from a cumulative
+    sum, so a window costs O(points x durations). Returns the window's best
+    SNR and up to `max_candidates` non-overlapping dips above `min_snr`.
+    """
+    t = np.asarray(time_data, dtype=np.float64)
+    f = np.asarray(flux_data, dtype=np.float64)
+    baseline = float(np.median(f))
+    sigma = 1.4826 * float(np.median(np.abs(f - baseline)))
+    if len(f) < MIN_BOX_POINTS or sigma == 0:
+        return {'snr': 0.0, 'candidates': []}
+
+    cumulative = np.concatenate(([0.0], np.cumsum(f)))
+    starts = np.arange(len(f))
+    snr = np.zeros((len(durations), len(f)))
+    ends = np.empty((len(durations), len(f)), dtype=np.int64)
+    for d, duration in enumerate(durations):
+        ends[d] = np.searchsorted(t, t + duration, side='left')
+        count = ends[d] - starts
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_in = (cumulative[ends[d]] - cumulative[starts]) / count
+            snr[d] = np.where(count >= MIN_BOX_POINTS, (baseline - mean_in) * np.sqrt(count) / sigma, 0.0)
+
+    candidates = []
+    available = np.ones(len(f), dtype=bool)
+    best_snr = float(snr.max())
+    while len(candidates) < max_candidates:
+        masked = np.where(available[None, :], snr, 0.0)
+        d, i = np.unravel_index(np.argmax(masked), masked.shape)
+        if masked[d, i] < min_snr:
+            break
+        end = ends[d, i]
+        count = end - i
+        candidates.append({
+            'time': float((t[i] + t[end - 1]) / 2),
+            'duration_hours': float(durations[d] * 24),
+            'depth': float(baseline - (cumulative[end] - cumulative[i]) / count),
+            'snr': float(masked[d, i])
+        })
+        # Suppress every box overlapping the accepted one
+        lo = np.searchsorted(t, t[i] - durations.max(), side='left')
+        available[lo:end] = False
+
+    return {'snr': best_snr, 'candidates': candidates}
+
+
+def _score_window_task(args):
+    return score_window(*args)
+
+
+def _window_step(window_days: float, overlap: float, min_overlap_days: float) -> Tuple[float, float]:
+    """Days shared by consecutive windows and the distance between their starts"""
+    overlap_days = max(overlap * window_days, min_overlap_days)
+    return overlap_days, max(window_days - overlap_days, window_days / 10)
+
+
+def count_windows(time_data: np.ndarray, window_days: float, overlap: float,
+                  durations_hours=DEFAULT_DURATIONS_HOURS) -> int:
+    """Number of windows `windowed_search` would split a curve into"""
+    overlap_days, step = _window_step(window_days, overlap, 2 * max(durations_hours) / 24.0)
+    span = float(np.max(time_data) - np.min(time_data)) if len(time_data) else 0.0
+    return int(np.floor(max(span - overlap_days, 0.0) / step + 1e-12)) + 1
+
+
+def check_window_count(time_data: np.ndarray, window_days: float, overlap: float,
+                       durations_hours=DEFAULT_DURATIONS_HOURS):
+    """Raise ValueError when a curve would be split into more than MAX_WINDOWS windows"""
+    n_windows = count_windows(time_data, window_days, overlap, durations_hours)
+    if n_windows > MAX_WINDOWS:
+        raise ValueError(f'window_days={window_days:g} splits the curve into {n_windows} windows; '
+                         f'the limit is {MAX_WINDOWS}, so use longer windows')
+
+
+def split_windows(time_data: np.ndarray, window_days: float, overlap: float,
+                  min_overlap_days: float) -> List[tuple]:
+    """Index ranges of overlapping windows covering the curve"""
+    overlap_days, step = _window_step(window_days, overlap, min_overlap_days)
+    t0, t1 = float(time_data[0]), float(time_data[-1])
+    starts = np.arange(t0, max(t1 - overlap_days, t0) + 1e-12, step)
+    lo = np.searchsorted(time_data, starts, side='left')
+    hi = np.searchsorted(time_data, starts + window_days, side='left')
+    return [(int(a), int(b)) for a, b in zip(lo, hi) if b - a >= MIN_BOX_POINTS]
+
+
+def merge_candidates(candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Collapse detections of the same event from overlapping windows, keeping the strongest"""
+    merged: List[Dict[str, Any]] = []
+    for candidate in sorted(candidates, key=lambda c: c['time']):
+        if merged:
+            last = merged[-1]
+            reach = max(last['duration_hours'], candidate['duration_hours']) / 24.0
+            if candidate['time'] - last['time'] < reach:
+                if candidate['snr'] > last['snr']:
+                    merged[-1] = candidate
+                continue
+        merged.append(candidate)
+    return merged
+
+
+def windowed_search(time_data: np.ndarray, flux_data: np.ndarray, window_days: float = DEFAULT_WINDOW_DAYS,
+                    overlap: float = DEFAULT_OVERLAP, min_snr: float = DEFAULT_MIN_SNR,
+                    durations_hours=DEFAULT_DURATIONS_HOURS, workers: int = None) -> Dict[str, Any]:
+    """
+    Score overlapping windows of a light curve and merge their detections.
+    Raises ValueError when the curve would need more than MAX_WINDOWS windows.
+    `workers` > 1 scores windows on the shared process pool; by default the
+    pool is used only for curves of at least PARALLEL_MIN_POINTS points.
+    """
+    start = time.perf_counter()
+    t = np.asarray(time_data, dtype=np.float64)
+    f = np.asarray(flux_data)
+    order = np.argsort(t, kind='stable')
+    if np.any(order != np.arange(len(t))):
+        t, f = t[order], f[order]
+
+    durations = np.asarray(durations_hours, dtype=np.float64) / 24.0
+    check_window_count(t, window_days, overlap, durations_hours)
+    ranges = split_windows(t, window_days, overlap, 2 * durations.max())
+    tasks = [(t[a:b], f[a:b], durations, min_snr) for a, b in ranges]
+
+    if workers is None:
+        workers = WINDOW_WORKERS if len(t) >= PARALLEL_MIN_POINTS else 1
+    pool = start_pool(workers) if workers > 1 and len(tasks) > 1 else None
+    if pool is not None:
+        workers = min(workers, pool_workers())
+        scores = list(pool.map(_score_window_task, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+    else:
+        workers = 1
+        scores = [score_window(*task) for task in tasks]
+
+    windows = []
+    for (a, b), score in zip(ranges, scores):
+        windows.append({
+            'start': float(t[a]),
+            'end': float(t[b - 1]),
+            'points': b - a,
+            'snr': score['snr'],
+            'candidates': score['candidates']
+        })
+
+    return {
+        'windows': windows,
+        'candidates': merge_candidates([c for w in windows for c in w['candidates']]),
+        'window_days': window_days,
+        'workers': workers,
+        'elapsed_ms': (time.perf_counter() - start) * 1000
+    }
+
+
+def parse_windowed_options(params: Mapping[str, Any]) -> Dict[str, Any]:
+    """Read and validate windowed detection options from request JSON or form data"""
+    windowed = params.get('windowed', False)
+    if isinstance(windowed, str):
+        windowed = windowed.lower() in ('1', 'true', 'yes')
+    try:
+        window_days = float(params.get('window_days', DEFAULT_WINDOW_DAYS))
+        overlap = float(params.get('window_overlap', DEFAULT_OVERLAP))
+    except (TypeError, ValueError):
+        raise ValueError('window_days and window_overlap must be numbers')
+    if not window_days >= MIN_WINDOW_DAYS:
+        raise ValueError(f'window_days must be at least {MIN_WINDOW_DAYS:g} '
+                         f'(twice the longest trial duration of {max(DEFAULT_DURATIONS_HOURS):g} hours)')
+    if not 0 <= overlap < 1:
+        raise ValueError('window_overlap must be in [0, 1)')
+    return {'windowed': bool(windowed), 'window_days': window_days, 'window_overlap': overlap}